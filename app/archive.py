@@ -0,0 +1,132 @@
+# app/archive.py
+import argparse
+import os
+from datetime import date, timedelta
+from sqlalchemy import MetaData, Table, delete, insert, select, text, union_all
+from sqlalchemy.orm import aliased
+from app.models import Loan
+
+# Archivage des emprunts : les emprunts retournés depuis plus de `loan_archive_days` jours quittent la table loan pour
+# des tables d'archive par année de début d'emprunt (loan_archive_2023, loan_archive_2024...), dans la même base.
+# La table loan ne garde que les emprunts en cours et l'historique récent : ses index restent petits.
+# Les lectures de l'historique (GET /loans/?status=history, export, rapports, recalcul des statistiques et des
+# emprunteurs) lisent la table loan et les archives des années couvertes par date_from/date_to (UNION ALL).
+# Les emprunts en cours, les retards et le quota ne concernent que la table loan.
+
+LOAN_ARCHIVE_DAYS = int(os.getenv('loan_archive_days', '365'))
+ARCHIVE_PREFIX = "loan_archive_"
+# Emprunts déplacés par transaction : le verrou d'écriture n'est tenu que le temps d'un lot
+ARCHIVE_BATCH = 5000
+
+archive_metadata = MetaData()
+
+# Table d'archive d'une année : mêmes colonnes et mêmes index simples que loan (sans les index sur `active`)
+def archive_table(year: int) -> Table:
+    name = f"{ARCHIVE_PREFIX}{year}"
+    if name not in archive_metadata.tables:
+        Table(name, archive_metadata, *(column._copy() for column in Loan.__table__.columns))
+    return archive_metadata.tables[name]
+
+def archive_years(conn) -> list[int]:
+    names = conn.execute(
+        text("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :prefix"),
+        {"prefix": f"{ARCHIVE_PREFIX}%"},
+    ).scalars()
+    return sorted(int(name[len(ARCHIVE_PREFIX):]) for name in names if name[len(ARCHIVE_PREFIX):].isdigit())
+
+# Archives dont l'année de début d'emprunt recoupe la période demandée (toutes sans borne)
+def archive_tables(conn, date_from: date | None = None, date_to: date | None = None) -> list[Table]:
+    return [
+        archive_table(year)
+        for year in archive_years(conn)
+        if (date_from is None or year >= date_from.year) and (date_to is None or year <= date_to.year)
+    ]
+
+# Emprunts de la période : la table loan seule, ou son union avec les archives concernées (mêmes noms de colonnes)
+def history_source(conn, date_from: date | None = None, date_to: date | None = None):
+    tables = archive_tables(conn, date_from, date_to)
+    if not tables:
+        return Loan.__table__
+    names = Loan.__table__.columns.keys()
+    return union_all(
+        select(Loan.__table__),
+        *(select(*(table.c[name] for name in names)) for table in tables),
+    ).subquery("loans")
+
+# Même chose en entité Loan, pour les requêtes ORM (listes paginées, rapports)
+def history_loans(conn, date_from: date | None = None, date_to: date | None = None):
+    source = history_source(conn, date_from, date_to)
+    return Loan if source is Loan.__table__ else aliased(Loan, source)
+
+# Version texte pour les agrégats écrits en SQL (statistiques, emprunteurs) : tous les emprunts, archives comprises
+def all_loans_sql(conn) -> str:
+    years = archive_years(conn)
+    if not years:
+        return "loan"
+    columns = ", ".join(Loan.__table__.columns.keys())
+    parts = [f"SELECT {columns} FROM loan"] + [f"SELECT {columns} FROM {ARCHIVE_PREFIX}{year}" for year in years]
+    return f"({' UNION ALL '.join(parts)}) AS loan"
+
+# Ids parmi `ids` qui désignent des emprunts archivés (donc retournés)
+def archived_ids(conn, ids: list[int]) -> set[int]:
+    if not ids:
+        return set()
+    found = set()
+    for table in archive_tables(conn):
+        found.update(conn.execute(select(table.c.id).where(table.c.id.in_(ids))).scalars())
+    return found
+
+# Déplace un lot d'emprunts retournés avant `cutoff` vers les archives de leur année, renvoie le nombre déplacé.
+# L'emprunt d'id maximal reste dans loan : SQLite attribue le prochain id après le plus grand id de la table,
+# un id archivé n'est donc jamais réattribué
+def archive_batch(conn, cutoff: date, limit: int = ARCHIVE_BATCH) -> int:
+    rows = conn.execute(
+        text(
+            "SELECT id, CAST(strftime('%Y', start_date) AS INTEGER) FROM loan "
+            "WHERE active = 0 AND returned_date < :cutoff AND id < (SELECT MAX(id) FROM loan) "
+            "ORDER BY id LIMIT :limit"
+        ),
+        {"cutoff": cutoff, "limit": limit},
+    ).all()
+    by_year: dict[int, list[int]] = {}
+    for loan_id, year in rows:
+        by_year.setdefault(year, []).append(loan_id)
+
+    names = Loan.__table__.columns.keys()
+    for year, ids in by_year.items():
+        table = archive_table(year)
+        table.create(conn, checkfirst=True)
+        conn.execute(
+            insert(table).from_select(
+                names, select(*(Loan.__table__.c[name] for name in names)).where(Loan.id.in_(ids))
+            )
+        )
+    if rows:
+        conn.execute(delete(Loan).where(Loan.id.in_([loan_id for loan_id, _ in rows])))
+    return len(rows)
+
+# Archivage complet, par lots dans des transactions courtes (balayage quotidien ou ligne de commande)
+def archive_loans(engine, days: int = LOAN_ARCHIVE_DAYS) -> int:
+    cutoff = date.today() - timedelta(days=days)
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            moved = archive_batch(conn, cutoff)
+        total += moved
+        if moved < ARCHIVE_BATCH:
+            return total
+
+# Utilisation : python -m app.archive run [--days 365]
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archivage des emprunts retournés")
+    parser.add_argument("command", choices=["run"])
+    parser.add_argument("--days", type=int, default=LOAN_ARCHIVE_DAYS, help="Âge minimal (jours depuis le retour)")
+    args = parser.parse_args()
+
+    from app.database import immediate_engine
+
+    if args.command == "run":
+        moved = archive_loans(immediate_engine, args.days)
+        with immediate_engine.connect() as conn:
+            years = archive_years(conn)
+        print(f"{moved} emprunts archivés (archives : {', '.join(map(str, years)) or 'aucune'})")
@@ -0,0 +1,98 @@
+# app/borrowers.py
+import argparse
+from sqlalchemy import bindparam, func, select, text, union
+from sqlalchemy.dialects.sqlite import insert
+from app.archive import all_loans_sql
+from app.models import Borrower, Loan
+
+# Compteurs par carte d'emprunteur : emprunts en cours, pénalités des retours en retard et pénalités en cours.
+# Ils sont mis à jour dans la même transaction que les emprunts et les retours ; le résumé d'un emprunteur est une
+# lecture par clé primaire. Le quota d'emprunts compte les emprunts de la carte et de l'adresse mail (voir quota_usage).
+
+# Ajoute des variations aux compteurs d'un emprunteur (la ligne est créée à son premier emprunt)
+def update_borrower(
+    session,
+    card_id: int,
+    loaner_mail: str,
+    loaner_name: str,
+    active_loans: int = 0,
+    penalty_cents: int = 0,
+    accrued_penalty_cents: int = 0,
+):
+    statement = insert(Borrower).values(
+        card_id=card_id,
+        loaner_mail=loaner_mail,
+        loaner_name=loaner_name,
+        active_loans=max(0, active_loans),
+        penalty_cents=max(0, penalty_cents),
+        accrued_penalty_cents=max(0, accrued_penalty_cents),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[Borrower.card_id],
+        set_={
+            "loaner_mail": loaner_mail,
+            "loaner_name": loaner_name,
+            "active_loans": Borrower.active_loans + active_loans,
+            "penalty_cents": Borrower.penalty_cents + penalty_cents,
+            "accrued_penalty_cents": Borrower.accrued_penalty_cents + accrued_penalty_cents,
+        },
+    )
+    session.exec(statement)
+
+# Emprunts comptés pour le quota : les emprunts en cours de la carte ou de l'adresse mail (une même adresse utilisée
+# sur une autre carte ne donne pas droit à plus d'emprunts). Un seul COUNT sur l'union des index (active, loaner_mail)
+# et (active, loaner_card_id) de la table loan, quelques lignes au plus ; l'union retire les emprunts comptés deux fois
+def quota_usage(session, card_id: int, loaner_mail: str) -> int:
+    loans = union(
+        select(Loan.id).where(Loan.active == True, Loan.loaner_mail == loaner_mail),
+        select(Loan.id).where(Loan.active == True, Loan.loaner_card_id == card_id),
+    ).subquery()
+    return session.scalar(select(func.count()).select_from(loans))
+
+# Recalcule les compteurs à partir des emprunts (archives comprises, pour les pénalités des emprunts retournés),
+# pour toutes les cartes ou une liste de cartes (retours par lot, import en masse, migration).
+# Lecture sur les index loaner_card_id de la table loan et des archives
+def sync_borrowers(conn, card_ids: list[int] | None = None):
+    where = "WHERE loaner_card_id IN :ids" if card_ids is not None else "WHERE true"
+    statement = text(
+        "INSERT INTO borrower (card_id, loaner_mail, loaner_name, active_loans, penalty_cents, accrued_penalty_cents) "
+        "SELECT loaner_card_id, MAX(loaner_mail), MAX(loaner_name), "
+        "SUM(CASE WHEN active THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN active THEN 0 ELSE penalty_cents END), "
+        "SUM(CASE WHEN active THEN penalty_cents ELSE 0 END) "
+        f"FROM {all_loans_sql(conn)} {where} GROUP BY loaner_card_id "
+        "ON CONFLICT (card_id) DO UPDATE SET "
+        "active_loans = excluded.active_loans, "
+        "penalty_cents = excluded.penalty_cents, "
+        "accrued_penalty_cents = excluded.accrued_penalty_cents"
+    )
+    if card_ids is None:
+        conn.execute(statement)
+    elif card_ids:
+        conn.execute(statement.bindparams(bindparam("ids", expanding=True)), {"ids": list(card_ids)})
+
+# Après le balayage des retards : pénalités en cours des emprunteurs qui ont (ou avaient) un emprunt en retard
+def refresh_accrued_penalties(conn):
+    conn.execute(
+        text(
+            "UPDATE borrower SET accrued_penalty_cents = COALESCE(("
+            "SELECT SUM(penalty_cents) FROM loan WHERE loan.active = 1 AND loan.loaner_card_id = borrower.card_id"
+            "), 0) "
+            "WHERE accrued_penalty_cents > 0 "
+            "OR card_id IN (SELECT loaner_card_id FROM loan WHERE active = 1 AND late = 1)"
+        )
+    )
+
+# Utilisation : python -m app.borrowers recompute
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestion des compteurs des emprunteurs")
+    parser.add_argument("command", choices=["recompute"])
+    args = parser.parse_args()
+
+    from app.database import engine
+
+    if args.command == "recompute":
+        with engine.begin() as conn:
+            sync_borrowers(conn)
+            borrowers = conn.execute(text("SELECT COUNT(*) FROM borrower")).scalar()
+        print(f"Compteurs recalculés pour {borrowers} emprunteurs")
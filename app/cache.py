@@ -0,0 +1,121 @@
+# app/cache.py
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Request, Response
+from app.serialization import dumps
+
+# Cache en mémoire des réponses des routes de lecture (listes, recherches, détails, statistiques).
+# - taille bornée avec éviction LRU et durée de vie (TTL) par entrée
+# - clé : chemin de la route + paramètres de la requête triés
+# - invalidation par tags ("authors", "books", "loans", "author:3", "book:12"...) déclenchée par les routes d'écriture
+# - chaque réponse porte un ETag : un client qui renvoie If-None-Match reçoit un 304 sans corps
+# Le cache est propre à chaque processus (chaque worker uvicorn a le sien).
+
+CACHE_MAX_ENTRIES = int(os.getenv('cache_max_entries', '1024'))
+# TTL en secondes par type de donnée : les auteurs changent rarement, les livres et statistiques suivent les emprunts
+AUTHORS_TTL = int(os.getenv('cache_ttl_authors', '300'))
+BOOKS_TTL = int(os.getenv('cache_ttl_books', '60'))
+STATS_TTL = int(os.getenv('cache_ttl_stats', '30'))
+
+class CacheEntry:
+    def __init__(self, body: bytes, etag: str, tags: set[str], expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.tags = tags
+        self.expires_at = expires_at
+
+class CacheLookup:
+    def __init__(self, cache: "ResponseCache", request: Request, key: str, generation: int):
+        self.cache = cache
+        self.request = request
+        self.key = key
+        self.generation = generation
+        self.response: Response | None = None
+
+    # Sérialise le résultat (orjson), le met en cache et renvoie la réponse (ou un 304 si le client a déjà cette version)
+    def store(self, data, tags: list[str], ttl: int) -> Response:
+        body = dumps(data)
+        etag = make_etag(body)
+        self.cache.set(self.key, body, etag, tags, ttl, self.generation)
+        return build_response(self.request, body, etag)
+
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def build_response(request: Request, body: bytes, etag: str) -> Response:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in [value.strip() for value in if_none_match.split(",")]:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+class ResponseCache:
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.lock = threading.Lock()
+        # Incrémenté à chaque invalidation : une réponse calculée pendant une écriture n'est pas mise en cache
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(request: Request) -> str:
+        params = sorted(request.query_params.multi_items())
+        return request.url.path + "?" + "&".join(f"{key}={value}" for key, value in params)
+
+    def lookup(self, request: Request) -> CacheLookup:
+        key = self.make_key(request)
+        with self.lock:
+            lookup = CacheLookup(self, request, key, self.generation)
+            entry = self.entries.get(key)
+            if entry and entry.expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                lookup.response = build_response(request, entry.body, entry.etag)
+                return lookup
+            if entry:
+                del self.entries[key]
+            self.misses += 1
+        return lookup
+
+    def set(self, key: str, body: bytes, etag: str, tags: list[str], ttl: int, generation: int):
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries[key] = CacheEntry(body, etag, set(tags), time.monotonic() + ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tags: str):
+        tags = set(tags)
+        with self.lock:
+            self.generation += 1
+            stale = [key for key, entry in self.entries.items() if entry.tags & tags]
+            for key in stale:
+                del self.entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+response_cache = ResponseCache(CACHE_MAX_ENTRIES)
@@ -0,0 +1,101 @@
+# app/changes.py
+import asyncio
+import threading
+from datetime import datetime
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.orm import Session
+from app.models import Author, Book, ChangeLog, Loan
+from app.serialization import dumps
+
+# Journal des modifications : chaque création, modification et suppression de livre ou d'auteur, et chaque emprunt,
+# retour et renouvellement (avec le stock du livre concerné) ajoute une ligne à la table ChangeLog dans la même
+# transaction. Un miroir du catalogue (moteur de recherche, site de découverte) lit GET /changes?since=<seq> au lieu
+# de relire tout le catalogue : il ne reçoit que les lignes modifiées depuis son dernier passage, avec leur état.
+# La route attend (long-poll, ?wait=) qu'une modification arrive : elle est réveillée à la validation de la transaction
+# dans ce processus, et relit le journal à intervalle régulier pour les écritures des autres processus.
+
+ENTITIES = {"book": Book, "author": Author, "loan": Loan}
+OPERATIONS = ("create", "update", "delete")
+# Intervalle (en secondes) de relecture du journal pendant une attente
+POLL_INTERVAL = 1.0
+
+class ChangeNotifier:
+    def __init__(self):
+        self.waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self.lock = threading.Lock()
+
+    # Appelé à la validation d'une transaction qui a écrit dans le journal (depuis n'importe quel thread)
+    def notify(self):
+        with self.lock:
+            waiters = list(self.waiters)
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+
+    async def wait(self, timeout: float):
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.lock:
+            self.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.lock:
+                self.waiters.discard(waiter)
+
+change_notifier = ChangeNotifier()
+
+# Ajoute au journal une opération sur des livres, auteurs ou emprunts. L'état enregistré est relu en base après
+# l'écriture (valeurs calculées par SQLite comprises). Avec une Session, les attentes sont réveillées après la validation
+# de la transaction ; avec une Connection (import en masse), l'appelant appelle change_notifier.notify() après la sienne
+def record_changes(conn, entity: str, op: str, ids: list[int]):
+    if not ids:
+        return
+    model = ENTITIES[entity]
+    data = {}
+    if op != "delete":
+        rows = conn.execute(select(model.__table__).where(model.__table__.c.id.in_(ids)))
+        data = {row.id: dumps(dict(row._mapping)).decode() for row in rows}
+    at = datetime.now()
+    conn.execute(
+        insert(ChangeLog),
+        [{"entity": entity, "entity_id": ref, "op": op, "at": at, "data": data.get(ref)} for ref in ids],
+    )
+    if isinstance(conn, Session):
+        event.listen(conn, "after_commit", lambda _: change_notifier.notify(), once=True)
+
+def record_change(conn, entity: str, op: str, ref: int):
+    record_changes(conn, entity, op, [ref])
+
+def parse_entities(entity: str | None) -> list[str] | None:
+    if not entity:
+        return None
+    names = [name.strip() for name in entity.split(",") if name.strip()]
+    if not names or any(name not in ENTITIES for name in names):
+        raise HTTPException(422, f"entity doit contenir: {', '.join(ENTITIES)}")
+    return list(dict.fromkeys(names))
+
+# Modifications après `since` (au plus `limit`, dans l'ordre) jusqu'au dernier numéro du journal (head).
+# next_since est la valeur de `since` du prochain appel : le dernier numéro lu, ou head s'il ne reste rien à lire
+# (avec un filtre sur les entités, les modifications des autres entités sont sautées)
+def read_changes(conn, since: int, limit: int, entities: list[str] | None = None) -> dict:
+    head = conn.execute(select(func.coalesce(func.max(ChangeLog.seq), 0))).scalar()
+    table = ChangeLog.__table__
+    query = select(table).where(table.c.seq > since, table.c.seq <= head).order_by(table.c.seq).limit(limit)
+    if entities:
+        query = query.where(table.c.entity.in_(entities))
+    changes = [
+        {
+            "seq": row.seq,
+            "entity": row.entity,
+            "entity_id": row.entity_id,
+            "op": row.op,
+            "at": row.at,
+            "data": orjson.loads(row.data) if row.data is not None else None,
+        }
+        for row in conn.execute(query)
+    ]
+    next_since = changes[-1]["seq"] if len(changes) == limit else max(since, head)
+    return {"changes": changes, "next_since": next_since, "head": head}
@@ -1,16 +1,142 @@
 # app/database.py
 import os
-from sqlmodel import SQLModel, create_engine
+from sqlalchemy import event
+from sqlmodel import Session, SQLModel, create_engine
 from dotenv import load_dotenv
+from app.metrics import after_cursor_execute, before_cursor_execute, handle_error
+from app.migrations import run_migrations
 
 # On définit les paramètres de la base de données (J'importe le nom du fichier depuis le .env)
 load_dotenv()
 sqlite_file_name = os.getenv('sqlite_file_name')
-engine = create_engine(
-    f"sqlite:///{sqlite_file_name}",
-    connect_args={"check_same_thread": False},
-)
 
-# Création de la base de données et lancement de la fonction (create_db_and_tables) à l'exécution du script 
+# Réglages SQLite et du pool de connexions, modifiables depuis le .env
+sqlite_journal_mode = os.getenv('sqlite_journal_mode', 'WAL')
+sqlite_synchronous = os.getenv('sqlite_synchronous', 'NORMAL')
+sqlite_busy_timeout = int(os.getenv('sqlite_busy_timeout', '5000'))  # en millisecondes
+sqlite_mmap_size = int(os.getenv('sqlite_mmap_size', str(256 * 1024 * 1024)))  # en octets
+sqlite_cache_size = int(os.getenv('sqlite_cache_size', '-65536'))  # négatif = en Kio (ici 64 Mio)
+db_pool_size = int(os.getenv('db_pool_size', '10'))
+db_max_overflow = int(os.getenv('db_max_overflow', '20'))
+db_pool_timeout = int(os.getenv('db_pool_timeout', '30'))  # en secondes
+# Mode async : routes "async def" avec des sessions AsyncSession (driver aiosqlite) au lieu du threadpool
+async_mode = os.getenv('async_mode', 'false').lower() in ('1', 'true', 'yes')
+
+def build_engine():
+    return create_engine(
+        f"sqlite:///{sqlite_file_name}",
+        connect_args={"check_same_thread": False, "timeout": sqlite_busy_timeout / 1000},
+        pool_size=db_pool_size,
+        max_overflow=db_max_overflow,
+        pool_timeout=db_pool_timeout,
+    )
+
+# Les PRAGMA sont appliqués à chaque nouvelle connexion du pool
+def set_sqlite_pragmas(dbapi_connection, read_only: bool = False):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode = {sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous = {sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout = {sqlite_busy_timeout}")
+    cursor.execute(f"PRAGMA mmap_size = {sqlite_mmap_size}")
+    cursor.execute(f"PRAGMA cache_size = {sqlite_cache_size}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only = ON")
+    cursor.close()
+    # On désactive la gestion automatique des transactions du driver sqlite3 : c'est l'événement "begin" qui émet le BEGIN
+    dbapi_connection.isolation_level = None
+
+# Branche les PRAGMA et l'émission du BEGIN sur un moteur (synchrone, ou le sync_engine d'un moteur async)
+def configure_sqlite(target_engine, read_only: bool = False):
+    @event.listens_for(target_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        set_sqlite_pragmas(dbapi_connection, read_only=read_only)
+
+    # BEGIN IMMEDIATE prend le verrou d'écriture dès le début de la transaction : les vérifications et les écritures
+    # d'un emprunt ou d'un retour ne peuvent pas être entrelacées avec celles d'une autre requête
+    @event.listens_for(target_engine, "begin")
+    def on_begin(conn):
+        if not read_only and conn.get_execution_options().get("sqlite_immediate"):
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+        else:
+            conn.exec_driver_sql("BEGIN")
+
+    # Nombre et durée des requêtes SQL de chaque requête HTTP, journal des requêtes lentes (voir app/metrics.py)
+    event.listen(target_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(target_engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(target_engine, "handle_error", handle_error)
+
+# Moteur principal, utilisé pour les écritures
+engine = build_engine()
+configure_sqlite(engine)
+
+# Moteur en lecture seule pour les routes GET : avec le journal WAL, les lecteurs ne sont jamais bloqués par l'écrivain
+read_engine = build_engine()
+configure_sqlite(read_engine, read_only=True)
+
+# Moteur pour les transactions qui lisent puis écrivent (emprunts, retours, renouvellements)
+immediate_engine = engine.execution_options(sqlite_immediate=True)
+
+# Dépendances FastAPI des routes synchrones : une Session par requête, fermée à la fin de la requête.
+# La connexion n'est prise dans le pool qu'à la première requête SQL (rien n'est ouvert si la réponse vient du cache)
+def get_session():
+    with Session(engine) as session:
+        yield session
+
+def get_read_session():
+    with Session(read_engine) as session:
+        yield session
+
+def get_immediate_session():
+    with Session(immediate_engine) as session:
+        yield session
+
+# Moteurs async (driver aiosqlite), créés seulement en mode async. Ils partagent les réglages et les événements
+# des moteurs synchrones, qui restent utilisés pour la création des tables, les imports et les exports
+async_engine = None
+async_read_engine = None
+async_immediate_engine = None
+
+def build_async_engine():
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(
+        f"sqlite+aiosqlite:///{sqlite_file_name}",
+        connect_args={"timeout": sqlite_busy_timeout / 1000},
+        pool_size=db_pool_size,
+        max_overflow=db_max_overflow,
+        pool_timeout=db_pool_timeout,
+    )
+
+if async_mode:
+    async_engine = build_async_engine()
+    configure_sqlite(async_engine.sync_engine)
+    async_read_engine = build_async_engine()
+    configure_sqlite(async_read_engine.sync_engine, read_only=True)
+    async_immediate_engine = async_engine.execution_options(sqlite_immediate=True)
+
+# Dépendances FastAPI des routes async : une AsyncSession par requête, fermée à la fin de la requête
+async def get_async_session():
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_read_session():
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(async_read_engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_immediate_session():
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(async_immediate_engine, expire_on_commit=False) as session:
+        yield session
+
+# Création de la base de données et lancement de la fonction (create_db_and_tables) à l'exécution du script
+# Transactions IMMEDIATE : plusieurs workers démarrés en même temps sur une base neuve créent les tables chacun leur
+# tour (attente du verrou d'écriture) au lieu d'échouer avec « database is locked »
 def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
\ No newline at end of file
+    SQLModel.metadata.create_all(immediate_engine)
+    run_migrations(immediate_engine)
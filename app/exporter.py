@@ -0,0 +1,82 @@
+# app/exporter.py
+import csv
+import io
+import zlib
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from app.database import read_engine
+from app.serialization import dumps
+
+# Export en flux (CSV ou NDJSON, éventuellement compressé en gzip) de grandes tables.
+# Les lignes sont lues avec un curseur côté serveur (yield_per) sous forme de simples tuples, sans créer d'objets
+# SQLModel, et sont écrites au fil de l'eau : la mémoire utilisée reste constante quelle que soit la taille de l'export.
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+YIELD_PER = 1000
+
+def iter_rows(query):
+    with read_engine.connect() as conn:
+        result = conn.execution_options(yield_per=YIELD_PER).execute(query)
+        columns = list(result.keys())
+        yield columns
+        for partition in result.partitions():
+            yield from partition
+
+# Transforme les lignes en morceaux de texte, un morceau par lot de YIELD_PER lignes
+def iter_text(query, fmt: str):
+    rows = iter_rows(query)
+    columns = next(rows)
+    buffer = io.StringIO()
+
+    if fmt == "csv":
+        writer = csv.writer(buffer)
+        # BOM UTF-8 pour qu'Excel reconnaisse l'encodage, puis les en-têtes
+        buffer.write("\ufeff")
+        writer.writerow(columns)
+    else:
+        writer = None
+
+    for count, row in enumerate(rows, start=1):
+        if writer:
+            writer.writerow(row)
+        else:
+            buffer.write(dumps(dict(zip(columns, row))).decode())
+            buffer.write("\n")
+        if count % YIELD_PER == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_bytes(query, fmt: str, compress: bool):
+    if not compress:
+        for chunk in iter_text(query, fmt):
+            yield chunk.encode("utf-8")
+        return
+
+    # wbits=31 : format gzip
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in iter_text(query, fmt):
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(query, fmt: str, compress: bool, filename: str) -> StreamingResponse:
+    if fmt not in FORMATS:
+        raise HTTPException(422, "Le format doit être: csv ou ndjson")
+
+    media_type, extension = FORMATS[fmt]
+    filename = f"{filename}.{extension}"
+    if compress:
+        media_type = "application/gzip"
+        filename += ".gz"
+
+    return StreamingResponse(
+        iter_bytes(query, fmt, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
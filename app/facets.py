@@ -0,0 +1,114 @@
+# app/facets.py
+import argparse
+from fastapi import HTTPException
+from sqlalchemy import String, case, cast, func, literal, select, union_all
+from sqlalchemy.dialects.sqlite import insert
+from app.models import Book, BookFacet
+
+# Facettes de la recherche de livres (?facets=category,language,year,available) : nombre de livres par catégorie,
+# langue, décennie de parution et disponibilité.
+# - avec des filtres : une seule requête groupée (UNION ALL d'un GROUP BY par facette) sur les livres filtrés
+# - sans filtre : lecture de la table BookFacet, tenue à jour avec les livres (création, modification, suppression,
+#   import) et les stocks (emprunts et retours)
+
+FACETS = ("category", "language", "year", "available")
+
+def parse_facets(facets: str | None) -> list[str]:
+    if not facets:
+        return []
+    names = [name.strip() for name in facets.split(",") if name.strip()]
+    if any(name not in FACETS for name in names):
+        raise HTTPException(422, f"facets doit contenir: {', '.join(FACETS)}")
+    return list(dict.fromkeys(names))
+
+# Valeur de chaque facette pour une ligne de livre (l'année est regroupée par décennie : 1987 -> "1980")
+def facet_values(source) -> dict:
+    return {
+        "category": source.c.category,
+        "language": source.c.language,
+        "year": cast(source.c.year // 10 * 10, String),
+        "available": case((source.c.copies > 0, "true"), else_="false"),
+    }
+
+# Une requête : (facet, value, total) pour chaque facette demandée, sur les livres renvoyés par `source`
+def facet_counts(source, facets: list[str]):
+    values = facet_values(source)
+    return union_all(*(
+        select(literal(name).label("facet"), values[name].label("value"), func.count().label("total"))
+        .where(values[name].is_not(None))
+        .group_by(values[name])
+        for name in facets
+    ))
+
+def format_facets(rows, facets: list[str]) -> dict:
+    result = {name: {} for name in facets}
+    # Les valeurs les plus fréquentes d'abord
+    for facet, value, total in sorted(rows, key=lambda row: (-row[2], row[1])):
+        if total > 0:
+            result[facet][value] = total
+    return result
+
+# Facettes d'une recherche : `query` est la requête filtrée des livres (sans tri ni pagination)
+def search_facets(session, query, facets: list[str]) -> dict:
+    if query.whereclause is None:
+        rows = session.exec(
+            select(BookFacet.facet, BookFacet.value, BookFacet.count)
+            .where(BookFacet.facet.in_(facets), BookFacet.count > 0)
+        ).all()
+    else:
+        source = query.with_only_columns(Book.category, Book.language, Book.year, Book.copies).subquery()
+        rows = session.exec(facet_counts(source, facets)).all()
+    return format_facets(rows, facets)
+
+# Ajoute (sign=1) ou retire (sign=-1) des livres des comptes du catalogue, d'après leurs valeurs actuelles en base.
+# Une modification de livre retire le livre avant l'écriture et le rajoute après
+def record_facets(conn, book_ids: list[int], sign: int, facets: tuple[str, ...] = FACETS):
+    if not book_ids:
+        return
+    source = select(Book.category, Book.language, Book.year, Book.copies).where(Book.id.in_(book_ids)).subquery()
+    counts = facet_counts(source, list(facets)).subquery()
+    # WHERE true : lève l'ambiguïté de la syntaxe INSERT ... SELECT ... ON CONFLICT de SQLite
+    statement = insert(BookFacet).from_select(
+        ["facet", "value", "count"],
+        select(counts.c.facet, counts.c.value, counts.c.total * sign).where(literal(True)),
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[BookFacet.facet, BookFacet.value],
+        set_={"count": BookFacet.count + statement.excluded["count"]},
+    )
+    conn.execute(statement)
+
+# Changement de stock : livres passés à 0 exemplaire disponible (dernier exemplaire emprunté) ou revenus en stock
+def record_availability(conn, became_available: int, became_unavailable: int):
+    delta = became_available - became_unavailable
+    if not delta:
+        return
+    statement = insert(BookFacet).values([
+        {"facet": "available", "value": "true", "count": delta},
+        {"facet": "available", "value": "false", "count": -delta},
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[BookFacet.facet, BookFacet.value],
+        set_={"count": BookFacet.count + statement.excluded["count"]},
+    )
+    conn.execute(statement)
+
+# Recalcul complet à partir de la table des livres (migration, base générée ou correction d'une dérive)
+def recompute_facets(conn):
+    conn.execute(BookFacet.__table__.delete())
+    counts = facet_counts(select(Book.category, Book.language, Book.year, Book.copies).subquery(), list(FACETS))
+    conn.execute(insert(BookFacet).from_select(["facet", "value", "count"], counts))
+
+# Utilisation : python -m app.facets recompute
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestion des facettes de recherche")
+    parser.add_argument("command", choices=["recompute"])
+    args = parser.parse_args()
+
+    from app.database import engine
+
+    if args.command == "recompute":
+        with engine.begin() as conn:
+            recompute_facets(conn)
+            values = conn.execute(select(func.count()).select_from(BookFacet)).scalar()
+        print(f"Facettes recalculées : {values} valeurs")
@@ -0,0 +1,160 @@
+# app/fuzzy.py
+import argparse
+import re
+import unicodedata
+from sqlalchemy import delete, insert, select, text
+from app.models import Author, AuthorTrigram, Book, BookTrigram
+
+# Recherche tolérante aux fautes de frappe (?fuzzy=true) sur les titres des livres et les noms des auteurs.
+# Les textes sont normalisés (minuscules, sans accents) et découpés en trigrammes ("  hugo " -> "  h", " hu", "hug",
+# "ugo", "go "), enregistrés dans les tables BookTrigram et AuthorTrigram et tenus à jour avec les livres et les auteurs.
+# Une recherche se fait en deux temps :
+# 1. candidats : les livres (ou auteurs) qui partagent le plus de trigrammes avec la saisie, lus sur l'index.
+#    Seuls les trigrammes les plus rares de la saisie sont utilisés et chaque liste est plafonnée : le coût ne dépend
+#    pas de la taille du catalogue
+# 2. classement : distance d'édition (Damerau-Levenshtein) entre chaque mot saisi et le mot le plus proche du candidat,
+#    l'ordre des mots n'a pas d'importance ("Hugo Victr" trouve "Victor Hugo")
+
+# Nombre maximal de candidats relus et classés, de trigrammes utilisés et de lignes lues par trigramme
+FUZZY_CANDIDATES = 200
+MAX_GRAMS = 12
+POSTINGS_CAP = 20000
+
+# Pour chaque index : table des trigrammes, colonne de l'id et texte indexé (id, texte)
+INDEXES = {
+    "book": (BookTrigram.__table__, "book_id", select(Book.id, Book.title)),
+    "author": (AuthorTrigram.__table__, "author_id", select(Author.id, Author.firstname + " " + Author.lastname)),
+}
+REBUILD_CHUNK = 5000
+
+def normalize(value: str) -> str:
+    value = unicodedata.normalize("NFKD", value.lower())
+    value = "".join(char for char in value if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", value))
+
+def trigrams(value: str) -> set[str]:
+    grams = set()
+    for word in normalize(value).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+# Réindexe des livres ou des auteurs (création, modification, import) à partir de leur texte en base
+def index_trigrams(conn, kind: str, ids: list[int]):
+    if not ids:
+        return
+    table, id_name, source = INDEXES[kind]
+    conn.execute(delete(table).where(table.c[id_name].in_(ids)))
+    rows = [
+        {"gram": gram, id_name: ref}
+        for ref, value in conn.execute(source.where(source.selected_columns[0].in_(ids)))
+        for gram in trigrams(value)
+    ]
+    if rows:
+        conn.execute(insert(table), rows)
+
+def unindex_trigrams(conn, kind: str, ids: list[int]):
+    table, id_name, _ = INDEXES[kind]
+    conn.execute(delete(table).where(table.c[id_name].in_(ids)))
+
+# Reconstruit entièrement un index (migration, base générée), par lots d'ids
+def rebuild_trigrams(conn):
+    for kind, (table, _, source) in INDEXES.items():
+        conn.execute(delete(table))
+        pk = source.selected_columns[0]
+        last = 0
+        while ids := list(conn.execute(select(pk).where(pk > last).order_by(pk).limit(REBUILD_CHUNK)).scalars()):
+            index_trigrams(conn, kind, ids)
+            last = ids[-1]
+
+# Distance d'édition : insertions, suppressions, substitutions et inversions de deux lettres voisines ("zloa" -> "zola")
+def edit_distance(a: str, b: str) -> int:
+    before, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i]
+        for j in range(1, len(b) + 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (a[i - 1] != b[j - 1]))
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        before, previous = previous, current
+    return previous[-1]
+
+# Fautes tolérées selon la longueur du mot saisi : aucune jusqu'à 2 lettres, 1 jusqu'à 5, 2 au-delà
+def allowed_typos(word: str) -> int:
+    if len(word) <= 2:
+        return 0
+    return 1 if len(word) <= 5 else 2
+
+# Un mot saisi peut être le début du mot trouvé ("mis" pour "miserables")
+def word_distance(word: str, candidate: str) -> int:
+    return min(edit_distance(word, candidate), edit_distance(word, candidate[:len(word)]))
+
+# Somme des distances de chaque mot saisi au mot le plus proche du candidat, ou None si un mot n'a pas d'équivalent
+def match_distance(words: list[str], candidate_words: list[str]) -> int | None:
+    if not candidate_words:
+        return None
+    total = 0
+    for word in words:
+        best = min(word_distance(word, candidate) for candidate in candidate_words)
+        if best > allowed_typos(word):
+            return None
+        total += best
+    return total
+
+# Ids des livres ou des auteurs les plus proches de la saisie, du plus proche au moins proche
+def fuzzy_search(conn, kind: str, value: str) -> list[int]:
+    words = normalize(value).split()
+    if not words:
+        return []
+    table, id_name, source = INDEXES[kind]
+    grams = sorted(trigrams(value))
+    params = {f"g{i}": gram for i, gram in enumerate(grams)}
+
+    # Nombre (plafonné) de lignes de chaque trigramme : les plus rares sont les plus discriminants
+    counts = dict(conn.execute(
+        text(" UNION ALL ".join(
+            f"SELECT :g{i}, (SELECT COUNT(*) FROM (SELECT 1 FROM {table.name} WHERE gram = :g{i} LIMIT :cap))"
+            for i in range(len(grams))
+        )),
+        {**params, "cap": POSTINGS_CAP},
+    ).all())
+    selected = sorted((i for i, gram in enumerate(grams) if counts[gram]), key=lambda i: counts[grams[i]])[:MAX_GRAMS]
+    if not selected:
+        return []
+
+    # Candidats classés par nombre de trigrammes en commun avec la saisie
+    overlaps = dict(conn.execute(
+        text(
+            "SELECT ref, COUNT(*) AS overlap FROM ("
+            + " UNION ALL ".join(
+                f"SELECT * FROM (SELECT {id_name} AS ref FROM {table.name} WHERE gram = :g{i} LIMIT :cap)"
+                for i in selected
+            )
+            + ") GROUP BY ref ORDER BY overlap DESC, ref LIMIT :candidates"
+        ),
+        {**{f"g{i}": grams[i] for i in selected}, "cap": POSTINGS_CAP, "candidates": FUZZY_CANDIDATES},
+    ).all())
+
+    ranked = []
+    for ref, candidate in conn.execute(source.where(source.selected_columns[0].in_(list(overlaps)))):
+        distance = match_distance(words, normalize(candidate).split())
+        if distance is not None:
+            ranked.append((distance, -overlaps[ref], ref))
+    ranked.sort()
+    return [ref for _, _, ref in ranked]
+
+# Utilisation : python -m app.fuzzy rebuild
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestion de l'index de trigrammes de la recherche approchée")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    from app.database import engine
+
+    if args.command == "rebuild":
+        with engine.begin() as conn:
+            rebuild_trigrams(conn)
+            books = conn.execute(text("SELECT COUNT(DISTINCT book_id) FROM booktrigram")).scalar()
+            authors = conn.execute(text("SELECT COUNT(DISTINCT author_id) FROM authortrigram")).scalar()
+        print(f"Index de trigrammes reconstruit : {books} livres, {authors} auteurs")
@@ -0,0 +1,301 @@
+# app/importer.py
+import argparse
+import csv
+import io
+import json
+import tempfile
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import bindparam, insert, tuple_, update
+from sqlmodel import select
+from app.archive import archived_ids
+from app.cache import response_cache
+from app.changes import change_notifier, record_changes
+from app.database import immediate_engine
+from app.borrowers import sync_borrowers
+from app.models import Author, Book, Loan
+from app.overdue import sweep_overdue_loans
+from app.facets import record_availability, record_facets
+from app.fuzzy import index_trigrams
+from app.isbn import isbn_index
+from app.search import index_authors, index_books
+from app.stats import create_missing_history, record_loans
+
+# Import en masse de livres, d'auteurs et d'emprunts depuis un fichier CSV ou JSONL.
+# Le fichier est lu ligne par ligne et traité par lots : chaque lot est validé avec les modèles (mêmes validateurs que l'API),
+# les vérifications d'unicité et d'existence sont faites en une requête par lot, puis les lignes sont insérées
+# en une seule instruction dans une transaction courte. La mémoire utilisée ne dépend que de la taille d'un lot.
+
+FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 1000
+# On ne renvoie pas le détail de toutes les lignes rejetées pour que la réponse reste de taille bornée
+MAX_REPORTED_ERRORS = 1000
+# Au-delà de cette taille, le corps de la requête est stocké sur disque plutôt qu'en mémoire
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# Lit un fichier binaire et renvoie (numéro de ligne, enregistrement, erreur) pour chaque ligne
+def read_records(binary_file, fmt: str):
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="")
+
+    if fmt == "csv":
+        reader = csv.DictReader(text_file)
+        for row in reader:
+            # Les cellules vides deviennent None pour que les champs optionnels restent vides
+            record = {key: (value if value != "" else None) for key, value in row.items() if key is not None}
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(text_file, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"JSON invalide : {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Chaque ligne doit être un objet JSON"
+            continue
+        yield line_number, record, None
+
+def format_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'ligne'}: {err['msg']}" for err in error.errors()
+    )
+
+class BulkImport:
+    def __init__(self, kind: str, chunk_size: int = CHUNK_SIZE):
+        if kind not in IMPORTERS:
+            raise ValueError(f"Type d'import inconnu : {kind}")
+        self.model, self.prepare, self.insert_chunk, self.cache_tags = IMPORTERS[kind]
+        self.chunk_size = chunk_size
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+
+    def reject(self, row: int, reason: str):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "reason": reason})
+
+    def run(self, records):
+        chunk = []
+        for row, record, error in records:
+            if error:
+                self.reject(row, error)
+                continue
+            try:
+                item = self.model.model_validate(self.prepare(record))
+            except ValidationError as e:
+                self.reject(row, format_validation_error(e))
+                continue
+            chunk.append((row, item))
+            if len(chunk) >= self.chunk_size:
+                self.flush(chunk)
+                chunk = []
+        self.flush(chunk)
+        return self.report()
+
+    def flush(self, chunk):
+        if not chunk:
+            return
+        with immediate_engine.begin() as conn:
+            rows = self.insert_chunk(conn, chunk, self.reject)
+        self.accepted += rows
+        if rows:
+            tags = self.cache_tags(chunk) if callable(self.cache_tags) else self.cache_tags
+            response_cache.invalidate(*tags)
+            change_notifier.notify()
+
+    def report(self):
+        return {
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "errors_truncated": self.rejected > len(self.errors),
+        }
+
+# Rejette les lignes dont l'id est déjà utilisé (les ids sont facultatifs dans le fichier)
+def filter_existing_ids(conn, model, chunk, reject):
+    ids = {item.id for _, item in chunk if item.id is not None}
+    if not ids:
+        return chunk
+    existing = set(conn.execute(select(model.id).where(model.id.in_(ids))).scalars())
+    kept = []
+    for row, item in chunk:
+        if item.id in existing:
+            reject(row, f"L'id {item.id} existe déjà")
+            continue
+        if item.id is not None:
+            existing.add(item.id)
+        kept.append((row, item))
+    return kept
+
+def insert_rows(conn, model, items) -> list[int]:
+    if not items:
+        return []
+    return list(conn.execute(insert(model).returning(model.id), [item.model_dump() for item in items]).scalars())
+
+def prepare_record(record: dict) -> dict:
+    return record
+
+def insert_books(conn, chunk, reject) -> int:
+    chunk = filter_existing_ids(conn, Book, chunk, reject)
+    # Les ISBN déjà connus de l'index en mémoire sont rejetés sans requête, seuls les autres sont vérifiés en base
+    isbns = {item.isbn for _, item in chunk}
+    existing_isbns = {isbn for isbn in isbns if isbn_index.get(isbn) is not None}
+    author_ids = {item.author_id for _, item in chunk}
+    existing_isbns.update(conn.execute(select(Book.isbn).where(Book.isbn.in_(isbns - existing_isbns))).scalars())
+    existing_authors = set(conn.execute(select(Author.id).where(Author.id.in_(author_ids))).scalars())
+
+    items = []
+    for row, book in chunk:
+        if book.isbn in existing_isbns:
+            reject(row, "Un livre avec cet ISBN existe déjà")
+            continue
+        if book.author_id not in existing_authors:
+            reject(row, "L'auteur référencé n'existe pas")
+            continue
+        existing_isbns.add(book.isbn)
+        items.append(book)
+
+    book_ids = insert_rows(conn, Book, items)
+    isbn_index.add_on_commit(conn, conn.execute(select(Book.isbn, Book.id).where(Book.id.in_(book_ids))).all())
+    index_books(conn, book_ids)
+    index_trigrams(conn, "book", book_ids)
+    create_missing_history(conn, book_ids)
+    record_facets(conn, book_ids, 1)
+    record_changes(conn, "book", "create", book_ids)
+    return len(book_ids)
+
+def insert_authors(conn, chunk, reject) -> int:
+    chunk = filter_existing_ids(conn, Author, chunk, reject)
+    names = {(item.firstname, item.lastname) for _, item in chunk}
+    existing_names = set(
+        conn.execute(
+            select(Author.firstname, Author.lastname).where(tuple_(Author.firstname, Author.lastname).in_(names))
+        ).tuples()
+    )
+
+    items = []
+    for row, author in chunk:
+        name = (author.firstname, author.lastname)
+        if name in existing_names:
+            reject(row, "Cet auteur existe déjà")
+            continue
+        existing_names.add(name)
+        items.append(author)
+
+    author_ids = insert_rows(conn, Author, items)
+    index_authors(conn, author_ids)
+    index_trigrams(conn, "author", author_ids)
+    record_changes(conn, "author", "create", author_ids)
+    return len(author_ids)
+
+# La date de retour prévue est calculée comme dans l'API si elle n'est pas fournie
+def prepare_loan(record: dict) -> dict:
+    from app.routers.loans import compute_due_date, parse_date
+
+    if record.get("due_date") is None and record.get("start_date") is not None:
+        try:
+            start = parse_date(record["start_date"], "start_date")
+        except HTTPException:
+            return record
+        record = {**record, "start_date": start, "due_date": compute_due_date(start)}
+    return record
+
+# Les emprunts retournés importés sont de l'historique : seules les statistiques sont modifiées. Un emprunt en cours
+# retire un exemplaire du stock de son livre, comme POST /loans/ (ligne rejetée s'il n'en reste plus) : son retour
+# remet l'exemplaire en stock. La transaction de l'import tient le verrou d'écriture entre la lecture et la mise à jour
+def insert_loans(conn, chunk, reject) -> int:
+    chunk = filter_existing_ids(conn, Loan, chunk, reject)
+    # Un id peut aussi être pris par un emprunt archivé
+    archived = archived_ids(conn, [item.id for _, item in chunk if item.id is not None])
+    book_ids = {item.book_id for _, item in chunk}
+    copies = dict(conn.execute(select(Book.id, Book.copies).where(Book.id.in_(book_ids))).all())
+    taken: dict[int, int] = {}
+
+    items = []
+    for row, loan in chunk:
+        if loan.id in archived:
+            reject(row, f"L'id {loan.id} existe déjà")
+            continue
+        if loan.book_id not in copies:
+            reject(row, "Le livre est introuvable")
+            continue
+        if loan.active:
+            if copies[loan.book_id] - taken.get(loan.book_id, 0) <= 0:
+                reject(row, "Plus de stocks pour ce livre")
+                continue
+            taken[loan.book_id] = taken.get(loan.book_id, 0) + 1
+        items.append(loan)
+
+    if taken:
+        conn.execute(
+            update(Book.__table__).where(Book.__table__.c.id == bindparam("book_id"))
+            .values(copies=Book.__table__.c.copies - bindparam("taken")),
+            [{"book_id": book_id, "taken": count} for book_id, count in taken.items()],
+        )
+        # Livres dont le dernier exemplaire est emprunté : ils passent dans la facette « non disponible »
+        record_availability(
+            conn, became_available=0,
+            became_unavailable=sum(1 for book_id, count in taken.items() if copies[book_id] == count),
+        )
+
+    loan_ids = insert_rows(conn, Loan, items)
+    record_loans(conn, loan_ids)
+    # Les emprunts en cours déjà en retard sont marqués tout de suite, sans attendre le prochain balayage
+    sweep_overdue_loans(conn, loan_ids=loan_ids)
+    sync_borrowers(conn, {item.loaner_card_id for item in items})
+    record_changes(conn, "loan", "create", loan_ids)
+    record_changes(conn, "book", "update", list(taken))
+    return len(loan_ids)
+
+# Le stock des livres des emprunts en cours a changé : leur fiche en cache est invalidée
+def loan_cache_tags(chunk) -> tuple[str, ...]:
+    return ("loans", "books", *{f"book:{item.book_id}" for _, item in chunk if item.active})
+
+# Pour chaque type : modèle de validation, préparation d'une ligne, insertion d'un lot, tags du cache à invalider
+IMPORTERS = {
+    "books": (Book, prepare_record, insert_books, ("books",)),
+    "authors": (Author, prepare_record, insert_authors, ("authors",)),
+    "loans": (Loan, prepare_loan, insert_loans, loan_cache_tags),
+}
+
+def import_file(kind: str, binary_file, fmt: str, chunk_size: int = CHUNK_SIZE):
+    return BulkImport(kind, chunk_size).run(read_records(binary_file, fmt))
+
+# Utilisé par les routes /bulk : le corps de la requête est recopié au fil de l'eau dans un fichier temporaire
+# (en mémoire jusqu'à SPOOL_MAX_SIZE, puis sur disque), et l'import tourne dans le threadpool
+async def import_request(request: Request, kind: str, fmt: str, chunk_size: int):
+    if fmt not in FORMATS:
+        raise HTTPException(422, "Le format doit être: csv ou jsonl")
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        async for data in request.stream():
+            spool.write(data)
+        spool.seek(0)
+        return await run_in_threadpool(import_file, kind, spool, fmt, chunk_size)
+
+# Utilisation : python -m app.importer books catalogue.csv
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import en masse de livres, d'auteurs ou d'emprunts")
+    parser.add_argument("kind", choices=list(IMPORTERS))
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="Déduit de l'extension du fichier par défaut")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    from app.database import create_db_and_tables
+
+    create_db_and_tables()
+
+    fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+    with open(args.path, "rb") as f:
+        report = import_file(args.kind, f, fmt, args.chunk_size)
+
+    print(f"{report['accepted']} lignes importées, {report['rejected']} rejetées")
+    for error in report["errors"]:
+        print(f"  ligne {error['row']} : {error['reason']}")
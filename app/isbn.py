@@ -0,0 +1,116 @@
+# app/isbn.py
+import threading
+from fastapi import HTTPException
+from sqlalchemy import event, text
+
+# ISBN des livres : normalisation et index en mémoire.
+# - normalisation : tirets et espaces retirés, ISBN-10 converti en ISBN-13 (préfixe 978), clé de contrôle vérifiée.
+#   Les ISBN sont normalisés à la validation du modèle Book (API, import en masse) et par la migration 8
+# - index : dictionnaire ISBN-13 (entier) -> id du livre, chargé au démarrage puis tenu à jour par les créations,
+#   modifications, suppressions et imports. GET /books/by-isbn/{isbn} répond sans requête SQL de recherche quand
+#   l'ISBN est indexé, et la vérification des doublons à la création répond 409 sans requête SQL
+# L'index est propre à chaque processus (comme le cache des réponses) : un ISBN inséré ailleurs (autre worker, import
+# en ligne de commande) est cherché en base par GET /books/by-isbn/{isbn} puis indexé, et reste refusé en doublon par
+# la contrainte d'unicité de la base. Un livre supprimé ailleurs n'est retiré de l'index qu'à sa prochaine lecture par
+# GET /books/by-isbn/{isbn} ou au redémarrage.
+
+def isbn10_check(digits: str) -> str:
+    check = (11 - sum((10 - i) * int(d) for i, d in enumerate(digits[:9])) % 11) % 11
+    return "X" if check == 10 else str(check)
+
+def isbn13_check(digits: str) -> str:
+    return str((10 - sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(digits[:12])) % 10) % 10)
+
+# ISBN-10 ou ISBN-13, avec ou sans tirets -> ISBN-13 sans tirets ("2-07-036002-4" -> "9782070360024")
+def normalize_isbn(value: str) -> str:
+    isbn = value.replace("-", "").replace(" ", "").upper()
+    if len(isbn) == 10 and isbn[:9].isdigit() and (isbn[9].isdigit() or isbn[9] == "X"):
+        if isbn[9] != isbn10_check(isbn):
+            raise ValueError("Clé de contrôle de l'ISBN-10 invalide")
+        isbn = "978" + isbn[:9]
+        return isbn + isbn13_check(isbn)
+    if len(isbn) == 13 and isbn.isdigit():
+        if not isbn.startswith(("978", "979")):
+            raise ValueError("Un ISBN-13 commence par 978 ou 979")
+        if isbn[12] != isbn13_check(isbn):
+            raise ValueError("Clé de contrôle de l'ISBN-13 invalide")
+        return isbn
+    raise ValueError("ISBN invalide : 10 ou 13 caractères attendus (chiffres, X en dernière position d'un ISBN-10)")
+
+# Valeur recherchée par le filtre ?isbn= : normalisée si c'est un ISBN valide, telle quelle sinon
+def clean_isbn(value: str) -> str:
+    try:
+        return normalize_isbn(value)
+    except ValueError:
+        return value
+
+# Clé de l'index, ou None pour un ISBN invalide (ISBN enregistré avant la normalisation)
+def isbn_key(value: str) -> int | None:
+    try:
+        return int(normalize_isbn(value))
+    except ValueError:
+        return None
+
+def parse_isbn(value: str) -> str:
+    try:
+        return normalize_isbn(value)
+    except ValueError as e:
+        raise HTTPException(422, str(e)) from e
+
+# Migration des ISBN enregistrés avant la normalisation : les ISBN valides sont réécrits en ISBN-13 sans tirets,
+# sauf s'ils deviennent le doublon d'un autre livre. Les ISBN invalides sont laissés tels quels
+def normalize_stored_isbns(conn):
+    rows = conn.execute(text("SELECT id, isbn FROM book")).all()
+    taken = {isbn for _, isbn in rows}
+    updates = []
+    for book_id, isbn in rows:
+        normalized = clean_isbn(isbn)
+        if normalized != isbn and normalized not in taken:
+            taken.add(normalized)
+            updates.append({"id": book_id, "isbn": normalized})
+    if updates:
+        conn.execute(text("UPDATE book SET isbn = :isbn WHERE id = :id"), updates)
+
+class IsbnIndex:
+    def __init__(self):
+        self.ids: dict[int, int] = {}
+        self.lock = threading.Lock()
+
+    # Chargement complet (démarrage de l'application)
+    def warm(self, engine):
+        with engine.connect() as conn:
+            ids = {}
+            for isbn, book_id in conn.execute(text("SELECT isbn, id FROM book")):
+                # Les ISBN enregistrés sont déjà normalisés (validation et migration 8) : pas de nouveau calcul de clé
+                key = int(isbn) if len(isbn) == 13 and isbn.isdigit() else isbn_key(isbn)
+                if key is not None:
+                    ids[key] = book_id
+        with self.lock:
+            self.ids = ids
+
+    def get(self, isbn: str) -> int | None:
+        key = isbn_key(isbn)
+        return None if key is None else self.ids.get(key)
+
+    def add(self, items: list[tuple[str, int]]):
+        with self.lock:
+            for isbn, book_id in items:
+                key = isbn_key(isbn)
+                if key is not None:
+                    self.ids[key] = book_id
+
+    def discard(self, isbn: str, book_id: int):
+        key = isbn_key(isbn)
+        with self.lock:
+            if key is not None and self.ids.get(key) == book_id:
+                del self.ids[key]
+
+    # Ajout différé à la validation de la transaction de `conn` (import en masse) : un lot annulé n'est pas indexé
+    def add_on_commit(self, conn, items: list[tuple[str, int]]):
+        if items:
+            event.listen(conn, "commit", lambda _: self.add(items), once=True)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+isbn_index = IsbnIndex()
@@ -1,7 +1,15 @@
 # app/main.py
+import asyncio
 from fastapi import FastAPI
-from app.database import create_db_and_tables
-from app.routers import books, authors, loans
+from fastapi.responses import PlainTextResponse
+from app.cache import response_cache
+from app.database import async_mode, create_db_and_tables, engine
+from app.isbn import isbn_index
+from app.metrics import MetricsMiddleware, metrics
+from app.overdue import OVERDUE_SWEEP_INTERVAL, overdue_scheduler
+from app.reports import shutdown_reports
+from app.stats import refresh_recent_popularity
+from app.routers import books, authors, loans, stats, borrowers, reports, changes
 
 # Les infos de base de l'API
 app = FastAPI(
@@ -10,17 +18,65 @@ app = FastAPI(
     version="1.0.0",
 )
 
-# On inclus les routers
-app.include_router(books.router)
-app.include_router(authors.router)
-app.include_router(loans.router)
+# Durée, code de réponse et nombre de requêtes SQL de chaque requête, exposés sur /metrics
+app.add_middleware(MetricsMiddleware)
+
+# On inclus les routers (versions async avec AsyncSession si async_mode=true dans le .env)
+if async_mode:
+    from app.routers import authors_async, books_async, loans_async
+
+    app.include_router(books_async.router)
+    app.include_router(authors_async.router)
+    app.include_router(loans_async.router)
+else:
+    app.include_router(books.router)
+    app.include_router(authors.router)
+    app.include_router(loans.router)
+app.include_router(stats.router)
+app.include_router(borrowers.router)
+app.include_router(reports.router)
+app.include_router(changes.router)
 
 # Création de la base de données et lancement de la fonction (create_db_and_tables) à l'exécution du script 
 @app.on_event("startup")
 def on_startup():
     create_db_and_tables()
+    isbn_index.warm(engine)
+    # Sans balayage automatique, la popularité récente est tout de même recalculée à chaque démarrage
+    if OVERDUE_SWEEP_INTERVAL <= 0:
+        with engine.begin() as conn:
+            refresh_recent_popularity(conn)
+
+# Tâche de fond : balayage quotidien des retards et de la popularité récente (un premier passage au démarrage)
+scheduler_tasks: set[asyncio.Task] = set()
+
+@app.on_event("startup")
+async def start_scheduler():
+    if OVERDUE_SWEEP_INTERVAL > 0:
+        scheduler_tasks.add(asyncio.create_task(overdue_scheduler()))
+
+@app.on_event("shutdown")
+async def stop_scheduler():
+    for task in scheduler_tasks:
+        task.cancel()
+    scheduler_tasks.clear()
+
+# Arrêt du pool de processus des rapports (les rapports en attente sont abandonnés)
+@app.on_event("shutdown")
+def stop_reports():
+    shutdown_reports()
 
 # On définit un message de bienvenue pour la route root
 @app.get("/")
 def root():
     return {"message": "Bienvenue sur l'API de La Bibliothèque"}
+
+# Métriques au format texte Prometheus (requêtes par route, latences, requêtes SQL, cache)
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# Compteurs du cache des réponses (succès, échecs, évictions, invalidations)
+@app.get("/cache/stats")
+def cache_stats():
+    return response_cache.stats()
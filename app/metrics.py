@@ -0,0 +1,195 @@
+# app/metrics.py
+import bisect
+import contextvars
+import logging
+import os
+import threading
+import time
+from app.cache import response_cache
+
+# Métriques de l'API au format texte Prometheus (GET /metrics) :
+# - par route (modèle de chemin, ex. /books/{book_id}) : nombre de requêtes par code HTTP, histogramme des durées
+# - par requête : nombre de requêtes SQL et temps passé dans SQLite (événements branchés sur les moteurs dans database.py)
+# - requêtes SQL lentes : journalisées avec leur SQL au-delà de slow_query_ms
+# - attente du verrou d'écriture : temps passé dans les BEGIN, compté à part des requêtes lentes
+# Comme le cache, les métriques sont propres à chaque processus (chaque worker uvicorn a les siennes).
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_SECONDS = float(os.getenv('slow_query_ms', '200')) / 1000
+# Début de transaction : un BEGIN IMMEDIATE attend le verrou d'écriture (jusqu'à
+# sqlite_busy_timeout) quand un autre écrivain le tient, ce n'est pas une requête lente
+# Le COMMIT et le ROLLBACK passent par connection.commit() / rollback() du driver, pas par un curseur : ils ne sont
+# pas chronométrés (ni comptés comme requêtes SQL)
+TRANSACTION_STATEMENTS = ("BEGIN",)
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 500)
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value: float):
+        # bisect_left : une valeur égale à une borne compte dans ce seau (le="borne")
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+# Compteurs de la requête HTTP en cours, partagés avec les événements SQLAlchemy via une ContextVar
+class RequestStats:
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.statements = 0
+        self.db_seconds = 0.0
+
+    def route(self) -> str:
+        route = self.scope.get("route")
+        return route.path if route else "unmatched"
+
+current_request: contextvars.ContextVar[RequestStats | None] = contextvars.ContextVar("current_request", default=None)
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels: dict) -> str:
+    return "{" + ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + "}"
+
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests: dict[tuple, int] = {}
+        self.durations: dict[tuple, Histogram] = {}
+        self.request_statements: dict[tuple, Histogram] = {}
+        self.request_db_seconds: dict[tuple, Histogram] = {}
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.slow_queries = 0
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stats: RequestStats):
+        key = (method, route)
+        with self.lock:
+            self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+            self.durations.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.request_statements.setdefault(key, Histogram(STATEMENT_BUCKETS)).observe(stats.statements)
+            self.request_db_seconds.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(stats.db_seconds)
+
+    def observe_statement(self, seconds: float, slow: bool):
+        with self.lock:
+            self.statements += 1
+            self.db_seconds += seconds
+            if slow:
+                self.slow_queries += 1
+
+    def observe_lock_wait(self, seconds: float, slow: bool):
+        with self.lock:
+            self.lock_wait_seconds += seconds
+            if slow:
+                self.lock_waits += 1
+
+    def render(self) -> str:
+        lines = []
+
+        def header(name: str, kind: str, help_text: str):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def histogram(name: str, values: dict[tuple, Histogram]):
+            for (method, route), hist in sorted(values.items()):
+                cumulative = 0
+                for bound, count in zip((*hist.buckets, "+Inf"), hist.counts):
+                    cumulative += count
+                    labels = format_labels({"method": method, "route": route, "le": bound})
+                    lines.append(f"{name}_bucket{labels} {cumulative}")
+                labels = format_labels({"method": method, "route": route})
+                lines.append(f"{name}_sum{labels} {hist.sum}")
+                lines.append(f"{name}_count{labels} {hist.count}")
+
+        with self.lock:
+            header("http_requests_total", "counter", "Nombre de requêtes HTTP par route et code de réponse")
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{format_labels({'method': method, 'route': route, 'status': status})} {count}")
+            header("http_request_duration_seconds", "histogram", "Durée des requêtes HTTP par route")
+            histogram("http_request_duration_seconds", self.durations)
+            header("db_statements_per_request", "histogram", "Nombre de requêtes SQL par requête HTTP")
+            histogram("db_statements_per_request", self.request_statements)
+            header("db_seconds_per_request", "histogram", "Temps passé dans SQLite par requête HTTP")
+            histogram("db_seconds_per_request", self.request_db_seconds)
+            header("db_statements_total", "counter", "Nombre total de requêtes SQL (y compris hors requêtes HTTP)")
+            lines.append(f"db_statements_total {self.statements}")
+            header("db_seconds_total", "counter", "Temps total passé dans SQLite")
+            lines.append(f"db_seconds_total {self.db_seconds}")
+            header("db_slow_queries_total", "counter", f"Requêtes SQL plus lentes que {SLOW_QUERY_SECONDS * 1000:g} ms")
+            lines.append(f"db_slow_queries_total {self.slow_queries}")
+            header("db_lock_wait_seconds_total", "counter", "Temps passé dans les BEGIN (attente du verrou d'écriture)")
+            lines.append(f"db_lock_wait_seconds_total {self.lock_wait_seconds}")
+            header("db_lock_waits_total", "counter", f"BEGIN plus longs que {SLOW_QUERY_SECONDS * 1000:g} ms")
+            lines.append(f"db_lock_waits_total {self.lock_waits}")
+
+        cache = response_cache.stats()
+        for name in ("hits", "misses", "evictions", "invalidations"):
+            header(f"cache_{name}_total", "counter", f"Cache des réponses : {name}")
+            lines.append(f"cache_{name}_total {cache[name]}")
+        header("cache_entries", "gauge", "Cache des réponses : nombre d'entrées")
+        lines.append(f"cache_entries {cache['entries']}")
+
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+# Événements SQLAlchemy (branchés dans database.py) : chronométrage de chaque requête SQL
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_start"].pop()
+    slow = seconds >= SLOW_QUERY_SECONDS
+    if statement.lstrip().upper().startswith(TRANSACTION_STATEMENTS):
+        metrics.observe_lock_wait(seconds, slow)
+        slow = False
+    metrics.observe_statement(seconds, slow)
+
+    stats = current_request.get()
+    if stats:
+        stats.statements += 1
+        stats.db_seconds += seconds
+    if slow:
+        route = stats.route() if stats else "-"
+        logger.warning("Requête SQL lente (%.1f ms, route %s) : %s", seconds * 1000, route, " ".join(statement.split()))
+
+# Une requête en erreur ne déclenche pas after_cursor_execute : on retire son heure de départ
+def handle_error(context):
+    if context.connection is not None and context.connection.info.get("query_start"):
+        context.connection.info["query_start"].pop()
+
+# Middleware ASGI : durée, code de réponse et compteurs SQL de chaque requête HTTP
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            metrics.observe_request(scope["method"], stats.route(), status, time.perf_counter() - start, stats)
@@ -0,0 +1,79 @@
+# app/migrations.py
+from sqlalchemy.sql.schema import ColumnDefault
+from sqlmodel import SQLModel
+from app.borrowers import sync_borrowers
+from app.facets import recompute_facets
+from app.fuzzy import rebuild_trigrams
+from app.isbn import normalize_stored_isbns
+from app.search import create_search_tables, fill_search_index
+from app.overdue import mark_returned_late_loans, sweep_overdue_loans
+from app.stats import create_missing_history, recompute_loan_history
+
+# Migrations légères exécutées au démarrage, après create_all.
+# create_all crée les tables manquantes mais n'ajoute jamais d'index (ni de colonne) à une table qui existe déjà :
+# on complète donc ici le schéma des bases existantes. La version du schéma est enregistrée dans PRAGMA user_version.
+
+# Ajoute les colonnes déclarées dans les modèles qui n'existent pas encore dans une table existante (idempotent).
+# SQLite impose une valeur par défaut pour ajouter une colonne NOT NULL : on reprend celle du modèle
+def add_missing_columns(conn):
+    for table in SQLModel.metadata.sorted_tables:
+        existing = {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info('{table.name}')")}
+        if not existing:
+            continue
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=conn.dialect)}"
+            default = column.default
+            if isinstance(default, ColumnDefault) and default.is_scalar and default.arg is not None:
+                ddl += f" NOT NULL DEFAULT {int(default.arg) if isinstance(default.arg, bool) else repr(default.arg)}"
+            conn.exec_driver_sql(ddl)
+
+# Crée les index déclarés dans les modèles qui n'existent pas encore dans la base (idempotent)
+def create_missing_indexes(conn):
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+# Liste ordonnée des migrations : (version, fonction). Une migration n'est jouée que si la base a une version inférieure
+MIGRATIONS = [
+    (1, create_missing_indexes),
+    # Table LoanHistory : on la remplit à partir des emprunts déjà présents dans la base
+    (2, recompute_loan_history),
+    # Tri par popularité : chaque livre doit avoir sa ligne LoanHistory
+    (3, create_missing_history),
+    # Colonne loan.late : premier balayage des retards des emprunts en cours
+    (4, sweep_overdue_loans),
+    # Table Borrower : compteurs calculés à partir des emprunts existants
+    (5, sync_borrowers),
+    # Table BookFacet : comptes des facettes du catalogue existant
+    (6, recompute_facets),
+    # Tables BookTrigram et AuthorTrigram : index de la recherche approchée des livres et auteurs existants
+    (7, rebuild_trigrams),
+    # ISBN enregistrés en ISBN-13 sans tirets (recherche par ISBN et index en mémoire)
+    (8, normalize_stored_isbns),
+    # Tables book_fts et author_fts : index plein texte des livres et auteurs existants (bases antérieures à FTS5)
+    (9, fill_search_index),
+    # Colonne loan.late des emprunts déjà retournés : renseignée d'après leurs jours de retard
+    (10, mark_returned_late_loans),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn) -> int:
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+def run_migrations(engine):
+    with engine.begin() as conn:
+        version = get_schema_version(conn)
+        # Les colonnes sont ajoutées avant les migrations de données, et les index après
+        add_missing_columns(conn)
+        # Tables virtuelles FTS5 (hors de SQLModel.metadata) : créées avant la migration qui les remplit
+        create_search_tables(conn)
+        for target, migration in MIGRATIONS:
+            if target > version:
+                migration(conn)
+        # Les index sont toujours vérifiés : un index ajouté à un modèle sans nouvelle migration est quand même créé
+        create_missing_indexes(conn)
+        if version < SCHEMA_VERSION:
+            conn.exec_driver_sql(f"PRAGMA user_version = {SCHEMA_VERSION}")
@@ -1,7 +1,9 @@
 # app/models.py
-from sqlmodel import Field, SQLModel
+from sqlalchemy import Index
+from sqlmodel import Field, Relationship, SQLModel
 from pydantic import model_validator, field_validator
 from datetime import date, datetime
+from app.isbn import normalize_isbn
 
 # On définit les classes Book, Author et Loan afin que l'api puisse écrire les données dans les tables
 
@@ -9,16 +11,26 @@ class Book(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     title: str
     isbn: str = Field(unique=True)
-    year: int
-    author_id: int
+    year: int = Field(index=True)
+    author_id: int = Field(index=True, foreign_key="author.id")
     copies: int = Field(default=0, ge=0)
     owned: int = Field(default=0, gt=0)
     description: str | None = None
-    category: str | None = None
-    language: str
+    category: str | None = Field(default=None, index=True)
+    language: str = Field(index=True)
     pages: int = Field(gt=0)
     house: str | None = None
 
+    # Chargé à la demande : les routes de liste utilisent selectinload (une requête IN par page), le détail un JOIN
+    author: "Author" = Relationship(back_populates="books")
+
+    # ISBN-10 ou ISBN-13 avec ou sans tirets : enregistré en ISBN-13 sans tirets, clé de contrôle vérifiée (import en masse,
+    # les routes de création et de modification normalisent elles-mêmes l'ISBN reçu)
+    @field_validator("isbn")
+    @classmethod
+    def check_isbn(cls, v):
+        return normalize_isbn(v)
+
     @model_validator(mode="after")
     def copies_over_owned(self):
         if self.copies > self.owned:
@@ -28,13 +40,15 @@ class Book(SQLModel, table=True):
 class Author(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     firstname: str
-    lastname: str
+    lastname: str = Field(index=True)
     birth: date
-    country: str
+    country: str = Field(index=True)
     bio: str | None = None
     death: date | None = None
     website: str | None = None
 
+    books: list[Book] = Relationship(back_populates="author")
+
     @field_validator("birth", "death", mode="before")
     @classmethod
     # Fonction permettant de formater la date avant de la placer dans la base de données. Nécessaire car sinon nous avons l'erreur 'SQLite Date type only accepts Python date objects as input.'
@@ -59,16 +73,106 @@ class Author(SQLModel, table=True):
         raise TypeError("La date doit être une date, un datetime, ou une string 'YYYY-MM-DD'.")
 
 class Loan(SQLModel, table=True):
+    # Index composites pour le balayage des retards (active, due_date), la liste des retards (active, late, due_date)
+    # et le quota de 5 emprunts (active, mail/carte)
+    __table_args__ = (
+        Index("ix_loan_active_due_date", "active", "due_date"),
+        Index("ix_loan_active_late_due_date", "active", "late", "due_date"),
+        Index("ix_loan_active_loaner_mail", "active", "loaner_mail"),
+        Index("ix_loan_active_loaner_card_id", "active", "loaner_card_id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
     book_id: int = Field(index=True)
     loaner_name: str
     loaner_mail: str = Field(index=True)
     loaner_card_id: int = Field(index=True)
-    start_date: date
+    start_date: date = Field(index=True)
     due_date: date
-    returned_date: date = Field(default=None, nullable=True)
+    returned_date: date | None = Field(default=None, nullable=True)
     active: bool = Field(default=True)
+    # Emprunt actif en retard : tenu à jour par le balayage quotidien (app/overdue.py) avec late_days et penalty_cents
+    late: bool = Field(default=False)
     renew_count: int = Field(default=0, ge=0)
     late_days: int = Field(default=0, ge=0)
     penalty_cents: int = Field(default=0, ge=0)
-    comment: str | None = None
\ No newline at end of file
+    comment: str | None = None
+
+# Compteurs par carte d'emprunteur, tenus à jour avec les emprunts et les retours (voir app/borrowers.py) :
+# le quota de 5 emprunts est une lecture par clé primaire
+class Borrower(SQLModel, table=True):
+    card_id: int = Field(primary_key=True)
+    loaner_mail: str = Field(index=True)
+    loaner_name: str
+    active_loans: int = Field(default=0, ge=0)
+    # Pénalités des emprunts retournés en retard
+    penalty_cents: int = Field(default=0, ge=0)
+    # Pénalités en cours des emprunts actifs en retard (mises à jour par le balayage quotidien)
+    accrued_penalty_cents: int = Field(default=0, ge=0)
+
+# Corps des routes d'emprunt et de retour par lot (comptoir de prêt) : un emprunteur et plusieurs livres,
+# ou plusieurs emprunts à clôturer
+class LoanBatch(SQLModel):
+    book_ids: list[int] = Field(min_length=1, max_length=20)
+    loaner_name: str
+    loaner_mail: str
+    loaner_card_id: int
+    start_date: date | None = None
+    comment: str | None = None
+
+class ReturnBatch(SQLModel):
+    loan_ids: list[int] = Field(min_length=1, max_length=100)
+
+# Paramètres d'un rapport de statistiques (POST /reports) : période des emprunts, taille du classement et format
+class ReportRequest(SQLModel):
+    date_from: date | None = None
+    date_to: date | None = None
+    top: int = Field(default=10, ge=1, le=100)
+    format: str = "json"
+
+# Statistiques d'emprunts par livre, tenues à jour dans la même transaction que les emprunts et les retours.
+# Chaque livre a sa ligne (créée avec le livre), ce qui permet de trier le catalogue par popularité sur les index
+class LoanHistory(SQLModel, table=True):
+    book_id: int = Field(primary_key=True)
+    total_loans: int = Field(default=0, ge=0, index=True)
+    # Emprunts sur la période glissante récente (voir RECENT_POPULARITY_DAYS dans app/stats.py)
+    recent_loans: int = Field(default=0, ge=0, index=True)
+    active_loans: int = Field(default=0, ge=0)
+    returned_loans: int = Field(default=0, ge=0)
+    total_duration_days: int = Field(default=0, ge=0)
+    late_count: int = Field(default=0, ge=0)
+
+# Comptes des facettes de recherche (catégorie, langue, décennie, disponibilité) sur tout le catalogue, tenus à jour
+# dans la même transaction que les livres et les stocks (voir app/facets.py) : la recherche sans filtre les lit ici
+class BookFacet(SQLModel, table=True):
+    facet: str = Field(primary_key=True)
+    value: str = Field(primary_key=True)
+    count: int = Field(default=0)
+
+# Index de trigrammes pour la recherche tolérante aux fautes (?fuzzy=true, voir app/fuzzy.py) : une ligne par trigramme
+# du titre normalisé d'un livre ou du nom normalisé d'un auteur. La clé (gram, id) permet de lire directement les
+# livres ou auteurs qui contiennent un trigramme ; l'index sur l'id sert à réindexer un livre ou un auteur modifié
+class BookTrigram(SQLModel, table=True):
+    __table_args__ = (Index("ix_booktrigram_book_id", "book_id"), {"sqlite_with_rowid": False})
+
+    gram: str = Field(primary_key=True)
+    book_id: int = Field(primary_key=True)
+
+class AuthorTrigram(SQLModel, table=True):
+    __table_args__ = (Index("ix_authortrigram_author_id", "author_id"), {"sqlite_with_rowid": False})
+
+    gram: str = Field(primary_key=True)
+    author_id: int = Field(primary_key=True)
+
+# Journal des modifications du catalogue et des emprunts (GET /changes, voir app/changes.py) : une ligne par création,
+# modification ou suppression, écrite dans la même transaction. seq est croissant et jamais réutilisé (AUTOINCREMENT)
+class ChangeLog(SQLModel, table=True):
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq: int | None = Field(default=None, primary_key=True)
+    entity: str
+    entity_id: int
+    op: str
+    at: datetime
+    # État de la ligne après la modification (JSON), absent pour une suppression
+    data: str | None = None
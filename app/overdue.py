@@ -0,0 +1,97 @@
+# app/overdue.py
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, text
+from app.cache import response_cache
+
+# Balayage des retards : une fois par jour (et à la demande), une seule requête UPDATE marque les emprunts actifs
+# dont la date de retour est dépassée (colonne late) et met à jour leurs jours de retard et leur pénalité en cours.
+# La liste des retards et les totaux de pénalités sont ensuite de simples lectures sur l'index (active, late, due_date).
+
+logger = logging.getLogger(__name__)
+
+# Pénalité de retard, en centimes par jour (même règle que compute_penalty au retour d'un emprunt)
+PENALTY_CENTS_PER_DAY = 50
+# Intervalle (en secondes) entre deux balayages automatiques, 0 pour les désactiver
+OVERDUE_SWEEP_INTERVAL = int(os.getenv('overdue_sweep_interval', str(24 * 60 * 60)))
+
+LATE_DAYS = "CAST(julianday(:today) - julianday(due_date) AS INTEGER)"
+
+# Renvoie le nombre d'emprunts en retard mis à jour. Avec loan_ids, seuls ces emprunts sont balayés (import en masse)
+def sweep_overdue_loans(conn, today: date | None = None, loan_ids: list[int] | None = None) -> int:
+    params = {"today": (today or date.today()).isoformat(), "rate": PENALTY_CENTS_PER_DAY}
+    only = ""
+    if loan_ids is not None:
+        if not loan_ids:
+            return 0
+        only = " AND id IN :ids"
+        params["ids"] = loan_ids
+
+    def statement(sql: str):
+        statement = text(sql + only)
+        return statement.bindparams(bindparam("ids", expanding=True)) if loan_ids is not None else statement
+
+    late = conn.execute(
+        statement(
+            f"UPDATE loan SET late = 1, late_days = {LATE_DAYS}, penalty_cents = {LATE_DAYS} * :rate "
+            "WHERE active = 1 AND due_date < :today"
+        ),
+        params,
+    ).rowcount
+    # Un emprunt renouvelé depuis le dernier balayage n'est plus en retard
+    conn.execute(
+        statement(
+            "UPDATE loan SET late = 0, late_days = 0, penalty_cents = 0 "
+            "WHERE active = 1 AND late = 1 AND due_date >= :today"
+        ),
+        params,
+    )
+    return late
+
+# Migration : emprunts retournés en retard avant la colonne late (le retour la renseigne depuis), archives comprises
+def mark_returned_late_loans(conn):
+    from app.archive import ARCHIVE_PREFIX, archive_years
+
+    for table in ["loan", *(f"{ARCHIVE_PREFIX}{year}" for year in archive_years(conn))]:
+        conn.execute(text(f"UPDATE {table} SET late = late_days > 0 WHERE active = 0 AND late != (late_days > 0)"))
+
+# Tâche quotidienne : balayage des retards, pénalités en cours des emprunteurs, popularité récente
+# (la fenêtre glisse d'un jour) et archivage des anciens emprunts
+def run_daily_jobs() -> int:
+    from app.archive import LOAN_ARCHIVE_DAYS, archive_loans
+    from app.borrowers import refresh_accrued_penalties
+    from app.database import immediate_engine
+    from app.stats import refresh_recent_popularity
+
+    with immediate_engine.begin() as conn:
+        late = sweep_overdue_loans(conn)
+        refresh_accrued_penalties(conn)
+        refresh_recent_popularity(conn)
+    # Archivage des emprunts retournés depuis plus de loan_archive_days jours, par lots (transactions séparées)
+    if LOAN_ARCHIVE_DAYS > 0:
+        archive_loans(immediate_engine)
+    response_cache.invalidate("loans", "books")
+    return late
+
+# Boucle lancée au démarrage de l'API (voir app/main.py) : un balayage immédiat, puis un par intervalle
+async def overdue_scheduler():
+    while True:
+        try:
+            late = await run_in_threadpool(run_daily_jobs)
+            logger.info("Balayage des retards : %s emprunts en retard", late)
+        except Exception:
+            logger.exception("Échec du balayage des retards")
+        await asyncio.sleep(OVERDUE_SWEEP_INTERVAL)
+
+# Utilisation : python -m app.overdue sweep
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Balayage des emprunts en retard")
+    parser.add_argument("command", choices=["sweep"])
+    args = parser.parse_args()
+
+    if args.command == "sweep":
+        print(f"{run_daily_jobs()} emprunts en retard")
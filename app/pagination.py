@@ -0,0 +1,152 @@
+# app/pagination.py
+import base64
+import json
+from datetime import date, datetime
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_
+from sqlmodel import Session, select
+
+# Ce module regroupe la pagination commune à toutes les routes de listing.
+# Le total est calculé avec un SELECT COUNT(*) sur la requête filtrée (au lieu de charger toutes les lignes),
+# et un mode "curseur" (keyset) permet de parcourir les pages profondes sans OFFSET.
+# Avec ?fields=id,title,isbn, seules les colonnes demandées sont lues et renvoyées (sans créer d'objets SQLModel).
+
+# Colonnes demandées avec ?fields= (dans l'ordre donné), ou None pour renvoyer les objets complets
+def parse_fields(model, fields: str | None) -> list[str] | None:
+    if not fields:
+        return None
+    names = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip()))
+    columns = model.__table__.columns
+    if not names or any(name not in columns for name in names):
+        raise HTTPException(422, f"fields doit contenir des colonnes parmi: {', '.join(columns.keys())}")
+    return names
+
+# Requête de listing : l'objet complet, ou seulement les colonnes demandées (model peut être une entité aliasée)
+def select_fields(model, fields: list[str] | None):
+    if fields is None:
+        return select(model)
+    return select(*(getattr(model, name) for name in fields))
+
+def count_rows(session: Session, query) -> int:
+    # On retire le tri, inutile pour compter, et on compte sur une sous-requête
+    subquery = query.order_by(None).subquery()
+    return session.exec(select(func.count()).select_from(subquery)).one()
+
+def encode_cursor(value, last_id: int) -> str:
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    payload = json.dumps([value, last_id]).encode()
+    return base64.urlsafe_b64encode(payload).decode()
+
+def decode_cursor(cursor: str, sort_col):
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(422, "Le curseur est invalide") from e
+
+    # SQLite n'accepte que des objets date pour les colonnes de type Date, on reconvertit donc la valeur
+    if value is not None:
+        try:
+            python_type = sort_col.type.python_type
+        except NotImplementedError:
+            python_type = None
+        try:
+            if python_type is date:
+                value = date.fromisoformat(value)
+            elif python_type is datetime:
+                value = datetime.fromisoformat(value)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(422, "Le curseur est invalide") from e
+    return value, last_id
+
+# Condition "après la dernière ligne vue" pour un tri (sort_col, id). SQLite place les NULL en premier en ordre croissant
+def keyset_condition(sort_col, id_col, value, last_id: int, order: str):
+    if order == "asc":
+        if value is None:
+            return or_(and_(sort_col.is_(None), id_col > last_id), sort_col.is_not(None))
+        return or_(sort_col > value, and_(sort_col == value, id_col > last_id))
+
+    if value is None:
+        return and_(sort_col.is_(None), id_col < last_id)
+    return or_(sort_col < value, and_(sort_col == value, id_col < last_id), sort_col.is_(None))
+
+def paginate(
+    session: Session,
+    query,
+    page: int,
+    page_size: int,
+    sort_col,
+    id_col,
+    order: str = "asc",
+    cursor: str | None = None,
+    fields: list[str] | None = None,
+):
+    if order not in ("asc", "desc"):
+        raise HTTPException(422, "order doit être: asc ou desc")
+
+    total = count_rows(session, query)
+
+    # L'id sert de départage pour que l'ordre soit stable, que l'on pagine par OFFSET ou par curseur
+    if order == "asc":
+        query = query.order_by(sort_col.asc(), id_col.asc())
+    else:
+        query = query.order_by(sort_col.desc(), id_col.desc())
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_col)
+        query = query.where(keyset_condition(sort_col, id_col, value, last_id, order))
+    else:
+        query = query.offset((page - 1) * page_size)
+
+    # La valeur de tri est lue avec chaque ligne : elle peut venir d'une autre table (ex: le rang bm25 de la recherche).
+    # Une ligne de plus que la page indique s'il existe une page suivante (pas de curseur vers une page vide)
+    rows = session.execute(query.add_columns(sort_col, id_col).limit(page_size + 1)).all()
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    if fields is None:
+        items = [row[0] for row in rows]
+    else:
+        items = [dict(zip(fields, row)) for row in rows]
+
+    next_cursor = None
+    if has_next:
+        next_cursor = encode_cursor(rows[-1][-2], rows[-1][-1])
+
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size,
+        "next_cursor": next_cursor,
+    }
+
+# Pagination d'un classement calculé hors de SQL (recherche approchée, au plus quelques centaines d'ids) :
+# les ids sont filtrés par la requête puis découpés en pages dans l'ordre du classement
+def paginate_ranked(
+    session: Session,
+    query,
+    id_col,
+    ranked_ids: list[int],
+    page: int,
+    page_size: int,
+    fields: list[str] | None = None,
+):
+    rank = {value: position for position, value in enumerate(ranked_ids)}
+    rows = session.execute(query.where(id_col.in_(ranked_ids)).add_columns(id_col)).all()
+    rows.sort(key=lambda row: rank[row[-1]])
+    total = len(rows)
+    rows = rows[(page - 1) * page_size:page * page_size]
+    if fields is None:
+        items = [row[0] for row in rows]
+    else:
+        items = [dict(zip(fields, row)) for row in rows]
+
+    return {
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "total_pages": (total + page_size - 1) // page_size,
+        "next_cursor": None,
+    }
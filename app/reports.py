@@ -0,0 +1,296 @@
+# app/reports.py
+import hashlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from fastapi import HTTPException
+from sqlalchemy import case, func, select
+from app.archive import history_loans
+from app.database import read_engine
+from app.models import Book, LoanHistory, ReportRequest
+
+# Rapports de statistiques (emprunts par mois, livres les plus empruntés, taux de retard par catégorie).
+# La génération (requêtes d'agrégation, graphiques matplotlib, PDF reportlab) peut prendre plusieurs secondes :
+# elle est confiée à un pool de processus, la route POST /reports répond tout de suite avec l'identifiant du rapport.
+# - chaque rapport est calculé par des requêtes SQL groupées (GROUP BY), sans parcourir les emprunts en Python
+# - l'identifiant est une empreinte des paramètres et du jour : les mêmes paramètres le même jour donnent le même
+#   rapport, lu sur le disque (reports_dir) au lieu d'être recalculé
+# - l'état d'un rapport est lu sur le disque ({id}.pending, {id}.json, {id}.pdf, {id}.error), il est donc le même
+#   pour tous les workers uvicorn
+# matplotlib et reportlab sont optionnels : sans reportlab le format pdf est refusé, sans matplotlib le PDF ne
+# contient que les tableaux.
+
+REPORTS_DIR = os.path.abspath(os.getenv('reports_dir', 'reports'))
+REPORT_WORKERS = int(os.getenv('report_workers', '2'))
+FORMATS = ("json", "pdf")
+REPORT_ID = re.compile(r"[0-9a-f]{16}")
+
+def module_available(name: str) -> bool:
+    return importlib.util.find_spec(name) is not None
+
+def report_params(report: ReportRequest) -> dict:
+    if report.format not in FORMATS:
+        raise HTTPException(422, f"format doit être: {' ou '.join(FORMATS)}")
+    if report.format == "pdf" and not module_available("reportlab"):
+        raise HTTPException(422, "Le format pdf nécessite reportlab (pip install reportlab)")
+    if report.date_from and report.date_to and report.date_from > report.date_to:
+        raise HTTPException(422, "date_from doit être antérieure à date_to")
+    return {
+        "date_from": report.date_from.isoformat() if report.date_from else None,
+        "date_to": report.date_to.isoformat() if report.date_to else None,
+        "top": report.top,
+        "format": report.format,
+        "generated_on": date.today().isoformat(),
+    }
+
+def make_report_id(params: dict) -> str:
+    return hashlib.blake2b(json.dumps(params, sort_keys=True).encode(), digest_size=8).hexdigest()
+
+def report_path(report_id: str, extension: str) -> str:
+    return os.path.join(REPORTS_DIR, f"{report_id}.{extension}")
+
+def write_file(path: str, content: bytes):
+    # Écriture dans un fichier temporaire puis renommage : un lecteur ne voit jamais un fichier à moitié écrit
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(content)
+    os.replace(temporary, path)
+
+def write_json(path: str, data: dict):
+    write_file(path, json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+# Calcul du rapport : une requête groupée par section, sur les emprunts de la période (archives comprises)
+
+def period_bounds(params: dict) -> tuple[date | None, date | None]:
+    return (
+        date.fromisoformat(params["date_from"]) if params["date_from"] else None,
+        date.fromisoformat(params["date_to"]) if params["date_to"] else None,
+    )
+
+def loan_period(query, params: dict, loans):
+    date_from, date_to = period_bounds(params)
+    if date_from:
+        query = query.where(loans.start_date >= date_from)
+    if date_to:
+        query = query.where(loans.start_date <= date_to)
+    return query
+
+def late_count(loans):
+    return func.coalesce(func.sum(case((loans.late_days > 0, 1), else_=0)), 0)
+
+def loans_per_month(conn, params: dict, loans) -> list[dict]:
+    month = func.strftime("%Y-%m", loans.start_date)
+    query = loan_period(select(month, func.count(), late_count(loans)).group_by(month).order_by(month), params, loans)
+    return [{"month": month, "loans": total, "late_loans": late} for month, total, late in conn.execute(query)]
+
+def top_books(conn, params: dict, loans) -> list[dict]:
+    # Sans période, le classement est lu sur l'index de LoanHistory.total_loans
+    if not params["date_from"] and not params["date_to"]:
+        query = (
+            select(Book.id, Book.title, LoanHistory.total_loans)
+            .join(LoanHistory, LoanHistory.book_id == Book.id)
+            .where(LoanHistory.total_loans > 0)
+            .order_by(LoanHistory.total_loans.desc(), Book.id)
+        )
+    else:
+        counts = loan_period(
+            select(loans.book_id, func.count().label("loans")).group_by(loans.book_id), params, loans
+        ).subquery()
+        query = (
+            select(Book.id, Book.title, counts.c.loans)
+            .join(counts, counts.c.book_id == Book.id)
+            .order_by(counts.c.loans.desc(), Book.id)
+        )
+    rows = conn.execute(query.limit(params["top"]))
+    return [{"book_id": book_id, "title": title, "loans": total} for book_id, title, total in rows]
+
+def late_ratio_by_category(conn, params: dict, loans) -> list[dict]:
+    category = func.coalesce(Book.category, "Sans catégorie")
+    query = loan_period(
+        select(category, func.count(), late_count(loans))
+        .select_from(loans)
+        .join(Book, Book.id == loans.book_id)
+        .group_by(category)
+        .order_by(category),
+        params,
+        loans,
+    )
+    return [
+        {"category": category, "loans": total, "late_loans": late, "late_ratio": round(late / total, 4)}
+        for category, total, late in conn.execute(query)
+    ]
+
+def compute_report(conn, params: dict) -> dict:
+    loans = history_loans(conn, *period_bounds(params))
+    months = loans_per_month(conn, params, loans)
+    total = sum(month["loans"] for month in months)
+    late = sum(month["late_loans"] for month in months)
+    return {
+        "total_loans": total,
+        "late_loans": late,
+        "late_ratio": round(late / total, 4) if total else 0.0,
+        "loans_per_month": months,
+        "top_books": top_books(conn, params, loans),
+        "late_ratio_by_category": late_ratio_by_category(conn, params, loans),
+    }
+
+# Rendu PDF (reportlab), avec un graphique matplotlib par section (requirements-reports.txt)
+
+def render_chart(title: str, labels: list[str], values: list[float]) -> bytes:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(7, 3.2))
+    ax.bar(labels, values, color="#4c72b0")
+    ax.set_title(title)
+    ax.tick_params(axis="x", rotation=45, labelsize=7)
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=120)
+    plt.close(fig)
+    return buffer.getvalue()
+
+def render_pdf(params: dict, data: dict) -> bytes:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    styles = getSampleStyleSheet()
+    period = f"du {params['date_from'] or 'début'} au {params['date_to'] or params['generated_on']}"
+    story = [
+        Paragraph("La Bibliothèque — rapport de statistiques", styles["Title"]),
+        Paragraph(
+            f"Emprunts {period} : {data['total_loans']} emprunts, {data['late_loans']} en retard "
+            f"(taux de retard {data['late_ratio']:.1%}).",
+            styles["Normal"],
+        ),
+        Spacer(1, 0.5 * cm),
+    ]
+    sections = [
+        (
+            "Emprunts par mois",
+            ["Mois", "Emprunts", "En retard"],
+            [[row["month"], row["loans"], row["late_loans"]] for row in data["loans_per_month"]],
+            [row["month"] for row in data["loans_per_month"]],
+            [row["loans"] for row in data["loans_per_month"]],
+        ),
+        (
+            f"Les {params['top']} livres les plus empruntés",
+            ["Livre", "Titre", "Emprunts"],
+            [[row["book_id"], row["title"], row["loans"]] for row in data["top_books"]],
+            [str(row["book_id"]) for row in data["top_books"]],
+            [row["loans"] for row in data["top_books"]],
+        ),
+        (
+            "Taux de retard par catégorie",
+            ["Catégorie", "Emprunts", "En retard", "Taux"],
+            [[row["category"], row["loans"], row["late_loans"], f"{row['late_ratio']:.1%}"] for row in data["late_ratio_by_category"]],
+            [row["category"] for row in data["late_ratio_by_category"]],
+            [row["late_ratio"] for row in data["late_ratio_by_category"]],
+        ),
+    ]
+    charts = module_available("matplotlib")
+    for title, header, rows, labels, values in sections:
+        story.append(Paragraph(title, styles["Heading2"]))
+        if charts and rows:
+            story.append(Image(io.BytesIO(render_chart(title, labels, values)), width=16 * cm, height=7.3 * cm))
+        table = Table([header, *rows], repeatRows=1)
+        table.setStyle(TableStyle([
+            ("GRID", (0, 0), (-1, -1), 0.25, colors.grey),
+            ("BACKGROUND", (0, 0), (-1, 0), colors.lightgrey),
+            ("FONTSIZE", (0, 0), (-1, -1), 8),
+        ]))
+        story.extend([table, Spacer(1, 0.5 * cm)])
+
+    buffer = io.BytesIO()
+    SimpleDocTemplate(buffer, pagesize=A4, title="Rapport de statistiques").build(story)
+    return buffer.getvalue()
+
+# Exécuté dans un processus du pool : calcule le rapport, écrit le PDF éventuel puis le JSON (qui le marque terminé)
+def generate_report(report_id: str, params: dict):
+    try:
+        with read_engine.connect() as conn:
+            data = compute_report(conn, params)
+        if params["format"] == "pdf":
+            write_file(report_path(report_id, "pdf"), render_pdf(params, data))
+        write_json(report_path(report_id, "json"), {
+            "id": report_id,
+            "params": params,
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "data": data,
+        })
+    except Exception as e:
+        write_json(report_path(report_id, "error"), {"id": report_id, "params": params, "error": str(e)})
+        raise
+    finally:
+        if os.path.exists(report_path(report_id, "pending")):
+            os.remove(report_path(report_id, "pending"))
+
+# Pool de processus (créé au premier rapport) et rapports en cours dans ce processus
+executor: ProcessPoolExecutor | None = None
+jobs: dict[str, Future] = {}
+jobs_lock = threading.Lock()
+
+def get_executor() -> ProcessPoolExecutor:
+    global executor
+    if executor is None:
+        # spawn : les processus du pool ne reprennent pas les connexions SQLite ouvertes du processus de l'API
+        executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return executor
+
+def submit_report(report: ReportRequest) -> dict:
+    params = report_params(report)
+    report_id = make_report_id(params)
+    with jobs_lock:
+        for done in [key for key, job in jobs.items() if job.done()]:
+            del jobs[done]
+        running = report_id in jobs
+        if not running and not os.path.exists(report_path(report_id, "json")):
+            os.makedirs(REPORTS_DIR, exist_ok=True)
+            if os.path.exists(report_path(report_id, "error")):
+                os.remove(report_path(report_id, "error"))
+            write_json(report_path(report_id, "pending"), {"id": report_id, "params": params})
+            try:
+                jobs[report_id] = get_executor().submit(generate_report, report_id, params)
+            except BrokenProcessPool:
+                # Un processus du pool s'est arrêté brutalement : on repart d'un pool neuf
+                shutdown_reports()
+                jobs[report_id] = get_executor().submit(generate_report, report_id, params)
+    return report_status(report_id)
+
+def read_json(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def report_status(report_id: str) -> dict:
+    if REPORT_ID.fullmatch(report_id):
+        if os.path.exists(report_path(report_id, "json")):
+            report = read_json(report_path(report_id, "json"))
+            pdf = f"/reports/{report_id}/pdf" if report["params"]["format"] == "pdf" else None
+            return {"status": "done", **report, "pdf": pdf}
+        if os.path.exists(report_path(report_id, "error")):
+            return {"status": "failed", **read_json(report_path(report_id, "error"))}
+        if os.path.exists(report_path(report_id, "pending")):
+            return {"status": "pending", **read_json(report_path(report_id, "pending"))}
+    raise HTTPException(404, "Rapport introuvable")
+
+def report_pdf_path(report_id: str) -> str:
+    if not REPORT_ID.fullmatch(report_id) or not os.path.exists(report_path(report_id, "pdf")):
+        raise HTTPException(404, "Rapport PDF introuvable")
+    return report_path(report_id, "pdf")
+
+def shutdown_reports():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
@@ -1,8 +1,14 @@
 # app/routers/authors.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from sqlmodel import Session, select
 from app.models import Author, Book
-from app.database import engine
+from app.cache import AUTHORS_TTL, response_cache
+from app.changes import record_change
+from app.database import get_read_session, get_session
+from app.importer import CHUNK_SIZE, import_request
+from app.fuzzy import fuzzy_search, index_trigrams, unindex_trigrams
+from app.pagination import paginate, paginate_ranked, parse_fields, select_fields
+from app.search import author_fts, build_match, index_author, unindex_author
 from datetime import date, datetime
 
 router = APIRouter(
@@ -25,135 +31,198 @@ def formatage_date(v, field_name: str):
             raise HTTPException(422, f"Le format de la date est invalide. La date du champ {field_name} doit être au format YYYY-MM-DD")
     raise HTTPException(422, f"Le format de la date est invalide. La date du champ {field_name} doit être au format YYYY-MM-DD")
 
+# Les traitements sont écrits une seule fois, dans des fonctions qui reçoivent la session : les routes ci-dessous
+# les appellent avec la Session fournie par dépendance, et les routes async (authors_async.py) avec session.run_sync()
+
+def list_authors(session: Session, page: int, page_size: int, cursor: str | None, fields: str | None = None):
+    columns = parse_fields(Author, fields)
+    return paginate(session, select_fields(Author, columns), page, page_size, Author.id, Author.id, "asc", cursor, columns)
+
+def find_authors(
+    session: Session,
+    name: str | None,
+    country: str | None,
+    page: int,
+    page_size: int,
+    sort_by: str,
+    order: str,
+    cursor: str | None,
+    fields: str | None = None,
+    fuzzy: bool = False,
+):
+    columns = parse_fields(Author, fields)
+    query = select_fields(Author, columns)
+
+    # Recherche approchée (fautes de frappe) : auteurs classés par l'index de trigrammes
+    if fuzzy and name:
+        if country:
+            query = query.where(Author.country == country)
+        ranked_ids = fuzzy_search(session, "author", name)
+        return paginate_ranked(session, query, Author.id, ranked_ids, page, page_size, columns)
+
+    # Recherche plein texte sur le prénom et le nom via l'index FTS5 (insensible aux accents, par préfixe)
+    match = build_match(name) if name else None
+    if match:
+        query = query.join(author_fts, author_fts.c.rowid == Author.id).where(author_fts.c.author_fts.match(match))
+    elif name:
+        query = query.where(
+            (Author.firstname.ilike(f"%{name}%")) | (Author.lastname.ilike(f"%{name}%"))
+        )
+    if country:
+        query = query.where(Author.country == country)
+
+    sort_cols = {
+        "lastname": Author.lastname,
+        "firstname": Author.firstname,
+        "birth": Author.birth,
+    }
+    if match:
+        sort_cols["relevance"] = author_fts.c.rank
+    sort_col = sort_cols.get(sort_by, Author.id)
+
+    return paginate(session, query, page, page_size, sort_col, Author.id, order, cursor, columns)
+
+def add_author(session: Session, author: Author) -> Author:
+    author.birth = formatage_date(author.birth, "birth")
+    author.death = formatage_date(author.death, "death")
+
+    exists = session.exec(
+        select(Author).where(
+            Author.firstname == author.firstname,
+            Author.lastname == author.lastname,
+        )
+    ).first()
+    if exists:
+        raise HTTPException(409, "Cet auteur existe déjà")
+
+    session.add(author)
+    session.flush()
+    index_author(session, author)
+    index_trigrams(session, "author", [author.id])
+    record_change(session, "author", "create", author.id)
+    session.commit()
+    response_cache.invalidate("authors")
+    session.refresh(author)
+    return author
+
+def get_author(session: Session, author_id: int):
+    author = session.get(Author, author_id)
+    if not author:
+        raise HTTPException(404, "L'auteur est introuvable dans la base de données")
+
+    books = session.exec(
+        select(Book).where(Book.author_id == author_id)
+    ).all()
+
+    return {
+        "author": author,
+        "books": books,
+    }
+
+def edit_author(session: Session, author_id: int, author_data: dict) -> Author:
+    db_author = session.get(Author, author_id)
+    if not db_author:
+        raise HTTPException(404, "L'auteur est introuvable dans la base de données")
+
+    for key, value in author_data.items():
+        if key in ("birth", "death"):
+            value = formatage_date(value, key)
+        setattr(db_author, key, value)
+
+    session.add(db_author)
+    session.flush()
+    index_author(session, db_author)
+    if "firstname" in author_data or "lastname" in author_data:
+        index_trigrams(session, "author", [author_id])
+    record_change(session, "author", "update", author_id)
+    session.commit()
+    response_cache.invalidate("authors", f"author:{author_id}")
+    session.refresh(db_author)
+    return db_author
+
+def remove_author(session: Session, author_id: int):
+    author = session.get(Author, author_id)
+    if not author:
+        raise HTTPException(404, "Auteur introuvable")
+
+    books = session.exec(
+        select(Book).where(Book.author_id == author_id)
+    ).first()
+    if books:
+        raise HTTPException(400, "Impossible de supprimer un auteur avec des livres associés")
+
+    session.delete(author)
+    unindex_author(session, author_id)
+    unindex_trigrams(session, "author", [author_id])
+    record_change(session, "author", "delete", author_id)
+    session.commit()
+    response_cache.invalidate("authors", f"author:{author_id}")
+    return {"message": "Auteur supprimé avec succès"}
+
 # Cette route sera destinée à lister tous les auteurs disponibles dans la base de données
 @router.get("/")
 def read_authors(
+    request: Request,
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=10, le=100),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,lastname (par défaut toutes)"),
+    session: Session = Depends(get_read_session),
 ):
-    with Session(engine) as session:
-        offset = (page - 1) * page_size
-        total = len(session.exec(select(Author)).all())
-        authors = session.exec(
-            select(Author).offset(offset).limit(page_size)
-        ).all()
-        return {
-            "items": authors,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size,
-        }
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    return cached.store(list_authors(session, page, page_size, cursor, fields), ["authors"], AUTHORS_TTL)
 
 # Cette route sera destinée à rechercher des auteurs selon des critères que l'on lui apporte en json
 @router.get("/search/")
 def search_authors(
+    request: Request,
     name: str | None = None,
     country: str | None = None,
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=10, le=100),
-    sort_by: str = Query(default="lastname"),
+    sort_by: str = Query(default="lastname", description="lastname, firstname, birth ou relevance"),
     order: str = Query(default="asc"),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,lastname (par défaut toutes)"),
+    fuzzy: bool = Query(default=False, description="Recherche tolérante aux fautes sur name"),
+    session: Session = Depends(get_read_session),
 ):
-    with Session(engine) as session:
-        query = select(Author)
-        
-        if name:
-            query = query.where(
-                (Author.firstname.ilike(f"%{name}%")) | (Author.lastname.ilike(f"%{name}%"))
-            )
-        if country:
-            query = query.where(Author.country == country)
-        
-        if sort_by == "lastname":
-            query = query.order_by(Author.lastname.asc() if order == "asc" else Author.lastname.desc())
-        elif sort_by == "firstname":
-            query = query.order_by(Author.firstname.asc() if order == "asc" else Author.firstname.desc())
-        elif sort_by == "birth":
-            query = query.order_by(Author.birth.asc() if order == "asc" else Author.birth.desc())
-        
-        offset = (page - 1) * page_size
-        total = len(session.exec(query).all())
-        authors = session.exec(query.offset(offset).limit(page_size)).all()
-        
-        return {
-            "items": authors,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size,
-        }
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = find_authors(session, name, country, page, page_size, sort_by, order, cursor, fields, fuzzy)
+    return cached.store(result, ["authors"], AUTHORS_TTL)
 
 # Cette route sera destinée à créer un nouvel auteur dans la base de données en lui apportant toutes les clés nécessaires dans le JSON
 @router.post("/", response_model=Author)
-def create_author(author: Author):
-    with Session(engine) as session:
-        author.birth = formatage_date(author.birth, "birth")
-        author.death = formatage_date(author.death, "death")
-
-        exists = session.exec(
-            select(Author).where(
-                Author.firstname == author.firstname,
-                Author.lastname == author.lastname,
-            )
-        ).first()
-        if exists:
-            raise HTTPException(409, "Cet auteur existe déjà")
-
-        session.add(author)
-        session.commit()
-        session.refresh(author)
-        return author
+def create_author(author: Author, session: Session = Depends(get_session)):
+    return add_author(session, author)
+
+# Cette route sera destinée à importer en masse des auteurs depuis un fichier CSV ou JSONL envoyé dans le corps de la requête
+@router.post("/bulk")
+async def bulk_import_authors(
+    request: Request,
+    format: str = Query(default="csv", description="csv ou jsonl"),
+    chunk_size: int = Query(default=CHUNK_SIZE, ge=1, le=10000),
+):
+    return await import_request(request, "authors", format, chunk_size)
 
 #Cette route sera destinée à récupérer toutes les informations disponibles pour un auteur spectifique
 @router.get("/{author_id}")
-def read_author(author_id: int):
-    with Session(engine) as session:
-        author = session.get(Author, author_id)
-        if not author:
-            raise HTTPException(404, "L'auteur est introuvable dans la base de données")
-        
-        books = session.exec(
-            select(Book).where(Book.author_id == author_id)
-        ).all()
-        
-        return {
-            "author": author,
-            "books": books,
-        }
+def read_author(request: Request, author_id: int, session: Session = Depends(get_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    # La liste des livres dépend aussi du catalogue (ajouts, stock) : l'entrée porte donc le tag "books"
+    return cached.store(get_author(session, author_id), [f"author:{author_id}", "books"], AUTHORS_TTL)
 
 @router.patch("/{author_id}", response_model=Author)
-def update_author(author_id: int, author: Author):
-    with Session(engine) as session:
-        db_author = session.get(Author, author_id)
-        if not db_author:
-            raise HTTPException(404, "L'auteur est introuvable dans la base de données")
-
-        author_data = author.model_dump(exclude_unset=True)
-        for key, value in author_data.items():
-            if key in ("birth", "death"):
-                value = formatage_date(value, key)
-            setattr(db_author, key, value)
-
-        session.add(db_author)
-        session.commit()
-        session.refresh(db_author)
-        return db_author
+def update_author(author_id: int, author: Author, session: Session = Depends(get_session)):
+    return edit_author(session, author_id, author.model_dump(exclude_unset=True))
 
 # Cette route sera destinée à supprimer un auteur
 @router.delete("/{author_id}")
-def delete_author(author_id: int):
-    with Session(engine) as session:
-        author = session.get(Author, author_id)
-        if not author:
-            raise HTTPException(404, "Auteur introuvable")
-        
-        books = session.exec(
-            select(Book).where(Book.author_id == author_id)
-        ).first()
-        if books:
-            raise HTTPException(400, "Impossible de supprimer un auteur avec des livres associés")
-        
-        session.delete(author)
-        session.commit()
-        return {"message": "Auteur supprimé avec succès"}
\ No newline at end of file
+def delete_author(author_id: int, session: Session = Depends(get_session)):
+    return remove_author(session, author_id)
@@ -0,0 +1,79 @@
+# app/routers/authors_async.py
+from fastapi import APIRouter, Depends, Query, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import Author
+from app.cache import AUTHORS_TTL, response_cache
+from app.database import get_async_read_session, get_async_session
+from app.routers import authors
+
+# Versions async des routes des auteurs (activées avec async_mode=true), mêmes traitements que authors.py
+
+router = APIRouter(
+    prefix="/authors",
+    tags=["Auteurs"]
+)
+
+# Cette route sera destinée à lister tous les auteurs disponibles dans la base de données
+@router.get("/")
+async def read_authors(
+    request: Request,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, le=100),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,lastname (par défaut toutes)"),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = await session.run_sync(authors.list_authors, page, page_size, cursor, fields)
+    return cached.store(result, ["authors"], AUTHORS_TTL)
+
+# Cette route sera destinée à rechercher des auteurs selon des critères que l'on lui apporte en json
+@router.get("/search/")
+async def search_authors(
+    request: Request,
+    name: str | None = None,
+    country: str | None = None,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, le=100),
+    sort_by: str = Query(default="lastname", description="lastname, firstname, birth ou relevance"),
+    order: str = Query(default="asc"),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,lastname (par défaut toutes)"),
+    fuzzy: bool = Query(default=False, description="Recherche tolérante aux fautes sur name"),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = await session.run_sync(
+        authors.find_authors, name, country, page, page_size, sort_by, order, cursor, fields, fuzzy
+    )
+    return cached.store(result, ["authors"], AUTHORS_TTL)
+
+# Cette route sera destinée à créer un nouvel auteur dans la base de données en lui apportant toutes les clés nécessaires dans le JSON
+@router.post("/", response_model=Author)
+async def create_author(author: Author, session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(authors.add_author, author)
+
+# Cette route sera destinée à importer en masse des auteurs (route déjà async, partagée avec le mode synchrone)
+router.add_api_route("/bulk", authors.bulk_import_authors, methods=["POST"])
+
+#Cette route sera destinée à récupérer toutes les informations disponibles pour un auteur spectifique
+@router.get("/{author_id}")
+async def read_author(request: Request, author_id: int, session: AsyncSession = Depends(get_async_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = await session.run_sync(authors.get_author, author_id)
+    return cached.store(result, [f"author:{author_id}", "books"], AUTHORS_TTL)
+
+@router.patch("/{author_id}", response_model=Author)
+async def update_author(author_id: int, author: Author, session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(authors.edit_author, author_id, author.model_dump(exclude_unset=True))
+
+# Cette route sera destinée à supprimer un auteur
+@router.delete("/{author_id}")
+async def delete_author(author_id: int, session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(authors.remove_author, author_id)
@@ -1,158 +1,380 @@
 # app/routers/books.py
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import false
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
 from sqlmodel import Session, select
-from app.models import Book, Author
-from app.database import engine
+from app.models import Book, Author, LoanHistory
+from app.cache import BOOKS_TTL, response_cache
+from app.changes import record_change
+from app.database import get_read_session, get_session
+from app.exporter import export_response
+from app.facets import parse_facets, record_facets, search_facets
+from app.fuzzy import fuzzy_search, index_trigrams, unindex_trigrams
+from app.importer import CHUNK_SIZE, import_request
+from app.isbn import clean_isbn, isbn_index, parse_isbn
+from app.pagination import paginate, paginate_ranked, parse_fields, select_fields
+from app.search import author_fts, book_fts, build_match, index_book, unindex_book
+from app.stats import create_history
 
 router = APIRouter(
     prefix="/books",
     tags=["Livres"]
 )
 
+# Les traitements sont écrits une seule fois, dans des fonctions qui reçoivent la session : les routes ci-dessous
+# les appellent avec la Session fournie par dépendance, et les routes async (books_async.py) avec session.run_sync()
+
+# ?expand=author : les auteurs de la page sont chargés en une seule requête IN (selectinload), au lieu d'un appel
+# à GET /authors/{id} par livre côté client
+def expand_options(query, expand: str | None, fields: list[str] | None = None):
+    if expand is None:
+        return query
+    if expand != "author":
+        raise HTTPException(422, "expand doit valoir: author")
+    if fields is not None:
+        raise HTTPException(422, "expand=author ne peut pas être combiné avec fields")
+    return query.options(selectinload(Book.author))
+
+def expand_items(result: dict, expand: str | None) -> dict:
+    if expand == "author":
+        result["items"] = [{**book.model_dump(), "author": book.author} for book in result["items"]]
+    return result
+
+# Tags du cache d'une liste de livres : avec les auteurs inclus, la page dépend aussi des auteurs
+def list_tags(expand: str | None) -> list[str]:
+    return ["books", "authors"] if expand else ["books"]
+
+# Un ISBN connu de l'index est refusé sans requête SQL, un ISBN inconnu de l'index par la contrainte d'unicité
+def check_isbn_free(isbn: str, book_id: int | None = None):
+    known = isbn_index.get(isbn)
+    if known is not None and known != book_id:
+        raise HTTPException(409, "Un livre avec cet ISBN existe déjà")
+
+def flush_book(session: Session):
+    try:
+        session.flush()
+    except IntegrityError as e:
+        session.rollback()
+        raise HTTPException(409, "Un livre avec cet ISBN existe déjà") from e
+
+def add_book(session: Session, book: Book) -> Book:
+    # Le validateur du modèle n'est pas appliqué au corps de la requête (modèle table=True) : on normalise ici
+    book.isbn = parse_isbn(book.isbn)
+    check_isbn_free(book.isbn)
+
+    author = session.get(Author, book.author_id)
+    if not author:
+        raise HTTPException(404, "L'auteur référencé n'existe pas")
+
+    session.add(book)
+    flush_book(session)
+    index_book(session, book, author)
+    index_trigrams(session, "book", [book.id])
+    create_history(session, book.id)
+    record_facets(session, [book.id], 1)
+    record_change(session, "book", "create", book.id)
+    session.commit()
+    isbn_index.add([(book.isbn, book.id)])
+    response_cache.invalidate("books")
+    session.refresh(book)
+    return book
+
+def list_books(
+    session: Session,
+    page: int,
+    page_size: int,
+    sort_by: str,
+    order: str,
+    cursor: str | None,
+    expand: str | None = None,
+    fields: str | None = None,
+):
+    columns = parse_fields(Book, fields)
+    query = expand_options(select_fields(Book, columns), expand, columns)
+
+    # Tri par popularité : les compteurs de LoanHistory sont indexés, la page est lue directement sur l'index
+    # (book_id sert de départage car c'est aussi la clé de LoanHistory)
+    if sort_by in ("popularity", "recent_popularity"):
+        sort_col = LoanHistory.total_loans if sort_by == "popularity" else LoanHistory.recent_loans
+        query = query.join(LoanHistory, LoanHistory.book_id == Book.id)
+        result = paginate(session, query, page, page_size, sort_col, LoanHistory.book_id, order, cursor, columns)
+        return expand_items(result, expand)
+
+    sort_col = {
+        "title": Book.title,
+        "year": Book.year,
+        "author": Book.author_id,
+    }.get(sort_by, Book.id)
+
+    result = paginate(session, query, page, page_size, sort_col, Book.id, order, cursor, columns)
+    return expand_items(result, expand)
+
+def find_books(
+    session: Session,
+    q: str | None,
+    title: str | None,
+    author_name: str | None,
+    isbn: str | None,
+    category: str | None,
+    year: int | None,
+    year_from: int | None,
+    year_to: int | None,
+    language: str | None,
+    available: bool | None,
+    page: int,
+    page_size: int,
+    cursor: str | None,
+    expand: str | None = None,
+    facets: str | None = None,
+    fields: str | None = None,
+    fuzzy: bool = False,
+):
+    facet_names = parse_facets(facets)
+    columns = parse_fields(Book, fields)
+    query = select_fields(Book, columns)
+
+    # Recherche approchée (fautes de frappe) sur le titre, ou sur q à défaut : ids classés par l'index de trigrammes
+    fuzzy_ids = None
+    if fuzzy and (title or q):
+        fuzzy_ids = fuzzy_search(session, "book", title or q)
+        query = query.where(Book.id.in_(fuzzy_ids))
+        # La saisie utilisée par la recherche approchée ne passe pas par l'index plein texte ; avec un titre, q reste
+        # un filtre plein texte (les résultats gardent l'ordre de la recherche approchée)
+        if not title:
+            q = None
+        title = None
+
+    # Recherche plein texte via l'index FTS5, classée par pertinence (bm25)
+    q_match = build_match(q) if q else None
+    match = " AND ".join(m for m in (q_match, build_match(title, "title") if title else None) if m)
+    # q sans aucun mot (ex. "!!!") ne correspond à aucun livre : on ne renvoie pas tout le catalogue
+    if q and not q_match:
+        query = query.where(false())
+    if match:
+        query = query.join(book_fts, book_fts.c.rowid == Book.id).where(book_fts.c.book_fts.match(match))
+    elif title:
+        query = query.where(Book.title.ilike(f"%{title}%"))
+    if isbn:
+        query = query.where(Book.isbn == clean_isbn(isbn))
+    if category:
+        query = query.where(Book.category == category)
+    if year:
+        query = query.where(Book.year == year)
+    if year_from is not None:
+        query = query.where(Book.year >= year_from)
+    if year_to is not None:
+        query = query.where(Book.year <= year_to)
+    if language:
+        query = query.where(Book.language == language)
+    if available is not None:
+        if available:
+            query = query.where(Book.copies > 0)
+        else:
+            query = query.where(Book.copies == 0)
+
+    # Filtre sur l'auteur dans la même requête (sous-requête sur l'index FTS des auteurs) : pas d'aller-retour
+    # supplémentaire et, si aucun auteur ne correspond, aucun livre n'est renvoyé
+    if author_name and fuzzy:
+        query = query.where(Book.author_id.in_(fuzzy_search(session, "author", author_name)))
+    elif author_name:
+        author_match = build_match(author_name)
+        if author_match:
+            author_ids = select(author_fts.c.rowid).where(author_fts.c.author_fts.match(author_match))
+            query = query.where(Book.author_id.in_(author_ids))
+        else:
+            query = query.where(
+                select(Author.id).where(
+                    Author.id == Book.author_id,
+                    (Author.firstname.ilike(f"%{author_name}%")) | (Author.lastname.ilike(f"%{author_name}%")),
+                ).exists()
+            )
+
+    if fuzzy_ids is not None:
+        result = paginate_ranked(session, expand_options(query, expand, columns), Book.id, fuzzy_ids, page, page_size, columns)
+    else:
+        sort_col = book_fts.c.rank if match else Book.id
+        result = paginate(
+            session, expand_options(query, expand, columns), page, page_size, sort_col, Book.id, "asc", cursor, columns
+        )
+    if facet_names:
+        result["facets"] = search_facets(session, query, facet_names)
+    return expand_items(result, expand)
+
+def get_book(session: Session, book_id: int):
+    # Le livre et son auteur en une seule requête (LEFT OUTER JOIN)
+    book = session.exec(
+        select(Book).options(joinedload(Book.author)).where(Book.id == book_id)
+    ).first()
+    if not book:
+        raise HTTPException(404, "Livre introuvable")
+
+    return {
+        "book": book,
+        "author": book.author,
+    }
+
+# Livre par ISBN (10 ou 13, avec ou sans tirets) : l'id est lu dans l'index en mémoire. Un ISBN absent de l'index est
+# cherché en base (livre inséré par un autre processus ou par l'import en ligne de commande) et ajouté à l'index.
+# Un livre supprimé par un autre processus est retiré de l'index
+def find_by_isbn(session: Session, isbn: str):
+    isbn = parse_isbn(isbn)
+    book_id = isbn_index.get(isbn)
+    if book_id is None:
+        book_id = session.exec(select(Book.id).where(Book.isbn == isbn)).first()
+        if book_id is None:
+            raise HTTPException(404, "Aucun livre avec cet ISBN")
+        isbn_index.add([(isbn, book_id)])
+    try:
+        return get_book(session, book_id)
+    except HTTPException:
+        isbn_index.discard(isbn, book_id)
+        raise
+
+def edit_book(session: Session, book_id: int, book_data: dict) -> Book:
+    db_book = session.get(Book, book_id)
+    if not db_book:
+        raise HTTPException(404, "Livre introuvable")
+    old_isbn = db_book.isbn
+    if "isbn" in book_data:
+        book_data["isbn"] = parse_isbn(book_data["isbn"])
+        check_isbn_free(book_data["isbn"], book_id)
+
+    # Le livre est retiré des facettes avec ses anciennes valeurs, puis rajouté avec les nouvelles
+    record_facets(session, [book_id], -1)
+    for key, value in book_data.items():
+        setattr(db_book, key, value)
+
+    session.add(db_book)
+    flush_book(session)
+    index_book(session, db_book)
+    if "title" in book_data:
+        index_trigrams(session, "book", [book_id])
+    record_facets(session, [book_id], 1)
+    record_change(session, "book", "update", book_id)
+    session.commit()
+    if db_book.isbn != old_isbn:
+        isbn_index.discard(old_isbn, book_id)
+        isbn_index.add([(db_book.isbn, book_id)])
+    response_cache.invalidate("books", f"book:{book_id}")
+    session.refresh(db_book)
+    return db_book
+
+def remove_book(session: Session, book_id: int):
+    book = session.get(Book, book_id)
+    if not book:
+        raise HTTPException(404, "Livre introuvable")
+
+    record_facets(session, [book_id], -1)
+    session.delete(book)
+    unindex_book(session, book_id)
+    unindex_trigrams(session, "book", [book_id])
+    record_change(session, "book", "delete", book_id)
+    session.commit()
+    isbn_index.discard(book.isbn, book_id)
+    response_cache.invalidate("books", f"book:{book_id}")
+    return {"message": "Livre supprimé avec succès"}
+
 # Cette route sera destinée à créer un livre dans la base de données
 @router.post("/", response_model=Book)
-def create_book(book: Book):
-    with Session(engine) as session:
-        exists_isbn = session.exec(
-            select(Book).where(Book.isbn == book.isbn)
-        ).first()
-        if exists_isbn:
-            raise HTTPException(409, "Un livre avec cet ISBN existe déjà")
-        
-        author = session.get(Author, book.author_id)
-        if not author:
-            raise HTTPException(404, "L'auteur référencé n'existe pas")
-        
-        session.add(book)
-        session.commit()
-        session.refresh(book)
-        return book
+def create_book(book: Book, session: Session = Depends(get_session)):
+    return add_book(session, book)
+
+# Cette route sera destinée à importer en masse des livres depuis un fichier CSV ou JSONL envoyé dans le corps de la requête
+@router.post("/bulk")
+async def bulk_import_books(
+    request: Request,
+    format: str = Query(default="csv", description="csv ou jsonl"),
+    chunk_size: int = Query(default=CHUNK_SIZE, ge=1, le=10000),
+):
+    return await import_request(request, "books", format, chunk_size)
 
 # Cette route sera destinée à lister tous les livres dans la base de données
 @router.get("/")
 def read_books(
+    request: Request,
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=10, le=100),
-    sort_by: str = Query(default="title"),
+    sort_by: str = Query(default="title", description="title, year, author, popularity ou recent_popularity"),
     order: str = Query(default="asc"),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    expand: str | None = Query(default=None, description="author : inclut l'auteur de chaque livre"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,title,isbn (par défaut toutes)"),
+    session: Session = Depends(get_read_session),
 ):
-    with Session(engine) as session:
-        offset = (page - 1) * page_size
-        
-        query = select(Book)
-        if sort_by == "title":
-            query = query.order_by(Book.title.asc() if order == "asc" else Book.title.desc())
-        elif sort_by == "year":
-            query = query.order_by(Book.year.asc() if order == "asc" else Book.year.desc())
-        elif sort_by == "author":
-            query = query.order_by(Book.author_id.asc() if order == "asc" else Book.author_id.desc())
-        
-        total = len(session.exec(select(Book)).all())
-        books = session.exec(query.offset(offset).limit(page_size)).all()
-        
-        return {
-            "items": books,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size,
-        }
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = list_books(session, page, page_size, sort_by, order, cursor, expand, fields)
+    return cached.store(result, list_tags(expand), BOOKS_TTL)
 
 # Cette route sera destinée à rechercher des livres selon des critères que l'on lui apporte en json
 @router.get("/search/")
 def search_books(
+    request: Request,
+    q: str | None = Query(default=None, description="Recherche plein texte (titre, description, catégorie, éditeur, auteur)"),
     title: str | None = None,
     author_name: str | None = None,
     isbn: str | None = None,
     category: str | None = None,
     year: int | None = None,
+    year_from: int | None = None,
+    year_to: int | None = None,
     language: str | None = None,
     available: bool | None = None,
     page: int = Query(default=1, ge=1),
     page_size: int = Query(default=10, le=100),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    expand: str | None = Query(default=None, description="author : inclut l'auteur de chaque livre"),
+    facets: str | None = Query(default=None, description="Comptes par facette : category, language, year, available"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,title,isbn (par défaut toutes)"),
+    fuzzy: bool = Query(default=False, description="Recherche tolérante aux fautes sur title (ou q) et author_name"),
+    session: Session = Depends(get_read_session),
 ):
-    with Session(engine) as session:
-        query = select(Book)
-        
-        if title:
-            query = query.where(Book.title.ilike(f"%{title}%"))
-        if isbn:
-            query = query.where(Book.isbn == isbn)
-        if category:
-            query = query.where(Book.category == category)
-        if year:
-            query = query.where(Book.year == year)
-        if language:
-            query = query.where(Book.language == language)
-        if available is not None:
-            if available:
-                query = query.where(Book.copies > 0)
-            else:
-                query = query.where(Book.copies == 0)
-        
-        if author_name:
-            authors = session.exec(
-                select(Author).where(
-                    (Author.firstname.ilike(f"%{author_name}%")) | 
-                    (Author.lastname.ilike(f"%{author_name}%"))
-                )
-            ).all()
-            author_ids = [author.id for author in authors]
-            if author_ids:
-                query = query.where(Book.author_id.in_(author_ids))
-        
-        offset = (page - 1) * page_size
-        total = len(session.exec(query).all())
-        books = session.exec(query.offset(offset).limit(page_size)).all()
-        
-        return {
-            "items": books,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size,
-        }
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = find_books(
+        session, q, title, author_name, isbn, category, year, year_from, year_to, language, available,
+        page, page_size, cursor, expand, facets, fields, fuzzy,
+    )
+    return cached.store(result, ["books", "authors"], BOOKS_TTL)
 
-# Cette route sera destinée à lister tous les livres dans la base de données
+# Cette route sera destinée à exporter tout le catalogue en CSV ou NDJSON (déclarée avant /{book_id})
+@router.get("/export")
+def export_books(
+    format: str = Query(default="csv", description="csv ou ndjson"),
+    gzip: bool = Query(default=False),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,title,isbn (par défaut toutes)"),
+):
+    columns = parse_fields(Book, fields)
+    query = (select(Book.__table__) if columns is None else select_fields(Book, columns)).order_by(Book.id)
+    return export_response(query, format, gzip, "livres")
+
+# Cette route sera destinée à récupérer un livre et son auteur à partir de son ISBN
+@router.get("/by-isbn/{isbn}")
+def read_book_by_isbn(request: Request, isbn: str, session: Session = Depends(get_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = find_by_isbn(session, isbn)
+    return cached.store(result, [f"book:{result['book'].id}", f"author:{result['book'].author_id}"], BOOKS_TTL)
+
+# Cette route sera destinée à récupérer un livre et son auteur
 @router.get("/{book_id}")
-def read_book(book_id: int):
-    with Session(engine) as session:
-        book = session.get(Book, book_id)
-        if not book:
-            raise HTTPException(404, "Livre introuvable")
-        
-        author = session.get(Author, book.author_id)
-        
-        return {
-            "book": book,
-            "author": author,
-        }
+def read_book(request: Request, book_id: int, session: Session = Depends(get_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = get_book(session, book_id)
+    return cached.store(result, [f"book:{book_id}", f"author:{result['book'].author_id}"], BOOKS_TTL)
 
 # Cette route sera destinée à mettre à jour les informations d'un livre existant
 @router.patch("/{book_id}", response_model=Book)
-def update_book(book_id: int, book: Book):
-    with Session(engine) as session:
-        db_book = session.get(Book, book_id)
-        if not db_book:
-            raise HTTPException(404, "Livre introuvable")
-        
-        book_data = book.model_dump(exclude_unset=True)
-        for key, value in book_data.items():
-            setattr(db_book, key, value)
-        
-        session.add(db_book)
-        session.commit()
-        session.refresh(db_book)
-        return db_book
-
-# Cette route sera destinée à supprimer un auteur
+def update_book(book_id: int, book: Book, session: Session = Depends(get_session)):
+    return edit_book(session, book_id, book.model_dump(exclude_unset=True))
+
+# Cette route sera destinée à supprimer un livre
 @router.delete("/{book_id}")
-def delete_book(book_id: int):
-    with Session(engine) as session:
-        book = session.get(Book, book_id)
-        if not book:
-            raise HTTPException(404, "Livre introuvable")
-        
-        session.delete(book)
-        session.commit()
-        return {"message": "Livre supprimé avec succès"}
\ No newline at end of file
+def delete_book(book_id: int, session: Session = Depends(get_session)):
+    return remove_book(session, book_id)
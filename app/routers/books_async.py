@@ -0,0 +1,105 @@
+# app/routers/books_async.py
+from fastapi import APIRouter, Depends, Query, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.models import Book
+from app.cache import BOOKS_TTL, response_cache
+from app.database import get_async_read_session, get_async_session
+from app.routers import books
+
+# Versions async des routes des livres (activées avec async_mode=true) : la session est une AsyncSession sur aiosqlite
+# fournie par dépendance, et les traitements de books.py sont exécutés tels quels avec session.run_sync()
+
+router = APIRouter(
+    prefix="/books",
+    tags=["Livres"]
+)
+
+# Cette route sera destinée à créer un livre dans la base de données
+@router.post("/", response_model=Book)
+async def create_book(book: Book, session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(books.add_book, book)
+
+# Cette route sera destinée à importer en masse des livres (route déjà async, partagée avec le mode synchrone)
+router.add_api_route("/bulk", books.bulk_import_books, methods=["POST"])
+
+# Cette route sera destinée à lister tous les livres dans la base de données
+@router.get("/")
+async def read_books(
+    request: Request,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, le=100),
+    sort_by: str = Query(default="title", description="title, year, author, popularity ou recent_popularity"),
+    order: str = Query(default="asc"),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    expand: str | None = Query(default=None, description="author : inclut l'auteur de chaque livre"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,title,isbn (par défaut toutes)"),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = await session.run_sync(books.list_books, page, page_size, sort_by, order, cursor, expand, fields)
+    return cached.store(result, books.list_tags(expand), BOOKS_TTL)
+
+# Cette route sera destinée à rechercher des livres selon des critères que l'on lui apporte en json
+@router.get("/search/")
+async def search_books(
+    request: Request,
+    q: str | None = Query(default=None, description="Recherche plein texte (titre, description, catégorie, éditeur, auteur)"),
+    title: str | None = None,
+    author_name: str | None = None,
+    isbn: str | None = None,
+    category: str | None = None,
+    year: int | None = None,
+    year_from: int | None = None,
+    year_to: int | None = None,
+    language: str | None = None,
+    available: bool | None = None,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, le=100),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    expand: str | None = Query(default=None, description="author : inclut l'auteur de chaque livre"),
+    facets: str | None = Query(default=None, description="Comptes par facette : category, language, year, available"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,title,isbn (par défaut toutes)"),
+    fuzzy: bool = Query(default=False, description="Recherche tolérante aux fautes sur title (ou q) et author_name"),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = await session.run_sync(
+        books.find_books, q, title, author_name, isbn, category, year, year_from, year_to, language, available,
+        page, page_size, cursor, expand, facets, fields, fuzzy,
+    )
+    return cached.store(result, ["books", "authors"], BOOKS_TTL)
+
+# Cette route sera destinée à exporter tout le catalogue (l'export est déjà diffusé au fil de l'eau, déclarée avant /{book_id})
+router.add_api_route("/export", books.export_books, methods=["GET"])
+
+# Cette route sera destinée à récupérer un livre et son auteur à partir de son ISBN
+@router.get("/by-isbn/{isbn}")
+async def read_book_by_isbn(request: Request, isbn: str, session: AsyncSession = Depends(get_async_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = await session.run_sync(books.find_by_isbn, isbn)
+    return cached.store(result, [f"book:{result['book'].id}", f"author:{result['book'].author_id}"], BOOKS_TTL)
+
+# Cette route sera destinée à récupérer un livre et son auteur
+@router.get("/{book_id}")
+async def read_book(request: Request, book_id: int, session: AsyncSession = Depends(get_async_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    result = await session.run_sync(books.get_book, book_id)
+    return cached.store(result, [f"book:{book_id}", f"author:{result['book'].author_id}"], BOOKS_TTL)
+
+# Cette route sera destinée à mettre à jour les informations d'un livre existant
+@router.patch("/{book_id}", response_model=Book)
+async def update_book(book_id: int, book: Book, session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(books.edit_book, book_id, book.model_dump(exclude_unset=True))
+
+# Cette route sera destinée à supprimer un livre
+@router.delete("/{book_id}")
+async def delete_book(book_id: int, session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(books.remove_book, book_id)
@@ -0,0 +1,34 @@
+# app/routers/borrowers.py
+from fastapi import APIRouter, Depends, HTTPException
+from sqlmodel import Session, select
+from app.database import get_read_session
+from app.models import Borrower, Loan
+
+router = APIRouter(
+    prefix="/borrowers",
+    tags=["Emprunteurs"]
+)
+
+# Cette route sera destinée à résumer la situation d'un emprunteur : emprunts en cours et pénalités dues
+@router.get("/{card_id}")
+def read_borrower(card_id: int, session: Session = Depends(get_read_session)):
+    borrower = session.get(Borrower, card_id)
+    if not borrower:
+        raise HTTPException(404, "Emprunteur introuvable")
+
+    # Au plus 5 emprunts, lus sur l'index (active, loaner_card_id)
+    loans = session.exec(
+        select(Loan).where(Loan.active == True, Loan.loaner_card_id == card_id).order_by(Loan.due_date)
+    ).all()
+
+    return {
+        "card_id": borrower.card_id,
+        "loaner_name": borrower.loaner_name,
+        "loaner_mail": borrower.loaner_mail,
+        "active_loans": borrower.active_loans,
+        "late_loans": sum(1 for loan in loans if loan.late),
+        "penalty_cents": borrower.penalty_cents,
+        "accrued_penalty_cents": borrower.accrued_penalty_cents,
+        "outstanding_penalty_cents": borrower.penalty_cents + borrower.accrued_penalty_cents,
+        "loans": loans,
+    }
@@ -0,0 +1,36 @@
+# app/routers/changes.py
+import asyncio
+from fastapi import APIRouter, Query
+from fastapi.concurrency import run_in_threadpool
+from app.changes import POLL_INTERVAL, change_notifier, parse_entities, read_changes
+from app.database import read_engine
+from app.serialization import json_response
+
+router = APIRouter(
+    prefix="/changes",
+    tags=["Modifications"]
+)
+
+def fetch_changes(since: int, limit: int, entities: list[str] | None) -> dict:
+    with read_engine.connect() as conn:
+        return read_changes(conn, since, limit, entities)
+
+# Cette route sera destinée à suivre les modifications du catalogue et des emprunts depuis un numéro (since) :
+# le client repasse next_since à l'appel suivant. Avec wait, la réponse attend jusqu'à wait secondes qu'une
+# modification arrive (long-poll) au lieu de renvoyer une liste vide
+@router.get("/")
+async def list_changes(
+    since: int = Query(default=0, ge=0, description="Numéro de la dernière modification déjà lue (next_since)"),
+    limit: int = Query(default=100, ge=1, le=1000),
+    entity: str | None = Query(default=None, description="book, author ou loan (plusieurs séparés par des virgules)"),
+    wait: float = Query(default=0, ge=0, le=60, description="Attente maximale (secondes) d'une nouvelle modification"),
+):
+    entities = parse_entities(entity)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + wait
+    while True:
+        result = await run_in_threadpool(fetch_changes, since, limit, entities)
+        remaining = deadline - loop.time()
+        if result["changes"] or remaining <= 0:
+            return json_response(result)
+        await change_notifier.wait(min(POLL_INTERVAL, remaining))
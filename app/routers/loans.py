@@ -1,8 +1,20 @@
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import Integer, cast, func, insert, update
 from sqlmodel import Session, select
 from datetime import date, timedelta, datetime
-from app.database import engine
-from app.models import Book, Loan
+from app.archive import archived_ids, history_loans, history_source
+from app.borrowers import quota_usage, sync_borrowers, update_borrower
+from app.cache import response_cache
+from app.changes import record_change, record_changes
+from app.database import get_immediate_session, get_read_session, read_engine
+from app.models import Book, Loan, LoanBatch, ReturnBatch
+from app.exporter import export_response
+from app.facets import record_availability, record_facets
+from app.importer import CHUNK_SIZE, import_request
+from app.overdue import PENALTY_CENTS_PER_DAY, run_daily_jobs
+from app.pagination import paginate, parse_fields, select_fields
+from app.serialization import json_response
+from app.stats import record_loan, record_loans, record_return, record_returns
 
 router = APIRouter(
     prefix="/loans",
@@ -34,91 +46,407 @@ def compute_due_date(start: date) -> date:
     return start + timedelta(days=28)
 
 def compute_penalty(late_days: int) -> int:
-    return max(0, late_days) * 50
-
-# Cette route sera destinée à créer l'emprunt selon des critères que l'on lui apporte en json
-@router.post("/", response_model=Loan)
-def loan_book(loan: Loan):
-    with Session(engine) as session:
+    return max(0, late_days) * PENALTY_CENTS_PER_DAY
+
+MAX_ACTIVE_LOANS = 5
+
+# Les traitements sont écrits une seule fois, dans des fonctions qui reçoivent la session : les routes ci-dessous
+# les appellent avec la Session fournie par dépendance, et les routes async (loans_async.py) avec session.run_sync()
+
+def checkout(session: Session, loan: Loan) -> Loan:
+    # On retire 1 des stocks du livre seulement s'il en reste : la condition est vérifiée par SQLite dans l'UPDATE,
+    # deux requêtes simultanées ne peuvent donc pas emprunter le même dernier exemplaire
+    remaining = session.exec(
+        update(Book)
+        .where(Book.id == loan.book_id, Book.copies > 0)
+        .values(copies=Book.copies - 1)
+        .returning(Book.copies)
+    ).scalar_one_or_none()
+    if remaining is None:
         # On vérifie si le livre existe vraiment
-        book = session.get(Book, loan.book_id)
-        if not book:
+        if not session.get(Book, loan.book_id):
             raise HTTPException(404, "Le livre est introuvable")
-
         # Si il y a plus de stocks, on renvoie un message
-        if book.copies <= 0:
-            raise HTTPException(409, "Plus de stocks pour ce livre")
-
-        # On vérifie si l'utilisateur n'a pas atteint sa limite d'emprunts maximale en fonction de son mail ou de son card_id
-        active_count = session.exec(
-            select(Loan).where(
-                Loan.active == True,
-                (Loan.loaner_mail == loan.loaner_mail) | (Loan.loaner_card_id == loan.loaner_card_id)
-            )
-        ).all()
-        if len(active_count) >= 5:
-            raise HTTPException(403, "La limite d'emprunts a été atteinte pour cet utilisateur")
-
-        # On construit le payload de l'emprunt avec la date du jour pour optenir la date de fin prévu
-        start = parse_date(loan.start_date, "start_date")
-        due = compute_due_date(start)
-
-        loan = Loan(
-            book_id=loan.book_id,
-            loaner_name=loan.loaner_name,
-            loaner_mail=loan.loaner_mail,
-            loaner_card_id=loan.loaner_card_id,
-            start_date=start,
-            due_date=due,
-            comment=loan.comment,
-            active=True,
-            renew_count=0,
-            late_days=0,
-            penalty_cents=0,
+        raise HTTPException(409, "Plus de stocks pour ce livre")
+
+    # On vérifie si l'utilisateur n'a pas atteint sa limite d'emprunts maximale (sur sa carte ou sur son adresse mail)
+    if quota_usage(session, loan.loaner_card_id, loan.loaner_mail) >= MAX_ACTIVE_LOANS:
+        raise HTTPException(403, "La limite d'emprunts a été atteinte pour cet utilisateur")
+
+    # Dernier exemplaire emprunté : le livre passe dans la facette « non disponible »
+    if remaining == 0:
+        record_availability(session, became_available=0, became_unavailable=1)
+
+    # On construit le payload de l'emprunt avec la date du jour pour optenir la date de fin prévu
+    start = parse_date(loan.start_date, "start_date")
+    due = compute_due_date(start)
+    # Un emprunt antidaté peut être déjà en retard : il est marqué comme le ferait le balayage quotidien
+    late_days = max(0, (today() - due).days)
+
+    loan = Loan(
+        book_id=loan.book_id,
+        loaner_name=loan.loaner_name,
+        loaner_mail=loan.loaner_mail,
+        loaner_card_id=loan.loaner_card_id,
+        start_date=start,
+        due_date=due,
+        comment=loan.comment,
+        active=True,
+        renew_count=0,
+        late=late_days > 0,
+        late_days=late_days,
+        penalty_cents=compute_penalty(late_days),
+    )
+
+    session.add(loan)
+    record_loan(session, loan.book_id, loan.start_date)
+    update_borrower(
+        session, loan.loaner_card_id, loan.loaner_mail, loan.loaner_name,
+        active_loans=1, accrued_penalty_cents=loan.penalty_cents,
+    )
+    # Journal des modifications : le nouvel emprunt et le stock du livre
+    session.flush()
+    record_change(session, "loan", "create", loan.id)
+    record_change(session, "book", "update", loan.book_id)
+    session.commit()
+    # Le stock et la popularité du livre ont changé
+    response_cache.invalidate("loans", "books", f"book:{loan.book_id}")
+    session.refresh(loan)
+
+    return loan
+
+# Emprunt introuvable dans la table loan : 409 s'il a été archivé (il a donc été retourné), 404 sinon
+def missing_loan(session: Session, loan_id: int, archived_detail: str, missing_detail: str) -> HTTPException:
+    if archived_ids(session, [loan_id]):
+        return HTTPException(409, archived_detail)
+    return HTTPException(404, missing_detail)
+
+def checkin(session: Session, loan_id: int) -> Loan:
+    loan = session.get(Loan, loan_id)
+    if not loan:
+        raise missing_loan(session, loan_id, "l'emprunt a déjà été retourné", "l'emprunt est introuvable")
+
+    returned = today()
+    late_days = max(0, (returned - loan.due_date).days)
+    penalty = compute_penalty(late_days)
+    accrued = loan.penalty_cents
+
+    # L'emprunt n'est clôturé que s'il est encore actif : un double retour simultané ne rend pas deux exemplaires
+    closed = session.exec(
+        update(Loan)
+        .where(Loan.id == loan_id, Loan.active == True)
+        .values(returned_date=returned, active=False, late=late_days > 0, late_days=late_days, penalty_cents=penalty)
+    ).rowcount
+    if not closed:
+        raise HTTPException(409, "l'emprunt a déjà été retourné")
+
+    # On ajoute 1 des stocks du livre concerné si l'emprunt a bien été retrouné
+    restocked = session.exec(
+        update(Book).where(Book.id == loan.book_id).values(copies=Book.copies + 1).returning(Book.copies)
+    ).scalar_one_or_none()
+    if restocked is None:
+        raise HTTPException(500, "Aucun livre n'est disponible pour cet emprunt. Les données de la requête sont incohérentes")
+    if restocked == 1:
+        record_availability(session, became_available=1, became_unavailable=0)
+
+    # Mise à jour des statistiques du livre dans la même transaction
+    record_return(session, loan.book_id, (returned - loan.start_date).days, late_days > 0)
+    # La pénalité en cours de l'emprunt devient une pénalité due
+    update_borrower(
+        session, loan.loaner_card_id, loan.loaner_mail, loan.loaner_name,
+        active_loans=-1, penalty_cents=penalty, accrued_penalty_cents=-accrued,
+    )
+    record_change(session, "loan", "update", loan_id)
+    record_change(session, "book", "update", loan.book_id)
+
+    session.commit()
+    response_cache.invalidate("loans", "books", f"book:{loan.book_id}")
+    session.refresh(loan)
+    return loan
+
+def find_loans(
+    session: Session,
+    status: str,
+    loaner_mail: str | None,
+    loaner_card_id: int | None,
+    book_id: int | None,
+    date_from: date | None,
+    date_to: date | None,
+    page: int,
+    page_size: int,
+    sort_by: str,
+    order: str,
+    cursor: str | None,
+    fields: str | None = None,
+):
+    columns = parse_fields(Loan, fields)
+    if status not in ("active", "late", "history"):
+        raise HTTPException(422, "Le status doit être: active, late ou history")
+    # L'historique comprend les emprunts archivés des années de la période (voir app/archive.py)
+    loans = history_loans(session, date_from, date_to) if status == "history" else Loan
+    q = select_fields(loans, columns)
+
+    # Filtrer par utilisateurs
+    if loaner_mail:
+        q = q.where(loans.loaner_mail == loaner_mail)
+    if loaner_card_id is not None:
+        q = q.where(loans.loaner_card_id == loaner_card_id)
+
+    # Filtrer par livres
+    if book_id is not None:
+        q = q.where(loans.book_id == book_id)
+
+    # Filtrer par périodes
+    if date_from:
+        q = q.where(loans.start_date >= date_from)
+    if date_to:
+        q = q.where(loans.start_date <= date_to)
+
+    # Filtrer par status
+    if status == "active":
+        q = q.where(loans.active == True)
+    elif status == "late":
+        # Retards marqués par le balayage quotidien : lecture sur l'index (active, late, due_date)
+        q = q.where(loans.active == True, loans.late == True)
+    else:
+        q = q.where(loans.active == False)
+
+    # le tri
+    sort_col = {
+        "start_date": loans.start_date,
+        "due_date": loans.due_date,
+        "returned_date": loans.returned_date,
+    }.get(sort_by)
+
+    if sort_col is None:
+        raise HTTPException(422, "le sort_by est invalide")
+
+    # la pagination (COUNT SQL + curseur optionnel)
+    return paginate(session, q, page, page_size, sort_col, loans.id, order, cursor, columns)
+
+def extend_loan(session: Session, loan_id: int) -> Loan:
+    loan = session.get(Loan, loan_id)
+    if not loan:
+        raise missing_loan(
+            session, loan_id, "L'emprunt a déjà été retourné. Imposible de le renouveller", "L'emprunt est introuvable"
         )
 
-        # On retire 1 des stocks du livre concerné si l'emprunt a bien été effectué
-        book.copies -= 1
-
-        session.add(book)
-        session.add(loan)
-        session.commit()
-        session.refresh(loan)
-
-        return loan
+    if not loan.active:
+        raise HTTPException(409, "L'emprunt a déjà été retourné. Imposible de le renouveller")
 
-# Cette route sera destinée à marquer l'emprunt comme 'retourné' et le livre rapporté à la biblioteque
-@router.post("/{loan_id}/return", response_model=Loan)
-def return_book(loan_id: int):
-    with Session(engine) as session:
-        loan = session.get(Loan, loan_id)
-        if not loan:
-            raise HTTPException(404, "l'emprunt est introuvable")
+    if loan.renew_count >= 1:
+        raise HTTPException(403, "le quôta de 1 renouvellement a déjà été utilisé par cet emprunt")
 
-        if not loan.active:
-            raise HTTPException(409, "l'emprunt a déjà été retourné")
+    # On ajoute les 14 jours à la date de retour. La condition de l'UPDATE garantit qu'un seul renouvellement passe
+    due = loan.due_date + timedelta(days=14)
+    late_days = max(0, (today() - due).days)
+    accrued = loan.penalty_cents
+    renewed = session.exec(
+        update(Loan)
+        .where(Loan.id == loan_id, Loan.active == True, Loan.renew_count < 1)
+        .values(
+            due_date=due,
+            renew_count=Loan.renew_count + 1,
+            late=late_days > 0,
+            late_days=late_days,
+            penalty_cents=compute_penalty(late_days),
+        )
+    ).rowcount
+    if not renewed:
+        raise HTTPException(403, "le quôta de 1 renouvellement a déjà été utilisé par cet emprunt")
+
+    update_borrower(
+        session, loan.loaner_card_id, loan.loaner_mail, loan.loaner_name,
+        accrued_penalty_cents=compute_penalty(late_days) - accrued,
+    )
+    record_change(session, "loan", "update", loan_id)
+    session.commit()
+    response_cache.invalidate("loans")
+    session.refresh(loan)
+    return loan
+
+# Résultat d'un élément d'un lot : même code et même message que la route unitaire correspondante
+def batch_result(key: str, value: int, status: int, detail: str | None = None, loan: Loan | None = None) -> dict:
+    result = {key: value, "status": status}
+    if detail:
+        result["detail"] = detail
+    if loan:
+        result["loan"] = loan
+    return result
+
+def batch_report(results: list[dict]) -> dict:
+    succeeded = sum(1 for result in results if result["status"] == 200)
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+# Emprunt de plusieurs livres par un même emprunteur : le quota est vérifié une fois, puis le stock, les emprunts et
+# les statistiques sont écrits avec une requête chacun, dans une seule transaction
+def checkout_batch(session: Session, batch: LoanBatch) -> dict:
+    # La transaction IMMEDIATE tient le verrou d'écriture : le stock lu ici ne peut pas changer avant l'UPDATE
+    copies = dict(session.exec(select(Book.id, Book.copies).where(Book.id.in_(batch.book_ids))).all())
+    remaining = MAX_ACTIVE_LOANS - quota_usage(session, batch.loaner_card_id, batch.loaner_mail)
+
+    start = parse_date(batch.start_date, "start_date")
+    due = compute_due_date(start)
+    late_days = max(0, (today() - due).days)
+
+    results = []
+    accepted = []
+    for book_id in batch.book_ids:
+        if book_id in accepted:
+            results.append(batch_result("book_id", book_id, 409, "Ce livre est déjà dans le lot"))
+        elif book_id not in copies:
+            results.append(batch_result("book_id", book_id, 404, "Le livre est introuvable"))
+        elif copies[book_id] <= 0:
+            results.append(batch_result("book_id", book_id, 409, "Plus de stocks pour ce livre"))
+        elif len(accepted) >= remaining:
+            results.append(batch_result("book_id", book_id, 403, "La limite d'emprunts a été atteinte pour cet utilisateur"))
+        else:
+            accepted.append(book_id)
+            results.append(batch_result("book_id", book_id, 200))
 
-        book = session.get(Book, loan.book_id)
-        if not book:
-            raise HTTPException(500, "Aucun livre n'est disponible pour cet emprunt. Les données de la requête sont incohérentes")
+    if accepted:
+        session.exec(update(Book).where(Book.id.in_(accepted)).values(copies=Book.copies - 1))
+        record_availability(
+            session, became_available=0, became_unavailable=sum(1 for book_id in accepted if copies[book_id] == 1)
+        )
+        rows = [
+            {
+                "book_id": book_id,
+                "loaner_name": batch.loaner_name,
+                "loaner_mail": batch.loaner_mail,
+                "loaner_card_id": batch.loaner_card_id,
+                "start_date": start,
+                "due_date": due,
+                "comment": batch.comment,
+                "active": True,
+                "renew_count": 0,
+                "late": late_days > 0,
+                "late_days": late_days,
+                "penalty_cents": compute_penalty(late_days),
+            }
+            for book_id in accepted
+        ]
+        loan_ids = list(session.scalars(insert(Loan).returning(Loan.id), rows))
+        record_loans(session, loan_ids)
+        update_borrower(
+            session, batch.loaner_card_id, batch.loaner_mail, batch.loaner_name,
+            active_loans=len(accepted), accrued_penalty_cents=len(accepted) * compute_penalty(late_days),
+        )
+        record_changes(session, "loan", "create", loan_ids)
+        record_changes(session, "book", "update", accepted)
+
+    session.commit()
+    if accepted:
+        response_cache.invalidate("loans", "books", *(f"book:{book_id}" for book_id in accepted))
+        loans = {loan.book_id: loan for loan in session.exec(select(Loan).where(Loan.id.in_(loan_ids)))}
+        for result in results:
+            if result["status"] == 200:
+                result["loan"] = loans[result["book_id"]]
+    return batch_report(results)
+
+# Retour de plusieurs emprunts : clôture, remise en stock et statistiques en une requête chacune, dans une seule transaction
+def checkin_batch(session: Session, batch: ReturnBatch) -> dict:
+    loans = {loan.id: loan for loan in session.exec(select(Loan).where(Loan.id.in_(batch.loan_ids)))}
+    archived = archived_ids(session, [loan_id for loan_id in batch.loan_ids if loan_id not in loans])
+
+    results = []
+    accepted = []
+    for loan_id in batch.loan_ids:
+        loan = loans.get(loan_id)
+        if loan_id in accepted:
+            results.append(batch_result("loan_id", loan_id, 409, "Cet emprunt est déjà dans le lot"))
+        elif loan_id in archived:
+            results.append(batch_result("loan_id", loan_id, 409, "l'emprunt a déjà été retourné"))
+        elif not loan:
+            results.append(batch_result("loan_id", loan_id, 404, "l'emprunt est introuvable"))
+        elif not loan.active:
+            results.append(batch_result("loan_id", loan_id, 409, "l'emprunt a déjà été retourné"))
+        else:
+            accepted.append(loan_id)
+            results.append(batch_result("loan_id", loan_id, 200))
 
+    if accepted:
+        # Jours de retard calculés par SQLite pour chaque emprunt, avec la même règle que compute_penalty
         returned = today()
-        late_days = max(0, (returned - loan.due_date).days)
-        penalty = compute_penalty(late_days)
-
-        loan.returned_date = returned
-        loan.active = False
-        loan.late_days = late_days
-        loan.penalty_cents = penalty
+        late_days = func.max(0, cast(func.julianday(returned.isoformat()) - func.julianday(Loan.due_date), Integer))
+        session.exec(
+            update(Loan)
+            .where(Loan.id.in_(accepted), Loan.active == True)
+            .values(
+                returned_date=returned,
+                active=False,
+                late=Loan.due_date < returned,
+                late_days=late_days,
+                penalty_cents=late_days * PENALTY_CENTS_PER_DAY,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        # Remise en stock : un exemplaire par emprunt retourné, regroupé par livre. Les livres sont retirés de la
+        # facette de disponibilité avant la remise en stock et rajoutés après
+        book_ids = list({loans[loan_id].book_id for loan_id in accepted})
+        record_facets(session, book_ids, -1, ("available",))
+        returned_per_book = (
+            select(Loan.book_id, func.count().label("total"))
+            .where(Loan.id.in_(accepted))
+            .group_by(Loan.book_id)
+            .subquery()
+        )
+        session.exec(
+            update(Book)
+            .where(Book.id == returned_per_book.c.book_id)
+            .values(copies=Book.copies + returned_per_book.c.total)
+            .execution_options(synchronize_session=False)
+        )
+        record_facets(session, book_ids, 1, ("available",))
+        record_returns(session, accepted)
+        sync_borrowers(session, {loans[loan_id].loaner_card_id for loan_id in accepted})
+        record_changes(session, "loan", "update", accepted)
+        record_changes(session, "book", "update", book_ids)
+
+    session.commit()
+    if accepted:
+        response_cache.invalidate("loans", "books", *(f"book:{book_id}" for book_id in book_ids))
+        # Relecture des emprunts clôturés (valeurs calculées par SQLite) en une requête
+        loans = {
+            loan.id: loan
+            for loan in session.exec(
+                select(Loan).where(Loan.id.in_(accepted)).execution_options(populate_existing=True)
+            )
+        }
+        for result in results:
+            if result["status"] == 200:
+                result["loan"] = loans[result["loan_id"]]
+    return batch_report(results)
 
-        # On ajoute 1 des stocks du livre concerné si l'emprunt a bien été retrouné
-        book.copies += 1
+# Cette route sera destinée à créer l'emprunt selon des critères que l'on lui apporte en json
+@router.post("/", response_model=Loan)
+def loan_book(loan: Loan, session: Session = Depends(get_immediate_session)):
+    # Toute la vérification et l'écriture se font dans une seule transaction IMMEDIATE (verrou d'écriture pris dès le début)
+    return checkout(session, loan)
+
+# Cette route sera destinée à emprunter plusieurs livres en une fois pour un même emprunteur (comptoir de prêt)
+@router.post("/batch")
+def loan_books_batch(batch: LoanBatch, session: Session = Depends(get_immediate_session)):
+    return checkout_batch(session, batch)
+
+# Cette route sera destinée à retourner plusieurs emprunts en une fois
+@router.post("/return/batch")
+def return_books_batch(batch: ReturnBatch, session: Session = Depends(get_immediate_session)):
+    return checkin_batch(session, batch)
+
+# Cette route sera destinée à importer en masse des emprunts depuis un fichier CSV ou JSONL envoyé dans le corps de la requête
+@router.post("/bulk")
+async def bulk_import_loans(
+    request: Request,
+    format: str = Query(default="csv", description="csv ou jsonl"),
+    chunk_size: int = Query(default=CHUNK_SIZE, ge=1, le=10000),
+):
+    return await import_request(request, "loans", format, chunk_size)
 
-        session.add(book)
-        session.add(loan)
-        session.commit()
-        session.refresh(loan)
-        return loan
+# Cette route sera destinée à marquer l'emprunt comme 'retourné' et le livre rapporté à la biblioteque
+@router.post("/{loan_id}/return", response_model=Loan)
+def return_book(loan_id: int, session: Session = Depends(get_immediate_session)):
+    return checkin(session, loan_id)
 
 # Cette route sera destinée à lister les emprunts actifs, en retard et lister l'historique complet des emprunts 
 @router.get("/")
@@ -133,85 +461,43 @@ def list_loans(
     page_size: int = Query(default=10, ge=1, le=100),
     sort_by: str = Query(default="start_date", description="active, late ou history"),
     order: str = Query(default="desc", description="asc ou desc"),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,book_id,due_date (par défaut toutes)"),
+    session: Session = Depends(get_read_session),
 ):
-    with Session(engine) as session:
-        q = select(Loan)
-
-        # Filtrer par utilisateurs
-        if loaner_mail:
-            q = q.where(Loan.loaner_mail == loaner_mail)
-        if loaner_card_id is not None:
-            q = q.where(Loan.loaner_card_id == loaner_card_id)
-
-        # Filtrer par livres
-        if book_id is not None:
-            q = q.where(Loan.book_id == book_id)
-
-        # Filtrer par périodes
-        if date_from:
-            q = q.where(Loan.start_date >= date_from)
-        if date_to:
-            q = q.where(Loan.start_date <= date_to)
-
-        # Filtrer par status
-        if status == "active":
-            q = q.where(Loan.active == True)
-        elif status == "late":
-            q = q.where(Loan.active == True, Loan.due_date < today())
-        elif status == "history":
-            q = q.where(Loan.active == False)
-        else:
-            raise HTTPException(422, "Le status doit être: active, late ou history")
-
-        # le tri
-        sort_col = {
-            "start_date": Loan.start_date,
-            "due_date": Loan.due_date,
-            "returned_date": Loan.returned_date,
-        }.get(sort_by)
-
-        if not sort_col:
-            raise HTTPException(422, "le sort_by est invalide")
-
-        if order == "asc":
-            q = q.order_by(sort_col.asc())
-        elif order == "desc":
-            q = q.order_by(sort_col.desc())
-        else:
-            raise HTTPException(422, "order doit être: asc ou desc")
-
-        # la pagination
-        offset = (page - 1) * page_size
-        total = len(session.exec(q).all())
-        items = session.exec(q.offset(offset).limit(page_size)).all()
-
-        return {
-            "items": items,
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "total_pages": (total + page_size - 1) // page_size,
-        }
+    # Liste non mise en cache : sérialisée directement avec orjson
+    return json_response(find_loans(
+        session, status, loaner_mail, loaner_card_id, book_id, date_from, date_to,
+        page, page_size, sort_by, order, cursor, fields,
+    ))
+
+# Cette route sera destinée à exporter les emprunts d'une période (date de début d'emprunt) en CSV ou NDJSON
+@router.get("/export")
+def export_loans(
+    date_from: date | None = None,
+    date_to: date | None = None,
+    format: str = Query(default="csv", description="csv ou ndjson"),
+    gzip: bool = Query(default=False),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,book_id,due_date (par défaut toutes)"),
+):
+    columns = parse_fields(Loan, fields)
+    # Emprunts de la table loan et des archives des années de la période
+    with read_engine.connect() as conn:
+        source = history_source(conn, date_from, date_to)
+    query = select(source) if columns is None else select(*(source.c[name] for name in columns))
+    query = query.order_by(source.c.id)
+    if date_from:
+        query = query.where(source.c.start_date >= date_from)
+    if date_to:
+        query = query.where(source.c.start_date <= date_to)
+    return export_response(query, format, gzip, "emprunts")
+
+# Cette route sera destinée à lancer à la demande le balayage des retards (fait automatiquement une fois par jour)
+@router.post("/sweep")
+def sweep_overdue():
+    return {"late_loans": run_daily_jobs()}
 
 # Cette route sera destinée à laisser la posibilité de prolonger de 14 jours max un emprunt.
 @router.post("/{loan_id}/renew", response_model=Loan)
-def renew_loan(loan_id: int):
-    with Session(engine) as session:
-        loan = session.get(Loan, loan_id)
-        if not loan:
-            raise HTTPException(404, "L'emprunt est introuvable")
-
-        if not loan.active:
-            raise HTTPException(409, "L'emprunt a déjà été retourné. Imposible de le renouveller")
-
-        if loan.renew_count >= 1:
-            raise HTTPException(403, "le quôta de 1 renouvellement a déjà été utilisé par cet emprunt")
-
-        # On ajoute les 14 jours à la date de retour
-        loan.due_date = loan.due_date + timedelta(days=14)
-        loan.renew_count += 1
-
-        session.add(loan)
-        session.commit()
-        session.refresh(loan)
-        return loan
\ No newline at end of file
+def renew_loan(loan_id: int, session: Session = Depends(get_immediate_session)):
+    return extend_loan(session, loan_id)
@@ -0,0 +1,72 @@
+# app/routers/loans_async.py
+from fastapi import APIRouter, Depends, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import date
+from app.models import Loan, LoanBatch, ReturnBatch
+from app.database import get_async_immediate_session, get_async_read_session
+from app.routers import loans
+from app.serialization import json_response
+
+# Versions async des routes des emprunts (activées avec async_mode=true), mêmes traitements que loans.py.
+# Les écritures passent par une session BEGIN IMMEDIATE comme en mode synchrone
+
+router = APIRouter(
+    prefix="/loans",
+    tags=["Emprunts"]
+)
+
+# Cette route sera destinée à créer l'emprunt selon des critères que l'on lui apporte en json
+@router.post("/", response_model=Loan)
+async def loan_book(loan: Loan, session: AsyncSession = Depends(get_async_immediate_session)):
+    return await session.run_sync(loans.checkout, loan)
+
+# Cette route sera destinée à emprunter plusieurs livres en une fois pour un même emprunteur (comptoir de prêt)
+@router.post("/batch")
+async def loan_books_batch(batch: LoanBatch, session: AsyncSession = Depends(get_async_immediate_session)):
+    return await session.run_sync(loans.checkout_batch, batch)
+
+# Cette route sera destinée à retourner plusieurs emprunts en une fois
+@router.post("/return/batch")
+async def return_books_batch(batch: ReturnBatch, session: AsyncSession = Depends(get_async_immediate_session)):
+    return await session.run_sync(loans.checkin_batch, batch)
+
+# Cette route sera destinée à importer en masse des emprunts (route déjà async, partagée avec le mode synchrone)
+router.add_api_route("/bulk", loans.bulk_import_loans, methods=["POST"])
+
+# Cette route sera destinée à marquer l'emprunt comme 'retourné' et le livre rapporté à la biblioteque
+@router.post("/{loan_id}/return", response_model=Loan)
+async def return_book(loan_id: int, session: AsyncSession = Depends(get_async_immediate_session)):
+    return await session.run_sync(loans.checkin, loan_id)
+
+# Cette route sera destinée à lister les emprunts actifs, en retard et lister l'historique complet des emprunts
+@router.get("/")
+async def list_loans(
+    status: str = Query(default="active", description="active, late ou history"),
+    loaner_mail: str | None = None,
+    loaner_card_id: int | None = None,
+    book_id: int | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, ge=1, le=100),
+    sort_by: str = Query(default="start_date", description="active, late ou history"),
+    order: str = Query(default="desc", description="asc ou desc"),
+    cursor: str | None = Query(default=None, description="Curseur renvoyé par la page précédente (next_cursor)"),
+    fields: str | None = Query(default=None, description="Colonnes à renvoyer, ex: id,book_id,due_date (par défaut toutes)"),
+    session: AsyncSession = Depends(get_async_read_session),
+):
+    return json_response(await session.run_sync(
+        loans.find_loans, status, loaner_mail, loaner_card_id, book_id, date_from, date_to,
+        page, page_size, sort_by, order, cursor, fields,
+    ))
+
+# Cette route sera destinée à exporter les emprunts d'une période (l'export est déjà diffusé au fil de l'eau)
+router.add_api_route("/export", loans.export_loans, methods=["GET"])
+
+# Cette route sera destinée à lancer à la demande le balayage des retards (partagée avec le mode synchrone)
+router.add_api_route("/sweep", loans.sweep_overdue, methods=["POST"])
+
+# Cette route sera destinée à laisser la posibilité de prolonger de 14 jours max un emprunt.
+@router.post("/{loan_id}/renew", response_model=Loan)
+async def renew_loan(loan_id: int, session: AsyncSession = Depends(get_async_immediate_session)):
+    return await session.run_sync(loans.extend_loan, loan_id)
@@ -0,0 +1,29 @@
+# app/routers/reports.py
+from fastapi import APIRouter, Response
+from fastapi.responses import FileResponse
+from app.models import ReportRequest
+from app.reports import report_pdf_path, report_status, submit_report
+
+router = APIRouter(
+    prefix="/reports",
+    tags=["Rapports"]
+)
+
+# Cette route sera destinée à demander un rapport de statistiques : il est généré en arrière-plan (pool de processus)
+# et la réponse donne son identifiant. Un rapport déjà généré avec les mêmes paramètres est renvoyé directement
+@router.post("/", status_code=202)
+def create_report(report: ReportRequest, response: Response):
+    result = submit_report(report)
+    if result["status"] == "done":
+        response.status_code = 200
+    return result
+
+# Cette route sera destinée à suivre un rapport : pending, failed ou done (avec les données du rapport)
+@router.get("/{report_id}")
+def read_report(report_id: str):
+    return report_status(report_id)
+
+# Cette route sera destinée à télécharger le PDF d'un rapport terminé
+@router.get("/{report_id}/pdf")
+def download_report(report_id: str):
+    return FileResponse(report_pdf_path(report_id), media_type="application/pdf", filename=f"rapport-{report_id}.pdf")
@@ -0,0 +1,108 @@
+# app/routers/stats.py
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import func
+from sqlmodel import Session, select
+from app.cache import STATS_TTL, response_cache
+from app.database import get_read_session
+from app.models import Author, Book, Loan, LoanHistory
+
+router = APIRouter(
+    prefix="/stats",
+    tags=["Statistiques"]
+)
+
+# Toutes ces routes lisent les agrégats de LoanHistory : leur coût ne dépend pas du nombre d'emprunts enregistrés
+
+def average_duration(total_duration_days: int, returned_loans: int) -> float | None:
+    if not returned_loans:
+        return None
+    return round(total_duration_days / returned_loans, 2)
+
+# Cette route sera destinée à donner les statistiques globales de la bibliothèque
+@router.get("/global")
+def global_stats(request: Request, session: Session = Depends(get_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    total_books, total_owned, total_available = session.exec(
+        select(func.count(Book.id), func.coalesce(func.sum(Book.owned), 0), func.coalesce(func.sum(Book.copies), 0))
+    ).one()
+    total_loans, active_loans = session.exec(
+        select(func.coalesce(func.sum(LoanHistory.total_loans), 0), func.coalesce(func.sum(LoanHistory.active_loans), 0))
+    ).one()
+    # Retards et pénalités en cours tenus à jour par le balayage quotidien : lecture sur l'index (active, late, due_date)
+    late_loans, accrued_penalty_cents = session.exec(
+        select(func.count(), func.coalesce(func.sum(Loan.penalty_cents), 0)).where(Loan.active == True, Loan.late == True)
+    ).one()
+
+    result = {
+        "total_books": total_books,
+        "total_copies": total_owned,
+        "available_copies": total_available,
+        "total_loans": total_loans,
+        "active_loans": active_loans,
+        "late_loans": late_loans,
+        "accrued_penalty_cents": accrued_penalty_cents,
+        "occupancy_rate": round((total_owned - total_available) / total_owned, 4) if total_owned else 0.0,
+    }
+    return cached.store(result, ["books", "loans"], STATS_TTL)
+
+# Cette route sera destinée à donner les statistiques d'emprunts d'un livre
+@router.get("/books/{book_id}")
+def book_stats(request: Request, book_id: int, session: Session = Depends(get_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    book = session.get(Book, book_id)
+    if not book:
+        raise HTTPException(404, "Livre introuvable")
+
+    history = session.get(LoanHistory, book_id) or LoanHistory(book_id=book_id)
+    # Classement de popularité : nombre de livres plus empruntés que celui-ci (lecture sur l'index total_loans)
+    better = session.exec(
+        select(func.count()).select_from(LoanHistory).where(LoanHistory.total_loans > history.total_loans)
+    ).one()
+
+    result = {
+        "book_id": book_id,
+        "total_loans": history.total_loans,
+        "active_loans": history.active_loans,
+        "returned_loans": history.returned_loans,
+        "average_duration_days": average_duration(history.total_duration_days, history.returned_loans),
+        "late_count": history.late_count,
+        "popularity_rank": better + 1,
+    }
+    return cached.store(result, ["loans", f"book:{book_id}"], STATS_TTL)
+
+# Cette route sera destinée à donner les statistiques d'emprunts cumulées des livres d'un auteur
+@router.get("/authors/{author_id}")
+def author_stats(request: Request, author_id: int, session: Session = Depends(get_read_session)):
+    cached = response_cache.lookup(request)
+    if cached.response:
+        return cached.response
+    author = session.get(Author, author_id)
+    if not author:
+        raise HTTPException(404, "L'auteur est introuvable dans la base de données")
+
+    total_books = session.exec(
+        select(func.count()).select_from(Book).where(Book.author_id == author_id)
+    ).one()
+    total_loans, returned_loans, total_duration_days, late_count = session.exec(
+        select(
+            func.coalesce(func.sum(LoanHistory.total_loans), 0),
+            func.coalesce(func.sum(LoanHistory.returned_loans), 0),
+            func.coalesce(func.sum(LoanHistory.total_duration_days), 0),
+            func.coalesce(func.sum(LoanHistory.late_count), 0),
+        )
+        .join(Book, Book.id == LoanHistory.book_id)
+        .where(Book.author_id == author_id)
+    ).one()
+
+    result = {
+        "author_id": author_id,
+        "total_books": total_books,
+        "total_loans": total_loans,
+        "average_duration_days": average_duration(total_duration_days, returned_loans),
+        "late_count": late_count,
+    }
+    return cached.store(result, ["books", "loans", f"author:{author_id}"], STATS_TTL)
@@ -0,0 +1,165 @@
+# app/search.py
+import argparse
+import re
+from sqlalchemy import Column, Integer, MetaData, Table, Text, bindparam, func, text
+from sqlmodel import Session, select
+from app.models import Author, Book
+
+# Index plein texte (SQLite FTS5) pour la recherche de livres et d'auteurs.
+# Le tokenizer unicode61 avec remove_diacritics 2 permet d'ignorer les accents (misérables == miserables)
+# et le rowid de chaque table virtuelle correspond à l'id du livre ou de l'auteur.
+
+# Les tables virtuelles ont leur propre MetaData pour que create_all ne tente pas de les créer comme des tables classiques
+fts_metadata = MetaData()
+
+book_fts = Table(
+    "book_fts",
+    fts_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("title", Text),
+    Column("description", Text),
+    Column("category", Text),
+    Column("house", Text),
+    Column("author", Text),
+    Column("rank"),
+    Column("book_fts", Text),
+)
+
+author_fts = Table(
+    "author_fts",
+    fts_metadata,
+    Column("rowid", Integer, primary_key=True),
+    Column("firstname", Text),
+    Column("lastname", Text),
+    Column("rank"),
+    Column("author_fts", Text),
+)
+
+TOKENIZE = "tokenize = \"unicode61 remove_diacritics 2\""
+
+# Création des tables virtuelles (idempotent), appelée par run_migrations avant les migrations de données
+def create_search_tables(conn):
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5(title, description, category, house, author, {TOKENIZE})"
+    ))
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS author_fts USING fts5(firstname, lastname, {TOKENIZE})"
+    ))
+
+# Transforme la saisie de l'utilisateur en requête FTS5 : chaque mot devient un préfixe ("hug"*), combinés en ET.
+# On ne garde que les caractères de mots pour qu'une saisie ne puisse pas injecter la syntaxe FTS5 (OR, NEAR, ^...)
+def build_match(terms: str, column: str | None = None) -> str | None:
+    words = re.findall(r"\w+", terms)
+    if not words:
+        return None
+    expression = " ".join(f'"{word}"*' for word in words)
+    if column:
+        return f"{column} : ({expression})"
+    return expression
+
+def author_fullname(author: Author | None) -> str:
+    if not author:
+        return ""
+    return f"{author.firstname} {author.lastname}"
+
+def index_book(session: Session, book: Book, author: Author | None = None):
+    if author is None:
+        author = session.get(Author, book.author_id)
+    conn = session.connection()
+    conn.execute(text("DELETE FROM book_fts WHERE rowid = :id"), {"id": book.id})
+    conn.execute(
+        text(
+            "INSERT INTO book_fts (rowid, title, description, category, house, author) "
+            "VALUES (:id, :title, :description, :category, :house, :author)"
+        ),
+        {
+            "id": book.id,
+            "title": book.title,
+            "description": book.description or "",
+            "category": book.category or "",
+            "house": book.house or "",
+            "author": author_fullname(author),
+        },
+    )
+
+def unindex_book(session: Session, book_id: int):
+    session.connection().execute(text("DELETE FROM book_fts WHERE rowid = :id"), {"id": book_id})
+
+def index_author(session: Session, author: Author):
+    conn = session.connection()
+    conn.execute(text("DELETE FROM author_fts WHERE rowid = :id"), {"id": author.id})
+    conn.execute(
+        text("INSERT INTO author_fts (rowid, firstname, lastname) VALUES (:id, :firstname, :lastname)"),
+        {"id": author.id, "firstname": author.firstname, "lastname": author.lastname},
+    )
+    # Le nom de l'auteur est aussi indexé avec chacun de ses livres
+    conn.execute(
+        text("UPDATE book_fts SET author = :author WHERE rowid IN (SELECT id FROM book WHERE author_id = :id)"),
+        {"author": author_fullname(author), "id": author.id},
+    )
+
+# Indexation par lots (import en masse) : une seule requête INSERT ... SELECT pour tous les livres du lot
+def index_books(conn, book_ids: list[int]):
+    if not book_ids:
+        return
+    conn.execute(
+        text(
+            "INSERT INTO book_fts (rowid, title, description, category, house, author) "
+            "SELECT book.id, book.title, coalesce(book.description, ''), coalesce(book.category, ''), "
+            "coalesce(book.house, ''), coalesce(author.firstname || ' ' || author.lastname, '') "
+            "FROM book LEFT JOIN author ON author.id = book.author_id WHERE book.id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": book_ids},
+    )
+
+def index_authors(conn, author_ids: list[int]):
+    if not author_ids:
+        return
+    conn.execute(
+        text(
+            "INSERT INTO author_fts (rowid, firstname, lastname) SELECT id, firstname, lastname FROM author WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": author_ids},
+    )
+
+def unindex_author(session: Session, author_id: int):
+    session.connection().execute(text("DELETE FROM author_fts WHERE rowid = :id"), {"id": author_id})
+
+# Remplit entièrement les deux index à partir des tables book et author (migration, base générée, index désynchronisé)
+def fill_search_index(conn):
+    conn.execute(text("DELETE FROM book_fts"))
+    conn.execute(text("DELETE FROM author_fts"))
+    conn.execute(text(
+        "INSERT INTO author_fts (rowid, firstname, lastname) SELECT id, firstname, lastname FROM author"
+    ))
+    conn.execute(text(
+        "INSERT INTO book_fts (rowid, title, description, category, house, author) "
+        "SELECT book.id, book.title, coalesce(book.description, ''), coalesce(book.category, ''), "
+        "coalesce(book.house, ''), coalesce(author.firstname || ' ' || author.lastname, '') "
+        "FROM book LEFT JOIN author ON author.id = book.author_id"
+    ))
+    conn.execute(text("INSERT INTO book_fts (book_fts) VALUES ('optimize')"))
+    conn.execute(text("INSERT INTO author_fts (author_fts) VALUES ('optimize')"))
+
+# Import local : app.database importe les migrations, qui importent ce module
+def rebuild_index():
+    from app.database import engine
+
+    with engine.begin() as conn:
+        create_search_tables(conn)
+        fill_search_index(conn)
+
+    with Session(engine) as session:
+        books = session.exec(select(func.count()).select_from(Book)).one()
+        authors = session.exec(select(func.count()).select_from(Author)).one()
+    return {"books": books, "authors": authors}
+
+# Utilisation : python -m app.search rebuild
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestion de l'index de recherche plein texte")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        counts = rebuild_index()
+        print(f"Index reconstruit : {counts['books']} livres, {counts['authors']} auteurs")
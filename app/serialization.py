@@ -0,0 +1,20 @@
+# app/serialization.py
+import orjson
+from fastapi import Response
+from sqlmodel import SQLModel
+
+# Sérialisation JSON rapide des réponses de lecture (listes, recherches, détails, statistiques) avec orjson.
+# FastAPI passe normalement le résultat d'une route dans jsonable_encoder, objet par objet et champ par champ :
+# ici les dates, dictionnaires et listes sont encodés directement par orjson, et un objet SQLModel n'est converti
+# qu'une fois en dictionnaire (model_dump). Le JSON produit est le même qu'avec jsonable_encoder.
+
+def encode_default(value):
+    if isinstance(value, SQLModel):
+        return value.model_dump()
+    raise TypeError(f"Type non sérialisable en JSON : {type(value).__name__}")
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data, default=encode_default)
+
+def json_response(data) -> Response:
+    return Response(content=dumps(data), media_type="application/json")
@@ -0,0 +1,158 @@
+# app/stats.py
+import argparse
+import os
+from datetime import date, timedelta
+from sqlalchemy import bindparam, text
+from sqlalchemy.dialects.sqlite import insert
+from app.archive import all_loans_sql
+from app.models import LoanHistory
+
+# Agrégats LoanHistory : une ligne par livre, mise à jour de façon incrémentale à chaque emprunt et retour.
+# Les routes de statistiques lisent ces agrégats au lieu de parcourir la table des emprunts.
+
+# Fenêtre (en jours) du tri par popularité récente
+RECENT_POPULARITY_DAYS = int(os.getenv('recent_popularity_days', '30'))
+
+def recent_since() -> str:
+    return (date.today() - timedelta(days=RECENT_POPULARITY_DAYS)).isoformat()
+
+# Ligne vide créée avec chaque livre
+def create_history(session, book_id: int):
+    session.exec(insert(LoanHistory).values(book_id=book_id).on_conflict_do_nothing())
+
+def record_loan(session, book_id: int, start_date: date):
+    # Un emprunt antidaté hors de la fenêtre ne compte pas dans la popularité récente
+    recent = 1 if start_date.isoformat() >= recent_since() else 0
+    statement = insert(LoanHistory).values(book_id=book_id, total_loans=1, active_loans=1, recent_loans=recent)
+    statement = statement.on_conflict_do_update(
+        index_elements=[LoanHistory.book_id],
+        set_={
+            "total_loans": LoanHistory.total_loans + 1,
+            "active_loans": LoanHistory.active_loans + 1,
+            "recent_loans": LoanHistory.recent_loans + recent,
+        },
+    )
+    session.exec(statement)
+
+def record_return(session, book_id: int, duration_days: int, late: bool):
+    statement = insert(LoanHistory).values(
+        book_id=book_id,
+        total_loans=1,
+        returned_loans=1,
+        total_duration_days=max(0, duration_days),
+        late_count=1 if late else 0,
+    )
+    # Si la ligne existe (cas normal), l'emprunt a déjà été compté à sa création : on ne touche pas à total_loans
+    statement = statement.on_conflict_do_update(
+        index_elements=[LoanHistory.book_id],
+        set_={
+            "active_loans": LoanHistory.active_loans - 1,
+            "returned_loans": LoanHistory.returned_loans + 1,
+            "total_duration_days": LoanHistory.total_duration_days + max(0, duration_days),
+            "late_count": LoanHistory.late_count + (1 if late else 0),
+        },
+    )
+    session.exec(statement)
+
+# Agrégation d'un ensemble d'emprunts (tous ou une liste d'ids), groupée par livre. Suivie de la source des emprunts :
+# la table loan pour des emprunts qui viennent d'être insérés, la table loan et les archives pour un recalcul complet
+AGGREGATE_LOANS = (
+    "SELECT book_id, COUNT(*), "
+    "SUM(CASE WHEN active THEN 1 ELSE 0 END), "
+    "SUM(CASE WHEN active THEN 0 ELSE 1 END), "
+    "COALESCE(SUM(CASE WHEN active OR returned_date IS NULL THEN 0 "
+    "ELSE MAX(0, CAST(julianday(returned_date) - julianday(start_date) AS INTEGER)) END), 0), "
+    "SUM(CASE WHEN late_days > 0 AND NOT active THEN 1 ELSE 0 END), "
+    "SUM(CASE WHEN start_date >= :since THEN 1 ELSE 0 END) "
+)
+HISTORY_COLUMNS = "book_id, total_loans, active_loans, returned_loans, total_duration_days, late_count, recent_loans"
+
+# Ajoute aux agrégats des emprunts insérés en masse (import), en une seule requête
+def record_loans(conn, loan_ids: list[int]):
+    if not loan_ids:
+        return
+    conn.execute(
+        text(
+            f"INSERT INTO loanhistory ({HISTORY_COLUMNS}) {AGGREGATE_LOANS} FROM loan WHERE id IN :ids GROUP BY book_id "
+            "ON CONFLICT (book_id) DO UPDATE SET "
+            "total_loans = total_loans + excluded.total_loans, "
+            "active_loans = active_loans + excluded.active_loans, "
+            "returned_loans = returned_loans + excluded.returned_loans, "
+            "total_duration_days = total_duration_days + excluded.total_duration_days, "
+            "late_count = late_count + excluded.late_count, "
+            "recent_loans = recent_loans + excluded.recent_loans"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": loan_ids, "since": recent_since()},
+    )
+
+# Retire des emprunts actifs et ajoute aux retours un ensemble d'emprunts clôturés en une fois (retour par lot)
+def record_returns(conn, loan_ids: list[int]):
+    if not loan_ids:
+        return
+    conn.execute(
+        text(
+            "UPDATE loanhistory SET "
+            "active_loans = active_loans - returned.total, "
+            "returned_loans = returned_loans + returned.total, "
+            "total_duration_days = total_duration_days + returned.duration, "
+            "late_count = late_count + returned.late "
+            "FROM (SELECT book_id, COUNT(*) AS total, "
+            "SUM(MAX(0, CAST(julianday(returned_date) - julianday(start_date) AS INTEGER))) AS duration, "
+            "SUM(CASE WHEN late_days > 0 THEN 1 ELSE 0 END) AS late "
+            "FROM loan WHERE id IN :ids GROUP BY book_id) AS returned "
+            "WHERE loanhistory.book_id = returned.book_id"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": loan_ids},
+    )
+
+# Lignes vides pour les livres qui n'en ont pas encore (livres importés en masse, bases existantes)
+def create_missing_history(conn, book_ids: list[int] | None = None):
+    statement = (
+        f"INSERT INTO loanhistory ({HISTORY_COLUMNS}) SELECT id, 0, 0, 0, 0, 0, 0 FROM book "
+        "WHERE NOT EXISTS (SELECT 1 FROM loanhistory WHERE loanhistory.book_id = book.id)"
+    )
+    if book_ids is None:
+        conn.execute(text(statement))
+    elif book_ids:
+        conn.execute(
+            text(statement + " AND book.id IN :ids").bindparams(bindparam("ids", expanding=True)),
+            {"ids": book_ids},
+        )
+
+# Recalcule le compteur d'emprunts récents : les emprunts sortis de la fenêtre ne comptent plus.
+# Lecture sur l'index loan.start_date, seuls les emprunts de la fenêtre sont parcourus
+def refresh_recent_popularity(conn):
+    conn.execute(text("UPDATE loanhistory SET recent_loans = 0 WHERE recent_loans > 0"))
+    conn.execute(
+        text(
+            "UPDATE loanhistory SET recent_loans = recent.total "
+            "FROM (SELECT book_id, COUNT(*) AS total FROM loan WHERE start_date >= :since GROUP BY book_id) AS recent "
+            "WHERE loanhistory.book_id = recent.book_id"
+        ),
+        {"since": recent_since()},
+    )
+
+# Recalcul complet des agrégats à partir des emprunts, archives comprises (migration ou correction d'une dérive)
+def recompute_loan_history(conn):
+    conn.execute(text("DELETE FROM loanhistory"))
+    conn.execute(
+        text(
+            f"INSERT INTO loanhistory ({HISTORY_COLUMNS}) {AGGREGATE_LOANS} FROM {all_loans_sql(conn)} GROUP BY book_id"
+        ),
+        {"since": recent_since()},
+    )
+    create_missing_history(conn)
+
+# Utilisation : python -m app.stats recompute
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gestion des statistiques d'emprunts")
+    parser.add_argument("command", choices=["recompute"])
+    args = parser.parse_args()
+
+    from app.database import engine
+
+    if args.command == "recompute":
+        with engine.begin() as conn:
+            recompute_loan_history(conn)
+            books = conn.execute(text("SELECT COUNT(*) FROM loanhistory")).scalar()
+        print(f"Statistiques recalculées pour {books} livres")
@@ -0,0 +1 @@
+# bench/__init__.py
\ No newline at end of file
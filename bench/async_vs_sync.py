@@ -0,0 +1,20 @@
+# bench/async_vs_sync.py
+import json
+from bench.harness import build_parser, run
+
+# Test de charge comparant le mode synchrone (threadpool) et le mode async (AsyncSession sur aiosqlite) :
+# le même banc (bench/harness.py) est lancé deux fois sur la même base générée, une fois par mode.
+#
+# Utilisation : python -m bench.async_vs_sync --size 10k --concurrency 64 --requests 2000
+
+if __name__ == "__main__":
+    parser = build_parser()
+    parser.description = "Comparaison des modes synchrone et async sous charge"
+    parser.set_defaults(concurrency=64)
+    args = parser.parse_args()
+
+    results = {}
+    for mode, async_mode in [("sync", False), ("async", True)]:
+        args.async_mode = async_mode
+        results[mode] = run(args)
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,190 @@
+# bench/concurrency.py
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from contextlib import asynccontextmanager
+import httpx
+from bench.generator import isbn13
+from bench.harness import ROOT, free_port, server_env
+
+# Test de stress du stock : des clients simultanés, servis par plusieurs workers uvicorn (des processus distincts qui
+# se partagent la base SQLite), se disputent les k exemplaires d'un même livre.
+# À chaque tour :
+# - `--clients` emprunts simultanés (POST /loans/ et POST /loans/batch), chacun avec sa carte : exactement k réussissent
+#   et le stock tombe à 0 ;
+# - puis, en même temps, deux renouvellements et trois retours (dont un par lot) de chaque emprunt, et autant de
+#   nouveaux emprunts : chaque emprunt est retourné une seule fois, un seul renouvellement passe, et le stock reste
+#   cohérent (copies >= 0, copies + emprunts en cours == owned, compteurs des emprunteurs == emprunts en cours).
+# Les vérifications sont lues directement dans la base. Le script s'arrête avec un code d'erreur au premier écart.
+#
+# Utilisation : python -m bench.concurrency --copies 3 --clients 32 --rounds 5 --workers 4
+
+class Failure(Exception):
+    pass
+
+def check(condition: bool, message: str):
+    if not condition:
+        raise Failure(message)
+
+# État du livre lu dans la base (hors de l'API et de son cache)
+def read_state(db_path: str, book_id: int) -> dict:
+    with sqlite3.connect(db_path, timeout=30) as db:
+        copies, owned = db.execute("SELECT copies, owned FROM book WHERE id = ?", (book_id,)).fetchone()
+        active = db.execute("SELECT count(*) FROM loan WHERE book_id = ? AND active = 1", (book_id,)).fetchone()[0]
+        borrowed = db.execute("SELECT coalesce(sum(active_loans), 0) FROM borrower").fetchone()[0]
+    return {"copies": copies, "owned": owned, "active": active, "borrower_active_loans": borrowed}
+
+def check_stock(state: dict, step: str):
+    check(state["copies"] >= 0, f"{step} : stock négatif ({state})")
+    check(state["copies"] + state["active"] == state["owned"], f"{step} : copies + emprunts en cours != owned ({state})")
+    check(state["borrower_active_loans"] == state["active"], f"{step} : compteurs des emprunteurs faux ({state})")
+
+def borrower(card_id: int) -> dict:
+    return {
+        "loaner_name": f"Lecteur {card_id}",
+        "loaner_mail": f"lecteur{card_id}@stress.test",
+        "loaner_card_id": card_id,
+        "start_date": "2026-01-05",
+    }
+
+# Un emprunt (un client sur deux passe par la route de lot) : renvoie l'id de l'emprunt créé ou None
+async def checkout(client: httpx.AsyncClient, book_id: int, card_id: int) -> int | None:
+    if card_id % 2:
+        response = await client.post("/loans/", json={"book_id": book_id, **borrower(card_id)})
+        check(response.status_code in (200, 409), f"POST /loans/ : {response.status_code} {response.text}")
+        return response.json()["id"] if response.status_code == 200 else None
+    response = await client.post("/loans/batch", json={"book_ids": [book_id], **borrower(card_id)})
+    check(response.status_code == 200, f"POST /loans/batch : {response.status_code} {response.text}")
+    result = response.json()["results"][0]
+    check(result["status"] in (200, 409), f"POST /loans/batch : {result}")
+    return result["loan"]["id"] if result["status"] == 200 else None
+
+async def checkouts(client: httpx.AsyncClient, book_id: int, cards: range) -> list[int]:
+    loan_ids = await asyncio.gather(*(checkout(client, book_id, card_id) for card_id in cards))
+    return [loan_id for loan_id in loan_ids if loan_id is not None]
+
+async def renew(client: httpx.AsyncClient, loan_id: int) -> tuple[str, int, int]:
+    response = await client.post(f"/loans/{loan_id}/renew")
+    return "renew", loan_id, response.status_code
+
+async def checkin(client: httpx.AsyncClient, loan_id: int) -> tuple[str, int, int]:
+    response = await client.post(f"/loans/{loan_id}/return")
+    return "return", loan_id, response.status_code
+
+async def checkin_batch(client: httpx.AsyncClient, loan_id: int) -> tuple[str, int, int]:
+    response = await client.post("/loans/return/batch", json={"loan_ids": [loan_id]})
+    check(response.status_code == 200, f"POST /loans/return/batch : {response.status_code} {response.text}")
+    return "return", loan_id, response.json()["results"][0]["status"]
+
+async def run_round(client: httpx.AsyncClient, db_path: str, book_id: int, first_card: int, args) -> dict:
+    loan_ids = await checkouts(client, book_id, range(first_card, first_card + args.clients))
+    check(len(loan_ids) == args.copies, f"{len(loan_ids)} emprunts réussis pour {args.copies} exemplaires")
+    state = read_state(db_path, book_id)
+    check(state["copies"] == 0, f"stock après les emprunts : {state}")
+    check_stock(state, "après les emprunts")
+
+    # Retours, renouvellements et nouveaux emprunts en même temps. Un renouvellement arrivé après le retour est refusé
+    # (409), un renouvellement n'est accepté qu'une fois
+    operations = [
+        operation(client, loan_id)
+        for loan_id in loan_ids
+        for operation in (renew, renew, checkin, checkin, checkin_batch)
+    ]
+    second = first_card + args.clients
+    results, new_loans = await asyncio.gather(
+        asyncio.gather(*operations), checkouts(client, book_id, range(second, second + args.clients))
+    )
+    returned = Counter(loan_id for kind, loan_id, status in results if kind == "return" and status == 200)
+    renewed = Counter(loan_id for kind, loan_id, status in results if kind == "renew" and status == 200)
+    check(all(returned[loan_id] == 1 for loan_id in loan_ids), f"retours réussis par emprunt : {dict(returned)}")
+    check(all(renewed[loan_id] <= 1 for loan_id in loan_ids), f"renouvellements réussis par emprunt : {dict(renewed)}")
+    check(
+        all(status in (200, 403, 409) for _, _, status in results),
+        f"statuts inattendus : {[result for result in results if result[2] not in (200, 403, 409)]}",
+    )
+    check(len(new_loans) <= args.copies, f"{len(new_loans)} nouveaux emprunts pour {args.copies} exemplaires")
+    state = read_state(db_path, book_id)
+    check_stock(state, "après les retours et renouvellements")
+    check(state["active"] == len(new_loans), f"emprunts en cours : {state['active']} pour {len(new_loans)} créés")
+
+    # Fin du tour : les nouveaux emprunts sont retournés, le stock revient à owned
+    await asyncio.gather(*(checkin(client, loan_id) for loan_id in new_loans))
+    state = read_state(db_path, book_id)
+    check_stock(state, "fin du tour")
+    check(state["copies"] == state["owned"], f"stock en fin de tour : {state}")
+    return {
+        "checkouts": len(loan_ids),
+        "renewals": sum(renewed.values()),
+        "concurrent_checkouts": len(new_loans),
+    }
+
+# Serveur uvicorn sur la base, sans cache (les vérifications passent par l'API et par la base)
+@asynccontextmanager
+async def serve(db_path: str, workers: int, args):
+    port = free_port()
+    env = {**os.environ, **server_env(db_path, args.async_mode, cache=False)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.clients * 6)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("Le serveur n'a pas démarré")
+            yield client
+    finally:
+        server.terminate()
+        server.wait()
+
+async def run_stress(db_path: str, args) -> list[dict]:
+    # Préparation avec un seul worker : la base et le livre existent avant que les workers du test ne démarrent
+    async with serve(db_path, 1, args) as client:
+        author = await client.post(
+            "/authors/", json={"firstname": "Jules", "lastname": "Verne", "birth": "1828-02-08", "country": "FR"}
+        )
+        book = await client.post("/books/", json={
+            "title": "Vingt mille lieues sous les mers", "isbn": isbn13(1), "year": 1870,
+            "author_id": author.json()["id"], "copies": args.copies, "owned": args.copies,
+            "language": "fr", "pages": 500, "category": "Aventure",
+        })
+        check(book.status_code == 200, f"création du livre : {book.status_code} {book.text}")
+        book_id = book.json()["id"]
+
+    async with serve(db_path, args.workers, args) as client:
+        # Deux séries de cartes par tour (emprunts puis nouveaux emprunts) : personne n'atteint le quota
+        return [
+            await run_round(client, db_path, book_id, 1 + round_number * 2 * args.clients, args)
+            for round_number in range(args.rounds)
+        ]
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Test de stress des emprunts simultanés d'un même livre")
+    parser.add_argument("--copies", type=int, default=3, help="Exemplaires du livre (k)")
+    parser.add_argument("--clients", type=int, default=32, help="Emprunts simultanés par tour (N)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=4, help="Nombre de workers uvicorn (processus)")
+    parser.add_argument("--async-mode", action="store_true", help="Serveur en mode async (async_mode=true)")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            rounds = asyncio.run(run_stress(os.path.join(tmp, "stress.db"), args))
+        except Failure as e:
+            sys.exit(f"Échec : {e}")
+    print(json.dumps({"copies": args.copies, "clients": args.clients, "workers": args.workers, "rounds": rounds}, indent=2))
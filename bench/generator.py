@@ -0,0 +1,224 @@
+# bench/generator.py
+import argparse
+import itertools
+import os
+import random
+import time
+from datetime import date, timedelta
+from app.overdue import PENALTY_CENTS_PER_DAY
+
+# Générateur déterministe d'une bibliothèque de test : pour une taille, une graine et une date de référence données,
+# la base produite est toujours la même. Les lignes sont construites et validées avec les modèles de app/models.py,
+# puis insérées par lots ; les tables dérivées (index FTS, LoanHistory, Borrower, retards, facettes) sont ensuite recalculées
+# avec les fonctions de l'API.
+#
+# La distribution est volontairement déséquilibrée, comme dans une vraie bibliothèque :
+# - quelques auteurs très prolifiques (loi de Zipf sur les auteurs)
+# - quelques titres très empruntés (loi de Zipf sur les livres)
+#
+# Utilisation : python -m bench.generator --size 100k --db bench_100k.db
+
+SIZES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+# Proportions par livre
+AUTHORS_PER_BOOK = 0.1
+LOANS_PER_BOOK = 2
+BORROWERS_PER_BOOK = 0.2
+# Exposant des lois de Zipf (plus il est grand, plus les premiers rangs concentrent les livres / emprunts)
+AUTHOR_SKEW = 1.1
+BOOK_SKEW = 1.0
+# Les emprunts sont répartis sur les HISTORY_DAYS derniers jours ; ceux des LOAN_DAYS derniers jours sont encore actifs
+HISTORY_DAYS = 3 * 365
+LOAN_DAYS = 45
+MAX_ACTIVE_LOANS = 5
+CHUNK_SIZE = 5000
+
+FIRSTNAMES = [
+    "Victor", "Émile", "Marguerite", "Albert", "Simone", "Jules", "George", "Honoré", "Colette", "Gustave",
+    "Marcel", "Annie", "Louis", "Françoise", "Boris", "Nathalie", "Jean", "Marie", "Romain", "Amélie",
+]
+LASTNAMES = [
+    "Hugo", "Zola", "Duras", "Camus", "Beauvoir", "Verne", "Sand", "Balzac", "Flaubert", "Proust",
+    "Ernaux", "Vian", "Sagan", "Modiano", "Gary", "Nothomb", "Giono", "Yourcenar", "Pagnol", "Dumas",
+]
+COUNTRIES = ["FR", "BE", "CH", "CA", "SN", "MA", "GB", "US", "DE", "IT"]
+TITLE_NOUNS = [
+    "jardin", "voyage", "silence", "mémoire", "océan", "forêt", "ville", "nuit", "étranger", "rivière",
+    "château", "hiver", "lumière", "secret", "enfance", "désert", "miroir", "horizon", "tempête", "royaume",
+]
+TITLE_ADJECTIVES = [
+    "perdu", "oublié", "éternel", "sauvage", "immobile", "rouge", "lointain", "intérieur", "secret", "dernier",
+]
+CATEGORIES = ["Roman", "Policier", "Science-fiction", "Poésie", "Histoire", "Jeunesse", "Biographie", "Essai", "Théâtre", "BD"]
+LANGUAGES = ["fr", "fr", "fr", "en", "es", "de"]
+HOUSES = ["Gallimard", "Flammarion", "Seuil", "Actes Sud", "Albin Michel", "Grasset", None]
+
+def isbn13(number: int) -> str:
+    digits = f"978{number:09d}"
+    check = (10 - sum(int(d) * (1 if i % 2 == 0 else 3) for i, d in enumerate(digits)) % 10) % 10
+    return f"{digits}{check}"
+
+def zipf_weights(count: int, skew: float) -> list[float]:
+    return list(itertools.accumulate(1 / rank ** skew for rank in range(1, count + 1)))
+
+class LibraryGenerator:
+    def __init__(self, books: int, seed: int = 42, reference_date: date | None = None):
+        self.books = books
+        self.authors = max(1, int(books * AUTHORS_PER_BOOK))
+        self.loans = books * LOANS_PER_BOOK
+        self.borrowers = max(1, int(books * BORROWERS_PER_BOOK))
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.today = reference_date or date.today()
+
+    def author_rows(self):
+        from app.models import Author
+
+        for author_id in range(1, self.authors + 1):
+            yield Author.model_validate({
+                "id": author_id,
+                "firstname": self.rng.choice(FIRSTNAMES),
+                "lastname": f"{self.rng.choice(LASTNAMES)}-{author_id}",
+                "birth": date(1800, 1, 1) + timedelta(days=self.rng.randrange(200 * 365)),
+                "country": self.rng.choice(COUNTRIES),
+            })
+
+    # Livres d'un auteur tiré selon sa « prolificité » ; le stock tient compte des emprunts actifs générés
+    def book_rows(self, active_per_book: dict[int, int]):
+        from app.models import Book
+
+        author_weights = zipf_weights(self.authors, AUTHOR_SKEW)
+        author_ids = range(1, self.authors + 1)
+        for book_id in range(1, self.books + 1):
+            active = active_per_book.get(book_id, 0)
+            owned = max(active + self.rng.randint(0, 2), self.rng.randint(1, 5))
+            yield Book.model_validate({
+                "id": book_id,
+                "title": f"Le {self.rng.choice(TITLE_NOUNS)} {self.rng.choice(TITLE_ADJECTIVES)} {book_id}",
+                "isbn": isbn13(book_id),
+                "year": self.rng.randint(1850, self.today.year),
+                "author_id": self.rng.choices(author_ids, cum_weights=author_weights)[0],
+                "copies": owned - active,
+                "owned": owned,
+                "description": f"Un {self.rng.choice(CATEGORIES).lower()} sur le {self.rng.choice(TITLE_NOUNS)}",
+                "category": self.rng.choice(CATEGORIES),
+                "language": self.rng.choice(LANGUAGES),
+                "pages": self.rng.randint(60, 900),
+                "house": self.rng.choice(HOUSES),
+            })
+
+    # Emprunts des livres populaires (Zipf) ; les emprunts récents restent actifs dans la limite du quota de la carte.
+    # Le tirage a sa propre graine : il est rejoué à l'identique pour compter les emprunts actifs puis pour insérer
+    # les lignes, sans garder tous les emprunts en mémoire
+    def iter_loans(self):
+        rng = random.Random(self.seed + 1)
+        book_weights = zipf_weights(self.books, BOOK_SKEW)
+        book_ids = range(1, self.books + 1)
+        # Les rangs de popularité sont mélangés pour que les livres populaires ne soient pas les premiers ids
+        popularity = list(book_ids)
+        rng.shuffle(popularity)
+        active_per_card: dict[int, int] = {}
+        for loan_id in range(1, self.loans + 1):
+            book_id = popularity[rng.choices(book_ids, cum_weights=book_weights)[0] - 1]
+            card_id = rng.randint(1, self.borrowers)
+            start = self.today - timedelta(days=rng.randrange(HISTORY_DAYS))
+            due = start + timedelta(days=28)
+            active = (self.today - start).days < LOAN_DAYS and active_per_card.get(card_id, 0) < MAX_ACTIVE_LOANS
+            returned = None if active else min(self.today, start + timedelta(days=rng.randint(1, 40)))
+            # Les retards des emprunts actifs sont calculés ensuite par le balayage des retards
+            late_days = 0 if active else max(0, (returned - due).days)
+            if active:
+                active_per_card[card_id] = active_per_card.get(card_id, 0) + 1
+            loan = {
+                "id": loan_id,
+                "book_id": book_id,
+                "loaner_name": f"Lecteur {card_id}",
+                "loaner_mail": f"lecteur{card_id}@exemple.fr",
+                "loaner_card_id": card_id,
+                "start_date": start,
+                "due_date": due,
+                "active": active,
+                "late": late_days > 0,
+                "late_days": late_days,
+                "penalty_cents": late_days * PENALTY_CENTS_PER_DAY,
+            }
+            # Le modèle n'accepte pas returned_date=None explicite (valeur par défaut seulement)
+            if returned:
+                loan["returned_date"] = returned
+            yield loan
+
+    def count_active_loans(self) -> dict[int, int]:
+        active_per_book: dict[int, int] = {}
+        for loan in self.iter_loans():
+            if loan["active"]:
+                active_per_book[loan["book_id"]] = active_per_book.get(loan["book_id"], 0) + 1
+        return active_per_book
+
+    def loan_rows(self):
+        from app.models import Loan
+
+        for loan in self.iter_loans():
+            yield Loan.model_validate(loan)
+
+    def run(self, verbose: bool = True) -> dict:
+        from app.borrowers import sync_borrowers
+        from app.database import create_db_and_tables, immediate_engine
+        from app.facets import recompute_facets
+        from app.fuzzy import rebuild_trigrams
+        from app.models import Author, Book, Loan
+        from app.overdue import sweep_overdue_loans
+        from app.search import rebuild_index
+        from app.stats import recompute_loan_history
+
+        started = time.perf_counter()
+        create_db_and_tables()
+
+        def log(message: str):
+            if verbose:
+                print(f"[{time.perf_counter() - started:7.1f}s] {message}")
+
+        # Le stock des livres dépend des emprunts actifs : ils sont comptés avant de générer les livres
+        active_per_book = self.count_active_loans()
+        log(f"{sum(active_per_book.values())} emprunts actifs tirés")
+        for model, rows in [
+            (Author, self.author_rows()),
+            (Book, self.book_rows(active_per_book)),
+            (Loan, self.loan_rows()),
+        ]:
+            inserted = 0
+            while chunk := list(itertools.islice(rows, CHUNK_SIZE)):
+                with immediate_engine.begin() as conn:
+                    conn.execute(model.__table__.insert(), [row.model_dump() for row in chunk])
+                inserted += len(chunk)
+            log(f"{inserted} lignes insérées dans {model.__tablename__}")
+
+        rebuild_index()
+        with immediate_engine.begin() as conn:
+            rebuild_trigrams(conn)
+        log("Index de recherche et de trigrammes reconstruits")
+        with immediate_engine.begin() as conn:
+            recompute_loan_history(conn)
+            sweep_overdue_loans(conn, self.today)
+            sync_borrowers(conn)
+            recompute_facets(conn)
+        log("Statistiques, retards, compteurs des emprunteurs et facettes recalculés")
+
+        return {"books": self.books, "authors": self.authors, "loans": self.loans, "borrowers": self.borrowers}
+
+def parse_size(value: str) -> int:
+    return SIZES[value.lower()] if value.lower() in SIZES else int(value)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère une bibliothèque de test déterministe")
+    parser.add_argument("--size", default="10k", help="10k, 100k, 1m ou un nombre de livres")
+    parser.add_argument("--db", required=True, help="Fichier SQLite à créer (ne doit pas exister)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--reference-date", type=date.fromisoformat, default=None, help="Date du jour simulée (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} existe déjà")
+    # Le moteur de app.database lit le fichier de la base au moment de l'import
+    os.environ["sqlite_file_name"] = args.db
+
+    counts = LibraryGenerator(parse_size(args.size), args.seed, args.reference_date).run()
+    print(f"{counts['books']} livres, {counts['authors']} auteurs, {counts['loans']} emprunts, {counts['borrowers']} emprunteurs")
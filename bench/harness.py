@@ -0,0 +1,261 @@
+# bench/harness.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import httpx
+from bench.generator import LASTNAMES, TITLE_ADJECTIVES, TITLE_NOUNS, parse_size
+
+# Banc de mesure des routes de l'API sur une base générée (bench/generator.py).
+# Chaque opération (liste, recherche, détail, emprunt, renouvellement, retour) est mesurée séparément, avec des
+# clients simultanés, soit contre un serveur uvicorn lancé pour l'occasion (httpx), soit en mémoire (TestClient).
+# Le résultat (p50/p95/p99, débit, erreurs) est écrit en JSON pour comparer deux commits.
+# La base de départ est copiée avant chaque mesure : les emprunts du banc ne la modifient pas.
+#
+# Utilisation : python -m bench.harness --size 100k --output resultats.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ("list", "search", "detail", "loan", "renew", "return")
+# Cartes des emprunts du banc : au-delà de celles de la base générée, 5 emprunts par carte (quota)
+BENCH_CARD_START = 10_000_000
+
+def copy_database(source: str, target: str):
+    with sqlite3.connect(source) as src, sqlite3.connect(target) as dst:
+        src.backup(dst)
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Réglages du serveur mesuré : pas de cache (on mesure le chemin jusqu'à SQLite) ni de balayage pendant la mesure
+def server_env(db_path: str, async_mode: bool, cache: bool) -> dict:
+    env = {
+        "sqlite_file_name": db_path,
+        "async_mode": "true" if async_mode else "false",
+        "overdue_sweep_interval": "0",
+    }
+    if not cache:
+        env["cache_max_entries"] = "0"
+    return env
+
+# Génère les requêtes de chaque opération ; les emprunts créés servent ensuite aux renouvellements et aux retours
+class Workload:
+    def __init__(self, db_path: str, seed: int):
+        self.rng = random.Random(seed)
+        with sqlite3.connect(db_path) as conn:
+            self.books = conn.execute("SELECT COUNT(*) FROM book").fetchone()[0]
+            self.available = [row[0] for row in conn.execute("SELECT id FROM book WHERE copies > 0")]
+        self.next_card = 0
+        self.loan_ids: list[int] = []
+        self.renewed: list[int] = []
+
+    def request(self, operation: str) -> tuple[str, str, dict] | None:
+        rng = self.rng
+        if operation == "list":
+            sort_by = rng.choice(["title", "year", "popularity"])
+            return "GET", "/books/", {"params": {"page": rng.randint(1, 50), "page_size": 20, "sort_by": sort_by}}
+        if operation == "search":
+            if rng.random() < 0.2:
+                return "GET", "/books/search/", {"params": {"author_name": rng.choice(LASTNAMES)}}
+            return "GET", "/books/search/", {"params": {"q": f"{rng.choice(TITLE_NOUNS)} {rng.choice(TITLE_ADJECTIVES)}"}}
+        if operation == "detail":
+            return "GET", f"/books/{rng.randint(1, self.books)}", {}
+        if operation == "loan":
+            card = BENCH_CARD_START + self.next_card // 5
+            self.next_card += 1
+            return "POST", "/loans/", {"json": {
+                "book_id": rng.choice(self.available),
+                "loaner_name": "Banc",
+                "loaner_mail": f"banc{card}@exemple.fr",
+                "loaner_card_id": card,
+            }}
+        if operation == "renew":
+            if not self.loan_ids:
+                return None
+            loan_id = self.loan_ids.pop()
+            self.renewed.append(loan_id)
+            return "POST", f"/loans/{loan_id}/renew", {}
+        if operation == "return":
+            if not self.renewed:
+                return None
+            return "POST", f"/loans/{self.renewed.pop()}/return", {}
+        raise ValueError(f"Opération inconnue : {operation}")
+
+    def record(self, operation: str, status: int, body: bytes):
+        if operation == "loan" and status == 200:
+            self.loan_ids.append(json.loads(body)["id"])
+
+def percentile(values: list[float], p: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    if not latencies:
+        return {"count": 0, "errors": errors}
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / seconds, 1),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+# Exécute `requests` requêtes d'une opération avec `concurrency` clients simultanés (serveur uvicorn)
+async def run_operation(client: httpx.AsyncClient, workload: Workload, operation: str, requests: int, concurrency: int) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            request = workload.request(operation)
+            if request is None:
+                return
+            method, url, kwargs = request
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            workload.record(operation, response.status_code, response.content)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def run_http(db_path: str, args) -> dict:
+    port = free_port()
+    env = {**os.environ, **server_env(db_path, args.async_mode, args.cache)}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+            for _ in range(300):
+                try:
+                    if (await client.get("/")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            else:
+                raise RuntimeError("Le serveur n'a pas démarré")
+
+            workload = Workload(db_path, args.seed)
+            return {
+                operation: await run_operation(client, workload, operation, args.requests, args.concurrency)
+                for operation in args.operations
+            }
+    finally:
+        server.terminate()
+        server.wait()
+
+# En mémoire avec TestClient : un seul client, sans réseau ni sérialisation HTTP (mesure du coût d'une route)
+def run_testclient(db_path: str, args) -> dict:
+    os.environ.update(server_env(db_path, args.async_mode, args.cache))
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    results = {}
+    with TestClient(app) as client:
+        workload = Workload(db_path, args.seed)
+        for operation in args.operations:
+            latencies: list[float] = []
+            errors = 0
+            started = time.perf_counter()
+            for _ in range(args.requests):
+                request = workload.request(operation)
+                if request is None:
+                    break
+                method, url, kwargs = request
+                start = time.perf_counter()
+                response = client.request(method, url, **kwargs)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+                workload.record(operation, response.status_code, response.content)
+            results[operation] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args.db
+        if not source:
+            # Génération dans un processus à part : le moteur de app.database est lié au fichier au moment de l'import
+            source = os.path.join(tmp, "source.db")
+            subprocess.run(
+                [sys.executable, "-m", "bench.generator", "--size", args.size, "--seed", str(args.seed), "--db", source],
+                cwd=ROOT,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+        db_path = os.path.join(tmp, "bench.db")
+        copy_database(source, db_path)
+
+        results = asyncio.run(run_http(db_path, args)) if args.client == "http" else run_testclient(db_path, args)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "db": args.db,
+            "size": None if args.db else parse_size(args.size),
+            "seed": args.seed,
+            "client": args.client,
+            "async_mode": args.async_mode,
+            "cache": args.cache,
+            "concurrency": args.concurrency if args.client == "http" else 1,
+            "requests_per_operation": args.requests,
+        },
+        "results": results,
+    }
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Mesure des routes de l'API sur une base générée")
+    parser.add_argument("--db", help="Base générée par bench.generator (sinon une base de --size est générée)")
+    parser.add_argument("--size", default="10k", help="10k, 100k, 1m ou un nombre de livres")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--client", choices=["http", "testclient"], default="http")
+    parser.add_argument("--operations", nargs="+", choices=OPERATIONS, default=list(OPERATIONS))
+    parser.add_argument("--requests", type=int, default=1000, help="Nombre de requêtes par opération")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients simultanés (mode http)")
+    parser.add_argument("--workers", type=int, default=1, help="Nombre de workers uvicorn (mode http)")
+    parser.add_argument("--async-mode", action="store_true", help="Serveur en mode async (async_mode=true)")
+    parser.add_argument("--cache", action="store_true", help="Garder le cache des réponses actif")
+    parser.add_argument("--output", help="Fichier JSON de résultats (sinon affiché)")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    print(report)
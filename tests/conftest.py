@@ -0,0 +1,45 @@
+# tests/conftest.py
+import itertools
+import os
+import tempfile
+import pytest
+
+# Le moteur de app.database est lié au fichier au moment de l'import : la base de test est choisie avant
+TEST_DIR = tempfile.mkdtemp(prefix="bibli-tests-")
+os.environ["sqlite_file_name"] = os.path.join(TEST_DIR, "test.db")
+os.environ["overdue_sweep_interval"] = "0"
+os.environ["cache_max_entries"] = "0"
+
+from fastapi.testclient import TestClient
+from app.main import app
+from bench.generator import isbn13
+
+# Une seule base pour la session : chaque test crée ses propres livres et utilise ses propres cartes
+isbn_numbers = itertools.count(1)
+card_numbers = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture(scope="session")
+def author_id(client):
+    response = client.post("/authors/", json={"firstname": "Victor", "lastname": "Hugo", "birth": "1802-02-26", "country": "FR"})
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+@pytest.fixture
+def make_book(client, author_id):
+    def make_book(title: str = "Les Misérables", copies: int = 3, **fields) -> int:
+        response = client.post("/books/", json={
+            "title": title, "isbn": isbn13(next(isbn_numbers)), "year": 1862, "author_id": author_id,
+            "copies": copies, "owned": copies, "language": "fr", "pages": 100, "category": "Fiction", **fields,
+        })
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+    return make_book
+
+@pytest.fixture
+def new_card():
+    return lambda: next(card_numbers)
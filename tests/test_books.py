@@ -0,0 +1,24 @@
+# tests/test_books.py
+
+def search(client, **params) -> list[int]:
+    response = client.get("/books/search/", params=params)
+    assert response.status_code == 200, response.text
+    return [book["id"] for book in response.json()["items"]]
+
+# Recherche approchée sur le titre et plein texte sur q : les deux filtres s'appliquent
+def test_fuzzy_title_keeps_q_filter(client, make_book):
+    whale = make_book("Moby Dick fuzzyq", description="chasse à la baleine")
+    other = make_book("Moby Dick fuzzyq", description="roman d'aventure")
+
+    assert set(search(client, title="moby dik fuzzyq", fuzzy="true")) >= {whale, other}
+    ids = search(client, title="moby dik fuzzyq", q="baleine", fuzzy="true")
+    assert whale in ids
+    assert other not in ids
+
+# q sans aucun mot : page vide, et non le catalogue entier
+def test_q_without_words_matches_nothing(client, make_book):
+    make_book("Notre-Dame de Paris")
+    response = client.get("/books/search/", params={"q": "!!!", "facets": "category"})
+    assert response.status_code == 200, response.text
+    assert response.json()["items"] == []
+    assert response.json()["total"] == 0
@@ -0,0 +1,36 @@
+# tests/test_loans.py
+
+def checkout(client, book_id: int, card_id: int, mail: str) -> int:
+    return client.post("/loans/", json={
+        "book_id": book_id, "loaner_name": "Lecteur", "loaner_mail": mail,
+        "loaner_card_id": card_id, "start_date": "2026-10-01",
+    }).status_code
+
+def checkout_batch(client, book_ids: list[int], card_id: int, mail: str) -> list[int]:
+    response = client.post("/loans/batch", json={
+        "book_ids": book_ids, "loaner_name": "Lecteur", "loaner_mail": mail,
+        "loaner_card_id": card_id, "start_date": "2026-10-01",
+    })
+    assert response.status_code == 200, response.text
+    return [result["status"] for result in response.json()["results"]]
+
+# Quota de 5 emprunts : les emprunts de la carte ou de l'adresse mail, comptés une seule fois
+def test_quota_counts_card_and_mail_together(client, make_book, new_card):
+    books = [make_book() for _ in range(7)]
+    card_1, card_2 = new_card(), new_card()
+    assert [checkout(client, book, card_1, "quota-a@test.fr") for book in books[:3]] == [200] * 3
+    assert [checkout(client, book, card_2, "quota-b@test.fr") for book in books[3:5]] == [200] * 2
+
+    # Carte 1 (3 emprunts) avec l'adresse de la carte 2 (2 emprunts) : 5 emprunts en cours
+    assert checkout(client, books[5], card_1, "quota-b@test.fr") == 403
+    assert checkout_batch(client, books[5:7], card_1, "quota-b@test.fr") == [403, 403]
+    # Chaque carte reste sous le quota avec sa propre adresse
+    assert checkout(client, books[5], card_1, "quota-a@test.fr") == 200
+    assert checkout_batch(client, books[6:7], card_2, "quota-b@test.fr") == [200]
+
+def test_quota_same_mail_on_two_cards(client, make_book, new_card):
+    books = [make_book() for _ in range(6)]
+    card_1, card_2 = new_card(), new_card()
+    assert [checkout(client, book, card_1, "quota-c@test.fr") for book in books[:3]] == [200] * 3
+    assert [checkout(client, book, card_2, "quota-c@test.fr") for book in books[3:5]] == [200] * 2
+    assert checkout(client, books[5], new_card(), "quota-c@test.fr") == 403
@@ -0,0 +1,31 @@
+# tests/test_metrics.py
+import os
+import sqlite3
+import threading
+
+def metric(client, name: str) -> float:
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(f"{name} "):
+            return float(line.split()[1])
+    raise AssertionError(f"{name} absent de /metrics")
+
+# Un emprunt qui attend le verrou d'écriture tenu par une autre connexion : attente comptée à part, pas en requête lente
+def test_lock_wait_is_not_a_slow_query(client, make_book, new_card):
+    book_id = make_book()
+    slow_queries = metric(client, "db_slow_queries_total")
+    lock_waits = metric(client, "db_lock_waits_total")
+
+    writer = sqlite3.connect(os.environ["sqlite_file_name"], isolation_level=None, check_same_thread=False)
+    writer.execute("BEGIN IMMEDIATE")
+    release = threading.Timer(0.4, writer.execute, ["COMMIT"])
+    release.start()
+    response = client.post("/loans/", json={
+        "book_id": book_id, "loaner_name": "Lecteur", "loaner_mail": "verrou@test.fr",
+        "loaner_card_id": new_card(), "start_date": "2026-10-01",
+    })
+    release.join()
+    writer.close()
+
+    assert response.status_code == 200, response.text
+    assert metric(client, "db_lock_waits_total") == lock_waits + 1
+    assert metric(client, "db_slow_queries_total") == slow_queries
@@ -0,0 +1,22 @@
+# tests/test_migrations.py
+from sqlalchemy import text
+from app.database import engine
+from app.overdue import mark_returned_late_loans
+
+# Emprunts retournés en retard avant la colonne late : la migration 10 la renseigne d'après late_days
+def test_returned_late_loans_are_marked(client, make_book, new_card):
+    book_id = make_book()
+    card_id = new_card()
+    with engine.begin() as conn:
+        for late_days in (0, 4):
+            conn.execute(text(
+                "INSERT INTO loan (book_id, loaner_name, loaner_mail, loaner_card_id, start_date, due_date, "
+                "returned_date, active, late, renew_count, late_days, penalty_cents) "
+                "VALUES (:book_id, 'Lecteur', 'retard@test.fr', :card_id, '2025-01-01', '2025-01-29', "
+                "'2025-02-02', 0, 0, 0, :late_days, :late_days * 50)"
+            ), {"book_id": book_id, "card_id": card_id, "late_days": late_days})
+        mark_returned_late_loans(conn)
+        rows = conn.execute(
+            text("SELECT late_days, late FROM loan WHERE loaner_card_id = :card_id ORDER BY late_days"), {"card_id": card_id}
+        ).all()
+    assert [tuple(row) for row in rows] == [(0, 0), (4, 1)]
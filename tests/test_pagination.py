@@ -0,0 +1,19 @@
+# tests/test_pagination.py
+
+# Dernière page pleine : pas de curseur vers une page vide
+def test_cursor_stops_on_full_last_page(client, make_book):
+    category = "Pagination exacte"
+    ids = [make_book(category=category) for _ in range(4)]
+
+    first = client.get("/books/search/", params={"category": category, "page_size": 2}).json()
+    assert [book["id"] for book in first["items"]] == ids[:2]
+    assert first["next_cursor"]
+
+    last = client.get("/books/search/", params={"category": category, "page_size": 2, "cursor": first["next_cursor"]}).json()
+    assert [book["id"] for book in last["items"]] == ids[2:]
+    assert last["next_cursor"] is None
+
+    # Avec ?fields= (lignes sans objets) comme avec les objets complets
+    page = client.get("/books/search/", params={"category": category, "page_size": 4, "fields": "id,title"}).json()
+    assert [book["id"] for book in page["items"]] == ids
+    assert page["next_cursor"] is None